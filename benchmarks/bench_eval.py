@@ -0,0 +1,213 @@
+"""End-to-end throughput benchmark of `run_eval` against the local mock LLM server.
+
+Runs fully offline:
+
+    python -m benchmarks.bench_eval --sizes 10,1000,100000
+
+Prints one JSON line per size with games/sec, turns/sec, per-turn latency
+quantiles (from the `env.turn` trace span) and the peak RSS of the harness process
+and, with `--workers`, of the largest worker process.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+from pathlib import Path
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from src.config import Config, EnvConfig, ModelConfig, PromptConfig
+from src.main import (
+    GUESSER_SYSTEM_PROMPT,
+    HOST_SYSTEM_PROMPT,
+    KNOWLEDGE_BASE,
+    PROMPT_TEMPLATES,
+    TURN_MAX_TOKENS,
+    run_eval,
+)
+from src.sinks import read_records
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        default="10,1000",
+        help="Comma-separated numbers of games to run.",
+    )
+    parser.add_argument("--max-concurrency", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--batch-games", type=int, default=1)
+    parser.add_argument("--speculative", action="store_true")
+    parser.add_argument("--hedge-quantile", type=float, default=None)
+    parser.add_argument(
+        "--turn-mode", type=str, default="separate", choices=["separate", "combined"]
+    )
+    parser.add_argument("--max-turns", type=int, default=5)
+    parser.add_argument(
+        "--latency-median",
+        type=float,
+        default=0.005,
+        help="Median latency of the mock server in seconds.",
+    )
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument(
+        "--token-latency",
+        type=float,
+        default=0.0,
+        help="Seconds the mock server spends per completion token.",
+    )
+    parser.add_argument(
+        "--padding",
+        type=int,
+        default=0,
+        help="Sentences of chatter the mock server appends to every reply.",
+    )
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--turn-budgets", action="store_true")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def mock_server(
+    latency_median: float,
+    latency_sigma: float,
+    token_latency: float = 0.0,
+    padding: int = 0,
+):
+    """Run the mock server in a subprocess and yield its completions URL."""
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "src.mock_server",
+            "--port",
+            str(port),
+            "--latency-median",
+            str(latency_median),
+            "--latency-sigma",
+            str(latency_sigma),
+            "--token-latency",
+            str(token_latency),
+            "--padding",
+            str(padding),
+        ]
+    )
+    url = f"http://127.0.0.1:{port}/v1/chat/completions"
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(url, timeout=0.1)
+            except urllib.error.HTTPError:
+                break  # Server is up; GET is not allowed on this route
+            except OSError:
+                time.sleep(0.05)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def peak_rss_mb(who: int) -> float:
+    """Peak RSS of this process, or of its largest reaped child process."""
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def bench(args, server_url: str, n_games: int, log_dir: str) -> dict:
+    config = Config(
+        model=ModelConfig(
+            name="mock",
+            max_retries=1,
+            temperature=0.0,
+            backend="vllm",
+            server_url=server_url,
+            # Speculative games have up to three calls in flight
+            pool_size=3 * args.max_concurrency,
+            batch_size=args.batch_size,
+            # The mock server answers a whole batch in one request
+            batch_messages=True,
+            hedge_quantile=args.hedge_quantile,
+            max_tokens=TURN_MAX_TOKENS if args.turn_budgets else None,
+            stream=args.stream,
+        ),
+        env=EnvConfig(
+            max_turns=args.max_turns,
+            knowledge_base=KNOWLEDGE_BASE,
+            batch_games=args.batch_games,
+            turn_mode=args.turn_mode,
+            speculative=args.speculative,
+        ),
+        prompts=PromptConfig(
+            host_system=HOST_SYSTEM_PROMPT,
+            guesser_system=GUESSER_SYSTEM_PROMPT,
+            templates=PROMPT_TEMPLATES,
+        ),
+        run_id=f"bench-{n_games}",
+        n_games=n_games,
+        max_concurrency=args.max_concurrency,
+        workers=args.workers,
+        trace=True,
+    )
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = asyncio.run(run_eval(config, log_dir=log_dir))
+    elapsed = time.perf_counter() - start
+
+    turns = 0
+    games = 0
+    successes = 0
+    for record in read_records("jsonl", Path(log_dir) / config.run_id):
+        games += 1
+        turns += record["num_turns"]
+        successes += record["success"]
+
+    latency = metrics.get("trace", {}).get("spans", {}).get("env.turn", {})
+    return {
+        "games": games,
+        "success_rate": successes / games if games else None,
+        "seconds": elapsed,
+        "games_per_sec": games / elapsed,
+        "turns_per_sec": turns / elapsed,
+        "turn_latency_p50": latency.get("p50"),
+        "turn_latency_p95": latency.get("p95"),
+        "turn_latency_p99": latency.get("p99"),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        # Workers are child processes; the mock server is only reaped at exit
+        "peak_worker_rss_mb": (
+            peak_rss_mb(resource.RUSAGE_CHILDREN) if args.workers > 1 else None
+        ),
+    }
+
+
+def main():
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    with mock_server(
+        args.latency_median, args.latency_sigma, args.token_latency, args.padding
+    ) as server_url:
+        for n_games in sizes:
+            with tempfile.TemporaryDirectory() as log_dir:
+                result = bench(args, server_url, n_games, log_dir)
+            print(json.dumps({"n_games": n_games, **result}))
+
+
+if __name__ == "__main__":
+    main()
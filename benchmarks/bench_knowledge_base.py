@@ -0,0 +1,107 @@
+"""Memory and sampling cost of an in-memory topic list vs the file-backed store.
+
+    python -m benchmarks.bench_knowledge_base --topics 1000000
+
+Writes a catalog of synthetic topics to a temporary file, then loads it as a
+Python list and as a `KnowledgeBase`. Prints one JSON line per variant with the
+load time, Python heap held, random sampling cost and config size, then one for
+the guess matcher: the time to compile it once, to map the compiled file again
+(as every other worker of a run does), the heap held and the cost of a match.
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from src.knowledge_base import KnowledgeBase, build_index
+from src.matcher import load_matcher, matcher_path_for
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=100_000)
+    return parser.parse_args()
+
+
+def load_list(path: Path) -> list[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def bench(name: str, load, config_entry, samples: int) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    knowledge_base = load()
+    load_seconds = time.perf_counter() - start
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sample = timeit.timeit(lambda: random.choice(knowledge_base), number=samples)
+    return {
+        "variant": name,
+        "topics": len(knowledge_base),
+        "load_seconds": load_seconds,
+        "heap_mb": heap / 2**20,
+        "sample_us": sample / samples * 1e6,
+        "config_bytes": len(json.dumps(config_entry(knowledge_base))),
+    }
+
+
+def bench_matcher(path: Path) -> dict:
+    knowledge_base = KnowledgeBase(path)
+    start = time.perf_counter()
+    load_matcher(knowledge_base)
+    compile_seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    matcher = load_matcher(knowledge_base)
+    map_seconds = time.perf_counter() - start
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    guesses = [f"Is it a {knowledge_base.sample()}?" for _ in range(1000)]
+    match = timeit.timeit(lambda: [matcher.match(g) for g in guesses], number=1)
+    return {
+        "variant": "matcher",
+        "topics": len(knowledge_base),
+        "compile_seconds": compile_seconds,
+        "map_seconds": map_seconds,
+        "heap_mb": heap / 2**20,
+        "file_mb": matcher_path_for(path).stat().st_size / 2**20,
+        "match_us": match / len(guesses) * 1e6,
+    }
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "topics.txt"
+        with open(path, "w") as f:
+            for i in range(args.topics):
+                f.write(f"synthetic topic number {i}\n")
+        build_index(path)
+
+        variants = {
+            "list": (lambda: load_list(path), lambda kb: {"knowledge_base": kb}),
+            "mmap": (
+                lambda: KnowledgeBase(path),
+                lambda kb: {
+                    "knowledge_base_path": str(path),
+                    "knowledge_base_hash": kb.content_hash,
+                },
+            ),
+        }
+        for name, (load, config_entry) in variants.items():
+            print(json.dumps(bench(name, load, config_entry, args.samples)))
+        print(json.dumps(bench_matcher(path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Microbenchmark of `PromptManager.format_observation` with a large knowledge base.
+
+    python -m benchmarks.bench_prompts --topics 50000
+
+Compares the compiled templates against the previous implementation, which
+re-joined the template and the knowledge base and scanned the template for every
+observation field on each call. Prints one JSON line per turn type.
+"""
+
+import argparse
+import json
+import timeit
+
+from src.env import AGENT_ROLE, Observation, TURN_TYPE
+from src.main import PROMPT_TEMPLATES
+from src.utils import PromptManager
+
+
+KNOWLEDGE_BASE_TEMPLATE = (
+    "Current game state:\n",
+    "Turn: {turn}\n",
+    "Candidates: {knowledge_base}\n",
+    "Ask a single yes/no question to help identify the topic.",
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=50000)
+    parser.add_argument("--calls", type=int, default=200)
+    return parser.parse_args()
+
+
+def legacy_format_observation(prompt_templates: dict, obs: Observation) -> str:
+    prompt_template = prompt_templates[obs.turn_type]
+    if isinstance(prompt_template, tuple):
+        prompt_template = "".join(prompt_template)
+
+    template_vars = obs._asdict()
+    if obs.knowledge_base is not None:
+        template_vars.update({"knowledge_base": ", ".join(obs.knowledge_base)})
+
+    return prompt_template.format(
+        **{k: v for k, v in template_vars.items() if f"{{{k}}}" in prompt_template}
+    )
+
+
+def bench(templates: dict, obs: Observation, calls: int) -> dict:
+    pm = PromptManager(templates)
+    assert pm.format_observation(obs) == legacy_format_observation(templates, obs)
+
+    legacy = timeit.timeit(
+        lambda: legacy_format_observation(templates, obs), number=calls
+    )
+    compiled = timeit.timeit(lambda: pm.format_observation(obs), number=calls)
+    return {
+        "legacy_us_per_call": legacy / calls * 1e6,
+        "compiled_us_per_call": compiled / calls * 1e6,
+        "speedup": legacy / compiled,
+    }
+
+
+def main():
+    args = parse_args()
+    knowledge_base = [f"topic {i}" for i in range(args.topics)]
+    obs = Observation(
+        turn=3,
+        history=[],
+        turn_type=TURN_TYPE.ASK_QUESTION,
+        active=True,
+        role=AGENT_ROLE.GUESSER,
+        remaining_turns=17,
+        current_question="Is it alive?",
+        current_answer="yes",
+        knowledge_base=knowledge_base,
+    )
+
+    cases = {
+        "guesser_prompt": (PROMPT_TEMPLATES, obs),
+        "knowledge_base_prompt": (
+            {TURN_TYPE.ASK_QUESTION: KNOWLEDGE_BASE_TEMPLATE},
+            obs,
+        ),
+    }
+    for name, (templates, observation) in cases.items():
+        result = bench(templates, observation, args.calls)
+        print(json.dumps({"case": name, "topics": args.topics, **result}))
+
+
+if __name__ == "__main__":
+    main()
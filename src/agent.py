@@ -1,26 +1,57 @@
 from abc import ABC
+import copy
+from typing import TYPE_CHECKING, Optional
 
+from src import tracing
 from src.env import Observation, TURN_TYPE
-from src.model import ModelWrapper
+from src.model import ModelWrapper, call_kind
 from src.utils import PromptManager
 import src.utils as utils
 
+if TYPE_CHECKING:
+    import numpy as np
+
+    from src.oracle import AnswerOracle
+
 
 class BaseAgent(ABC):
+    """Agent acting through an LLM.
+
+    `max_tokens` maps turn type values to the completion budget of calls on those
+    turns. With `stream`, responses are streamed and cut off as soon as the turn's
+    parser has what it needs (see `utils.STOP_CONDITIONS`).
+    """
+
     def __init__(
         self,
         model: ModelWrapper,
         prompt_manager: PromptManager,
+        max_tokens: Optional[dict[str, int]] = None,
+        stream: bool = False,
     ):
         self.model = model
         self.prompt_manager = prompt_manager
+        self.max_tokens = max_tokens or {}
+        self.stream = stream
 
     async def act(self, observation: Observation) -> str:
         """Generate an action based on the observation."""
-        messages = self.prompt_manager.build_agent_prompt(observation)
-        response = await self.model.generate(messages)
-        self.prompt_manager.add_assistant_message(response)
-        return response
+        with tracing.span("agent.act"):
+            messages = self.prompt_manager.build_agent_prompt(observation)
+            turn_type = observation.turn_type
+            kwargs = {}
+            if turn_type.value in self.max_tokens:
+                kwargs["max_tokens"] = self.max_tokens[turn_type.value]
+            with tracing.span("model.generate"), call_kind(turn_type):
+                if self.stream:
+                    stop_when = utils.STOP_CONDITIONS.get(turn_type)
+                    response = await self.model.generate_stream(
+                        messages, stop_when, **kwargs
+                    )
+                else:
+                    response = await self.model.generate(messages, **kwargs)
+            self.prompt_manager.add_assistant_message(response)
+            return response
 
     def _parse_response(self, response: str) -> str:
         """Parse the LLM response to extract the action."""
@@ -29,6 +60,17 @@ class BaseAgent(ABC):
 
 
 class HostAgent(BaseAgent):
+    def __init__(
+        self,
+        model: ModelWrapper,
+        prompt_manager: PromptManager,
+        oracle: Optional["AnswerOracle"] = None,
+        max_tokens: Optional[dict[str, int]] = None,
+        stream: bool = False,
+    ):
+        super().__init__(model, prompt_manager, max_tokens, stream)
+        self.oracle = oracle
+
     # def choose_topic(self, observation: Observation) -> str:
     #     """Host chooses a topic to start the game."""
     #     response = self.act(observation)
@@ -41,6 +83,15 @@ class HostAgent(BaseAgent):
         """Respond to the guesser's question."""
         if observation.turn_type != TURN_TYPE.ANSWER_QUESTION:
             raise ValueError("Host can only respond to questions.")
+
+        if self.oracle is not None:
+            answer = self.oracle.lookup(observation.topic, observation.current_question)
+            if answer is not None:
+                # Keep the conversation consistent for later LLM fallbacks
+                self.prompt_manager.build_agent_prompt(observation)
+                self.prompt_manager.add_assistant_message(answer)
+                return answer
+
         response = await self.act(observation)
         response = utils.check_valid_response(response)
 
@@ -48,6 +99,16 @@ class HostAgent(BaseAgent):
 
 
 class GuesserAgent(BaseAgent):
+    def fork(self) -> "GuesserAgent":
+        """Copy of this guesser that can act without changing this one."""
+        forked = copy.copy(self)
+        forked.prompt_manager = self.prompt_manager.fork()
+        return forked
+
+    def adopt(self, forked: "GuesserAgent"):
+        """Continue from the state of a fork, e.g. the speculative branch kept."""
+        self.__dict__.update(forked.__dict__)
+
     async def ask_question(self, observation: Observation) -> str:
         """Ask a question to narrow down the topic."""
         if observation.turn_type != TURN_TYPE.ASK_QUESTION:
@@ -65,3 +126,186 @@ class GuesserAgent(BaseAgent):
         response = utils.parse_check_guess(response)
 
         return response
+
+    async def guess_and_ask(
+        self, observation: Observation
+    ) -> tuple[str, Optional[str]]:
+        """Guess the topic and ask the next question in a single response."""
+        if observation.turn_type != TURN_TYPE.GUESS_AND_ASK:
+            raise ValueError("Guesser can only guess and ask on combined turns.")
+        response = await self.act(observation)
+        return utils.parse_guess_and_question(response)
+
+
+class InfoGainGuesserAgent(GuesserAgent):
+    """Guesser that narrows the candidates with an answer oracle's matrix.
+
+    The surviving topics of the knowledge base are kept as a boolean mask over the
+    oracle's topics, together with per-question counts of surviving topics known to
+    answer yes and no. Each question is the unasked one with the highest expected
+    information gain, found in one vectorized pass over those counts, so selection
+    costs O(questions) whatever the number of topics. When a single candidate is
+    left it is guessed without calling the LLM. Without a useful question, or with
+    several candidates left at guess time, it falls back to the LLM.
+    """
+
+    def __init__(
+        self,
+        model: ModelWrapper,
+        prompt_manager: PromptManager,
+        oracle: "AnswerOracle",
+        max_tokens: Optional[dict[str, int]] = None,
+        stream: bool = False,
+    ):
+        import numpy as np
+
+        super().__init__(model, prompt_manager, max_tokens, stream)
+        self.oracle = oracle
+        self.candidates = None
+        self.yes_counts = None
+        self.no_counts = None
+        # Answers so far while they are shared through the oracle's candidate tree
+        self.tree = None
+        self.path = None
+        self.asked = np.zeros(len(oracle.questions), dtype=bool)
+        self.pending_question = None
+        self.pending_guess = None
+
+    def fork(self) -> "InfoGainGuesserAgent":
+        forked = super().fork()
+        forked.asked = self.asked.copy()
+        forked.tree = self.tree
+        forked.path = self.path
+        if self.candidates is not None:
+            forked.candidates = self.candidates.copy()
+            forked.yes_counts = self.yes_counts.copy()
+            forked.no_counts = self.no_counts.copy()
+        return forked
+
+    def _init_candidates(self, knowledge_base: list[str]):
+        self.tree = self.oracle.candidate_tree(knowledge_base)
+        self.path = ()
+        self._adopt(self.tree.root())
+
+    def _adopt(self, node: tuple):
+        candidates, yes, no = node
+        self.candidates = candidates.copy()
+        self.yes_counts = yes.copy()
+        self.no_counts = no.copy()
+
+    def _remove(self, removed: "np.ndarray"):
+        """Drop topics from the candidates and update the per-question counts."""
+        if not removed.any():
+            return
+        removed_yes, removed_no = self.oracle.answer_counts(removed)
+        self.yes_counts -= removed_yes
+        self.no_counts -= removed_no
+        self.candidates &= ~removed
+        self.path = None
+
+    def _apply_answer(self, question: int, answer: bool):
+        if self.path is not None:
+            node = self.tree.child(self.path, question, answer)
+            if node is not None:
+                self.path += ((question, answer),)
+                self._adopt(node)
+                return
+            self.path = None
+
+        column = self.oracle.answers[:, question]
+        known = self.oracle.known[:, question]
+        self._remove(self.candidates & known & (column != answer))
+
+    def best_question(self) -> Optional[int]:
+        """Index of the unasked question that best splits the candidates."""
+        import numpy as np
+
+        n_candidates = np.count_nonzero(self.candidates)
+        yes = self.yes_counts.astype(np.float64)
+        no = self.no_counts.astype(np.float64)
+        labelled = yes + no
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p = yes / labelled
+            entropy = -(p * np.log2(p) + (1 - p) * np.log2(1 - p))
+        # Weight by the share of candidates the question is labelled for
+        gain = np.nan_to_num(entropy) * labelled / max(n_candidates, 1)
+        gain[self.asked] = 0.0
+
+        best = int(np.argmax(gain))
+        return best if gain[best] > 0 else None
+
+    def _record(self, observation: Observation, response: str):
+        """Keep the conversation consistent for later LLM fallbacks."""
+        self.prompt_manager.build_agent_prompt(observation)
+        self.prompt_manager.add_assistant_message(response)
+
+    async def ask_question(self, observation: Observation) -> str:
+        """Ask the most informative question from the oracle."""
+        import numpy as np
+
+        if observation.turn_type != TURN_TYPE.ASK_QUESTION:
+            raise ValueError("Guesser can only ask questions.")
+
+        if self.candidates is None:
+            self._init_candidates(observation.knowledge_base or [])
+
+        # The game went on, so the previous single-candidate guess was wrong
+        if self.pending_guess is not None:
+            removed = np.zeros_like(self.candidates)
+            removed[self.pending_guess] = True
+            self._remove(removed)
+            self.pending_guess = None
+
+        question = self.best_question() if self.candidates.any() else None
+        if question is None:
+            return await super().ask_question(observation)
+
+        self.asked[question] = True
+        self.pending_question = question
+        response = self.oracle.questions[question]
+        self._record(observation, response)
+        return response
+
+    async def make_guess(self, observation: Observation) -> str:
+        """Guess the last candidate directly, or ask the LLM when several remain."""
+        import numpy as np
+
+        if observation.turn_type != TURN_TYPE.MAKE_GUESS:
+            raise ValueError("Guesser can only make guesses.")
+
+        answer = observation.current_answer
+        if self.pending_question is not None and answer in ("yes", "no"):
+            self._apply_answer(self.pending_question, answer == "yes")
+        self.pending_question = None
+
+        if self.candidates is not None and np.count_nonzero(self.candidates) == 1:
+            self.pending_guess = int(np.flatnonzero(self.candidates)[0])
+            guess = self.oracle.topics[self.pending_guess]
+            self._record(observation, guess)
+            return guess
+
+        return await super().make_guess(observation)
+
+    async def guess_and_ask(
+        self, observation: Observation
+    ) -> tuple[str, Optional[str]]:
+        """Guess, then pick the next question assuming the guess was wrong.
+
+        Questions come from the oracle, so the two halves are not merged into one
+        LLM call; if the guess is right the question is simply unused.
+        """
+        if observation.turn_type != TURN_TYPE.GUESS_AND_ASK:
+            raise ValueError("Guesser can only guess and ask on combined turns.")
+        guess = await self.make_guess(
+            observation._replace(turn_type=TURN_TYPE.MAKE_GUESS)
+        )
+        question = await self.ask_question(
+            observation._replace(
+                turn=observation.turn + 1,
+                turn_type=TURN_TYPE.ASK_QUESTION,
+                current_question=None,
+                current_answer=None,
+            )
+        )
+        return guess, question
@@ -0,0 +1,265 @@
+import random
+import time
+from typing import Optional, Sequence
+
+from src import tracing
+from src.env import AGENT_ROLE, Observation, TURN_TYPE
+from src.matcher import get_matcher
+from src.exceptions import (
+    InvalidQuestionError,
+    InvalidGuessError,
+    InvalidAnswerError,
+)
+from src.model import ModelWrapper
+from src.utils import PromptManager
+import src.utils as utils
+
+
+class Game20QEnvBatch:
+    """N games of 20 questions stepped in lockstep, one batched model call per phase.
+
+    Game state is held as struct-of-arrays (turn counters, topics, pending
+    questions and answers, done and success masks, finish times) instead of one
+    environment object per game. Every `step` advances all unfinished games through the same
+    phase (ask, answer or guess) and sends their prompts to the model in a single
+    `generate_batch` call. Finished games are masked out of later phases; their
+    slots are kept, so nothing is reallocated while the batch runs.
+
+    The agents are plain LLM agents: each game has a host and a guesser
+    `PromptManager`, and responses are parsed as `HostAgent` and `GuesserAgent`
+    do. A game whose response cannot be parsed ends with that error recorded in
+    `errors`, like the exception a single-game `Game20QEnv` would raise.
+    `max_tokens` maps turn type values to the completion budget of each phase.
+    """
+
+    def __init__(
+        self,
+        model: ModelWrapper,
+        host_prompts: list[PromptManager],
+        guesser_prompts: list[PromptManager],
+        knowledge_base: Sequence[str],
+        debug: bool = False,
+        max_turns: int = 20,
+        max_tokens: Optional[dict[str, int]] = None,
+        aliases: Optional[dict[str, list[str]]] = None,
+    ):
+        import numpy as np
+
+        if len(host_prompts) != len(guesser_prompts):
+            raise ValueError("Each game needs a host and a guesser prompt manager.")
+
+        self.model = model
+        self.host_prompts = host_prompts
+        self.guesser_prompts = guesser_prompts
+        self.knowledge_base = knowledge_base
+        self.debug = debug
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens or {}
+        self.matcher = get_matcher(knowledge_base, aliases)
+        self.num_games = len(host_prompts)
+
+        # State arrays, one slot per game
+        n = self.num_games
+        self.turn = np.ones(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.success = np.zeros(n, dtype=bool)
+        self.finished_at = np.zeros(n)
+        self.topics: list[Optional[str]] = [None] * n
+        self.histories: list[list[dict]] = [[] for _ in range(n)]
+        self.current_questions: list[Optional[str]] = [None] * n
+        self.current_answers: list[Optional[str]] = [None] * n
+        self.errors: list[Optional[Exception]] = [None] * n
+        self.current_type = TURN_TYPE.ASK_QUESTION
+        self.turn_started = None
+
+    def reset(self, topics: Optional[list[str]] = None):
+        """Start every game, with the given topics or random ones."""
+        self.turn[:] = 1
+        self.done[:] = False
+        self.success[:] = False
+        self.finished_at[:] = 0.0
+        self.topics = (
+            list(topics)
+            if topics is not None
+            else [random.choice(self.knowledge_base) for _ in range(self.num_games)]
+        )
+        for history in self.histories:
+            history.clear()
+        self.current_questions = [None] * self.num_games
+        self.current_answers = [None] * self.num_games
+        self.errors = [None] * self.num_games
+        self.current_type = TURN_TYPE.ASK_QUESTION
+
+        if self.debug:
+            print(f"[DEBUG] Topics: {self.topics}")
+
+    def active(self):
+        """Indices of the games still being played."""
+        import numpy as np
+
+        return np.flatnonzero(~self.done)
+
+    @property
+    def all_done(self) -> bool:
+        return bool(self.done.all())
+
+    async def step(self) -> dict:
+        """Advance every unfinished game through the current phase."""
+        active = self.active()
+        if len(active) == 0:
+            return {"action": "end_game", "reason": "all_done"}
+
+        # Games are in lockstep, so they all run out of turns together
+        if self.turn[active[0]] > self.max_turns:
+            self.done[active] = True
+            self.finished_at[active] = time.perf_counter()
+            return {"action": "end_game", "reason": "max_turns"}
+
+        with tracing.span("env.step"):
+            if self.current_type == TURN_TYPE.ASK_QUESTION:
+                with tracing.span("env.ask_question"):
+                    return await self._handle_ask_question(active)
+            elif self.current_type == TURN_TYPE.ANSWER_QUESTION:
+                with tracing.span("env.answer_question"):
+                    return await self._handle_answer_question(active)
+            elif self.current_type == TURN_TYPE.MAKE_GUESS:
+                with tracing.span("env.make_guess"):
+                    return await self._handle_make_guess(active)
+
+    async def run(self):
+        """Play every game to the end."""
+        while not self.all_done:
+            await self.step()
+
+    async def _generate(
+        self, prompts: list[PromptManager], active, role: AGENT_ROLE
+    ) -> list[Optional[str]]:
+        """Send the prompts of the active games as one batch; None where it failed."""
+        messages = [
+            prompts[i].build_agent_prompt(self._observation(i, role)) for i in active
+        ]
+        kwargs = {}
+        if self.current_type.value in self.max_tokens:
+            kwargs["max_tokens"] = self.max_tokens[self.current_type.value]
+        try:
+            responses = await self.model.generate_batch(messages, **kwargs)
+        except Exception as e:
+            for i in active:
+                self._fail(i, e)
+            return [None] * len(active)
+
+        for i, response in zip(active, responses):
+            prompts[i].add_assistant_message(response)
+        return responses
+
+    async def _handle_ask_question(self, active) -> dict:
+        self.turn_started = time.perf_counter()
+        responses = await self._generate(
+            self.guesser_prompts, active, AGENT_ROLE.GUESSER
+        )
+        for i, response in zip(active, responses):
+            if self.done[i]:
+                continue
+            try:
+                question = utils.parse_check_question(response)
+            except ValueError as e:
+                self._fail(i, e)
+                continue
+            if not isinstance(question, str):
+                self._fail(
+                    i, InvalidQuestionError("Guesser must ask a valid question.")
+                )
+                continue
+            self.current_questions[i] = question
+
+        self.current_type = TURN_TYPE.ANSWER_QUESTION
+        return {"action": "question_asked", "games": len(active)}
+
+    async def _handle_answer_question(self, active) -> dict:
+        responses = await self._generate(self.host_prompts, active, AGENT_ROLE.HOST)
+        for i, response in zip(active, responses):
+            if self.done[i]:
+                continue
+            try:
+                answer = utils.check_valid_response(response)
+            except ValueError as e:
+                self._fail(i, e)
+                continue
+            if answer not in ["yes", "no"]:
+                self._fail(
+                    i, InvalidAnswerError("Host must respond with 'yes' or 'no'.")
+                )
+                continue
+            self.current_answers[i] = answer
+
+        self.current_type = TURN_TYPE.MAKE_GUESS
+        return {"action": "question_answered", "games": len(active)}
+
+    async def _handle_make_guess(self, active) -> dict:
+        responses = await self._generate(
+            self.guesser_prompts, active, AGENT_ROLE.GUESSER
+        )
+        for i, response in zip(active, responses):
+            if self.done[i]:
+                continue
+            try:
+                guess = utils.parse_check_guess(response)
+            except ValueError as e:
+                self._fail(i, e)
+                continue
+            if not isinstance(guess, str):
+                self._fail(i, InvalidGuessError("Guesser must make a valid guess."))
+                continue
+
+            self.histories[i].append(
+                {
+                    "turn": int(self.turn[i]),
+                    "question": self.current_questions[i],
+                    "answer": self.current_answers[i],
+                    "guess": guess,
+                    "guess_topic": self.matcher.resolve(guess),
+                }
+            )
+            if self._check_guess(i, guess):
+                self.done[i] = True
+                self.success[i] = True
+                self.finished_at[i] = time.perf_counter()
+            else:
+                self.turn[i] += 1
+                self.current_questions[i] = None
+                self.current_answers[i] = None
+
+        if self.turn_started is not None:
+            tracing.record("env.turn", time.perf_counter() - self.turn_started)
+        self.current_type = TURN_TYPE.ASK_QUESTION
+        return {"action": "guess_made", "games": len(active)}
+
+    def _fail(self, i: int, error: Exception):
+        self.done[i] = True
+        self.finished_at[i] = time.perf_counter()
+        self.errors[i] = error
+        if self.debug:
+            print(f"[DEBUG] Game {i} ended: {error!r}")
+
+    def _check_guess(self, i: int, guess: str) -> bool:
+        """Check if guess names the topic of game `i`"""
+        topic_id = self.matcher.match(self.topics[i])
+        if topic_id is None:
+            return self.topics[i].lower().strip() in guess.lower().strip()
+        return self.matcher.match(guess) == topic_id
+
+    def _observation(self, i: int, role: AGENT_ROLE) -> Observation:
+        """Observation of game `i`, as `Game20QEnv` gives it to the agent in `role`."""
+        is_host = role == AGENT_ROLE.HOST
+        return Observation(
+            turn=int(self.turn[i]),
+            history=self.histories[i],
+            turn_type=self.current_type,
+            active=(self.current_type == TURN_TYPE.ANSWER_QUESTION) == is_host,
+            role=role,
+            remaining_turns=self.max_turns - int(self.turn[i]),
+            current_question=self.current_questions[i],
+            current_answer=self.current_answers[i],
+            topic=self.topics[i] if is_host else None,
+            knowledge_base=None if is_host else self.knowledge_base,
+        )
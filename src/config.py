@@ -1,6 +1,7 @@
 from dataclasses import dataclass, asdict, field
 from enum import Enum
 from pathlib import Path
+from typing import Optional
 import json
 
 from src.env import TURN_TYPE
@@ -11,6 +12,25 @@ class ModelConfig:
     name: str = "gpt-4o-mini"
     max_retries: int = 3
     temperature: float = 0.7
+    backend: str = "openai"
+    pool_size: int = 100
+    keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    server_url: Optional[str] = None
+    timeout: float = 60.0
+    batch_size: int = 1
+    batch_window: float = 0.005
+    # Send a vllm batch as one request (a protocol of src.mock_server only)
+    batch_messages: bool = False
+    cache_size: int = 0
+    cache_path: Optional[str] = None
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    hedge_quantile: Optional[float] = None
+    hedge_max_ratio: float = 0.1
+    # Completion budget per turn type value, e.g. {"answer_question": 8}
+    max_tokens: Optional[dict[str, int]] = None
+    stream: bool = False
 
 
 @dataclass
@@ -20,6 +40,16 @@ class EnvConfig:
     knowledge_base: list[str] = field(
         default_factory=lambda: ["dog", "cat", "chicken", "car", "plane"]
     )
+    # A topics file (see src.knowledge_base) used instead of `knowledge_base`
+    knowledge_base_path: Optional[str] = None
+    knowledge_base_hash: Optional[str] = None
+    # Other names a guess may use for a topic, e.g. {"plane": ["airplane"]}
+    aliases: dict[str, list[str]] = field(default_factory=dict)
+    oracle_path: Optional[str] = None
+    guesser: str = "llm"
+    batch_games: int = 1
+    turn_mode: str = "separate"
+    speculative: bool = False
 
 
 @dataclass
@@ -27,11 +57,15 @@ class PromptConfig:
     host_system: str
     guesser_system: str
     templates: dict[str, dict[str, str]]
+    history_window: Optional[int] = None
+    max_prompt_tokens: Optional[int] = None
 
     def encode(self) -> dict:
         return {
             "host_system": self.host_system,
             "guesser_system": self.guesser_system,
+            "history_window": self.history_window,
+            "max_prompt_tokens": self.max_prompt_tokens,
             "templates": {
                 k.value if isinstance(k, Enum) else k: v
                 for k, v in self.templates.items()
@@ -48,6 +82,8 @@ class PromptConfig:
             host_system=data["host_system"],
             guesser_system=data["guesser_system"],
             templates=templates,
+            history_window=data.get("history_window"),
+            max_prompt_tokens=data.get("max_prompt_tokens"),
         )
 
 
@@ -58,13 +94,32 @@ class Config:
     prompts: PromptConfig
     run_id: str
     n_games: int = 1
+    max_concurrency: int = 16
+    workers: int = 1
+    sink: str = "jsonl"
+    trace: bool = False
+    stop_width: Optional[float] = None
+    stop_threshold: Optional[float] = None
+    stop_alpha: float = 0.05
 
     def save(self, path: Path):
+        env = asdict(self.env)
+        # A file-backed knowledge base is referenced by path and hash, not copied
+        if self.env.knowledge_base_path is not None:
+            del env["knowledge_base"]
         data = {
             "model": asdict(self.model),
-            "env": asdict(self.env),
+            "env": env,
             "prompts": self.prompts.encode(),
+            "run_id": self.run_id,
             "n_games": self.n_games,
+            "max_concurrency": self.max_concurrency,
+            "workers": self.workers,
+            "sink": self.sink,
+            "trace": self.trace,
+            "stop_width": self.stop_width,
+            "stop_threshold": self.stop_threshold,
+            "stop_alpha": self.stop_alpha,
         }
 
         with open(path, "w") as f:
@@ -78,5 +133,14 @@ class Config:
                 model=ModelConfig(**data["model"]),
                 env=EnvConfig(**data["env"]),
                 prompts=PromptConfig.decode(data["prompts"]),
+                # Older configs did not store the run id, which names their directory
+                run_id=data.get("run_id", Path(path).parent.name),
                 n_games=data["n_games"],
+                max_concurrency=data.get("max_concurrency", 16),
+                workers=data.get("workers", 1),
+                sink=data.get("sink", "jsonl"),
+                trace=data.get("trace", False),
+                stop_width=data.get("stop_width"),
+                stop_threshold=data.get("stop_threshold"),
+                stop_alpha=data.get("stop_alpha", 0.05),
             )
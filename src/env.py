@@ -1,6 +1,12 @@
+import asyncio
+from collections import Counter
 from enum import Enum
-from typing import NamedTuple, Optional
+from typing import NamedTuple, Optional, Sequence
 import random
+import time
+
+from src import tracing
+from src.matcher import get_matcher
 from src.exceptions import (
     InvalidQuestionError,
     InvalidGuessError,
@@ -12,9 +18,15 @@ class TURN_TYPE(Enum):
     ASK_QUESTION = "ask_question"
     ANSWER_QUESTION = "answer_question"
     MAKE_GUESS = "make_guess"
+    GUESS_AND_ASK = "guess_and_ask"
     WAIT = "wait"
 
 
+# "separate": ask, answer and guess are three model calls per turn.
+# "combined": the guess and the next question come from a single guesser call.
+TURN_MODES = ("separate", "combined")
+
+
 class AGENT_ROLE(Enum):
     HOST = 0
     GUESSER = 1
@@ -30,7 +42,7 @@ class Observation(NamedTuple):
     current_question: Optional[str] = None
     current_answer: Optional[str] = None
     topic: Optional[str] = None
-    knowledge_base: Optional[list[str]] = None
+    knowledge_base: Optional[Sequence[str]] = None
 
 
 class StepResult(NamedTuple):
@@ -45,23 +57,40 @@ class Game20QEnv:
         self,
         host_agent: any,
         guesser_agent: any,
-        knowledge_base: list[str],
+        knowledge_base: Sequence[str],
         debug: bool = False,
         max_turns: int = 20,
+        turn_mode: str = "separate",
+        speculative: bool = False,
+        aliases: Optional[dict[str, list[str]]] = None,
     ):
+        if turn_mode not in TURN_MODES:
+            raise ValueError(f"Unknown turn mode: {turn_mode}")
+
         self.host = host_agent
         self.guesser = guesser_agent
         self.debug = debug
         self.max_turns = max_turns
+        self.turn_mode = turn_mode
+        # Start the guesser's next call for both answers while the host answers
+        self.speculative = speculative
 
         # State variables
         self.turn = 1
         self.topic = None
         self.knowledge_base = knowledge_base
+        # Resolves guesses to topics, shared by the games of a run
+        self.matcher = get_matcher(knowledge_base, aliases)
         self.history = []
         self.current_question = None
         self.current_answer = None
         self.current_type = TURN_TYPE.ASK_QUESTION
+        self.turn_started = None
+        self.speculation = None
+        # Speculative branches that lost, kept until `settle_speculation`
+        self.discarded = []
+        # Tokens used by the branches that lost, whether or not the game is traced
+        self.speculative_tokens = Counter()
 
     def reset(self) -> list[Observation]:
         """Reset environment"""
@@ -72,6 +101,9 @@ class Game20QEnv:
         self.current_type = TURN_TYPE.ASK_QUESTION
         self.current_question = None
         self.current_answer = None
+        self.speculation = None
+        self.discarded = []
+        self.speculative_tokens = Counter()
 
         if self.debug:
             print(f"[DEBUG] Topic: {self.topic}")
@@ -83,15 +115,23 @@ class Game20QEnv:
         if self.turn > self.max_turns:
             return self._end_game("max_turns")
 
-        if self.current_type == TURN_TYPE.ASK_QUESTION:
-            return await self._handle_ask_question()
-        elif self.current_type == TURN_TYPE.ANSWER_QUESTION:
-            return await self._handle_answer_question()
-        elif self.current_type == TURN_TYPE.MAKE_GUESS:
-            return await self._handle_make_guess()
+        with tracing.span("env.step"):
+            if self.current_type == TURN_TYPE.ASK_QUESTION:
+                with tracing.span("env.ask_question"):
+                    return await self._handle_ask_question()
+            elif self.current_type == TURN_TYPE.ANSWER_QUESTION:
+                with tracing.span("env.answer_question"):
+                    return await self._handle_answer_question()
+            elif self.current_type == TURN_TYPE.MAKE_GUESS:
+                with tracing.span("env.make_guess"):
+                    return await self._handle_make_guess()
+            elif self.current_type == TURN_TYPE.GUESS_AND_ASK:
+                with tracing.span("env.guess_and_ask"):
+                    return await self._handle_guess_and_ask()
 
     async def _handle_ask_question(self) -> StepResult:
         """Handle guesser asking question"""
+        self.turn_started = time.perf_counter()
         question = await self.guesser.ask_question(
             self._get_observations()[AGENT_ROLE.GUESSER.value]
         )
@@ -110,16 +150,30 @@ class Game20QEnv:
 
     async def _handle_answer_question(self) -> StepResult:
         """Handle host answering question"""
-        answer = await self.host.respond(
-            self._get_observations()[AGENT_ROLE.HOST.value]
-        )
-        answer = answer.lower().strip()
+        # The guesser's next call does not depend on the answer. In combined mode it
+        # asks its next question along with the guess, except on the last turn
+        # which has no next question
+        if self.turn_mode == "combined" and self.turn < self.max_turns:
+            next_type = TURN_TYPE.GUESS_AND_ASK
+        else:
+            next_type = TURN_TYPE.MAKE_GUESS
+
+        branches = self._speculate(next_type) if self.speculative else {}
+        try:
+            answer = await self.host.respond(
+                self._get_observations()[AGENT_ROLE.HOST.value]
+            )
+            answer = answer.lower().strip()
 
-        if answer not in ["yes", "no"]:
-            raise InvalidAnswerError("Host must respond with 'yes' or 'no'.")
+            if answer not in ["yes", "no"]:
+                raise InvalidAnswerError("Host must respond with 'yes' or 'no'.")
+
+            self.speculation = branches.pop(answer, None)
+        finally:
+            self._discard(branches.values())
 
         self.current_answer = answer
-        self.current_type = TURN_TYPE.MAKE_GUESS
+        self.current_type = next_type
 
         return StepResult(
             self._get_observations(),
@@ -128,23 +182,92 @@ class Game20QEnv:
             {"action": "question_answered", "answer": answer},
         )
 
+    def _speculate(self, turn_type: TURN_TYPE) -> dict:
+        """Start the guesser's next call on a fork for each possible answer."""
+        guesser_obs = self._get_observations()[AGENT_ROLE.GUESSER.value]
+        branches = {}
+        for answer in ("yes", "no"):
+            fork = self.guesser.fork()
+            obs = guesser_obs._replace(
+                turn_type=turn_type, active=True, current_answer=answer
+            )
+            if turn_type == TURN_TYPE.MAKE_GUESS:
+                act = fork.make_guess
+            else:
+                act = fork.guess_and_ask
+            # Each branch traces into its own tracer until it is kept or discarded,
+            # which also counts its tokens when the game is not traced
+            tracer = tracing.Tracer()
+            task = asyncio.create_task(self._run_branch(act, obs, tracer))
+            branches[answer] = (fork, task, tracer)
+        tracing.count("speculative.branches", len(branches))
+        return branches
+
+    @staticmethod
+    async def _run_branch(act, obs: Observation, tracer: tracing.Tracer):
+        token = tracing.activate(tracer)
+        try:
+            return await act(obs)
+        finally:
+            tracing.deactivate(token)
+
+    def _discard(self, branches):
+        """Drop speculative branches, leaving them to finish in the background.
+
+        Branches are not cancelled: cancelling a request that is about to get a
+        pooled connection can lose the pool's wake-up and stall the other calls
+        waiting for a connection.
+        """
+        for _, task, tracer in branches:
+            tracing.count("speculative.discarded")
+            self.discarded.append((task, tracer))
+
+    async def settle_speculation(self):
+        """Wait for the discarded branches and count the tokens they used.
+
+        Call this before taking the game's result, so that its speculative cost
+        is complete and recorded while the game's tracer is still current.
+        """
+        if self.speculation is not None:
+            self._discard([self.speculation])
+            self.speculation = None
+        discarded, self.discarded = self.discarded, []
+        if not discarded:
+            return
+
+        await asyncio.wait([task for task, _ in discarded])
+        for task, tracer in discarded:
+            if not task.cancelled():
+                task.exception()  # Errors of a discarded branch do not matter
+            for name in ("prompt", "completion"):
+                tokens = tracer.counters[f"tokens.{name}"]
+                self.speculative_tokens[name] += tokens
+                tracing.count(f"speculative.tokens.{name}", tokens)
+
+    async def _guesser_act(self, turn_type: TURN_TYPE):
+        """Run the guesser's call for this turn, or take the kept speculative branch."""
+        if self.speculation is None:
+            observation = self._get_observations()[AGENT_ROLE.GUESSER.value]
+            if turn_type == TURN_TYPE.MAKE_GUESS:
+                return await self.guesser.make_guess(observation)
+            return await self.guesser.guess_and_ask(observation)
+
+        fork, task, tracer = self.speculation
+        self.speculation = None
+        result = await task
+        self.guesser.adopt(fork)
+        current = tracing.current()
+        if current is not None:
+            current.merge(tracer)
+        return result
+
     async def _handle_make_guess(self) -> StepResult:
         """Handle guesser making guess"""
-        guess = await self.guesser.make_guess(
-            self._get_observations()[AGENT_ROLE.GUESSER.value]
-        )
+        guess = await self._guesser_act(TURN_TYPE.MAKE_GUESS)
         if not isinstance(guess, str):
             raise InvalidGuessError("Guesser must make a valid guess.")
 
-        # Record completed turn
-        turn_info = {
-            "turn": self.turn,
-            "question": self.current_question,
-            "answer": self.current_answer,
-            "guess": guess,
-        }
-        self.history.append(turn_info)
-
+        turn_info = self._record_turn(guess)
         is_correct = self._check_guess(guess)
         if is_correct:
             return self._end_game("correct_guess")
@@ -162,6 +285,47 @@ class Game20QEnv:
             {"action": "guess_made", "turn_info": turn_info},
         )
 
+    async def _handle_guess_and_ask(self) -> StepResult:
+        """Handle guesser making guess and asking the next question in one call"""
+        guess, question = await self._guesser_act(TURN_TYPE.GUESS_AND_ASK)
+        if not isinstance(guess, str):
+            raise InvalidGuessError("Guesser must make a valid guess.")
+
+        turn_info = self._record_turn(guess)
+        is_correct = self._check_guess(guess)
+        if is_correct:
+            return self._end_game("correct_guess")
+
+        # The question belongs to the next turn
+        self.turn += 1
+        self.turn_started = time.perf_counter()
+        if not isinstance(question, str):
+            raise InvalidQuestionError("Guesser must ask a valid question.")
+        self.current_question = question
+        self.current_answer = None
+        self.current_type = TURN_TYPE.ANSWER_QUESTION
+
+        return StepResult(
+            self._get_observations(),
+            [0.0, 0.0],
+            [False, False],
+            {"action": "guess_made", "turn_info": turn_info, "question": question},
+        )
+
+    def _record_turn(self, guess: str) -> dict:
+        """Record the completed turn"""
+        turn_info = {
+            "turn": self.turn,
+            "question": self.current_question,
+            "answer": self.current_answer,
+            "guess": guess,
+            "guess_topic": self.matcher.resolve(guess),
+        }
+        self.history.append(turn_info)
+        if self.turn_started is not None:
+            tracing.record("env.turn", time.perf_counter() - self.turn_started)
+        return turn_info
+
     def _get_observations(self) -> list[Observation]:
         """Get current observations for both agents"""
         return [
@@ -181,7 +345,11 @@ class Game20QEnv:
                 history=self.history,
                 turn_type=self.current_type,
                 active=self.current_type
-                in [TURN_TYPE.ASK_QUESTION, TURN_TYPE.MAKE_GUESS],
+                in [
+                    TURN_TYPE.ASK_QUESTION,
+                    TURN_TYPE.MAKE_GUESS,
+                    TURN_TYPE.GUESS_AND_ASK,
+                ],
                 role=AGENT_ROLE.GUESSER,
                 remaining_turns=self.max_turns - self.turn,
                 current_question=self.current_question,
@@ -191,12 +359,12 @@ class Game20QEnv:
         ]
 
     def _check_guess(self, guess: str) -> bool:
-        """Check if guess is correct"""
-
-        guess = guess.lower().strip()
-        topic = self.topic.lower().strip()
-
-        return topic in guess
+        """Check if guess names the topic"""
+        topic_id = self.matcher.match(self.topic)
+        if topic_id is None:
+            # A topic without any word to match on, e.g. only punctuation
+            return self.topic.lower().strip() in guess.lower().strip()
+        return self.matcher.match(guess) == topic_id
 
     def _end_game(self, reason: str) -> StepResult:
         """End game due to max turns or correct guess"""
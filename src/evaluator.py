@@ -1,12 +1,12 @@
 from dataclasses import dataclass, asdict
 from datetime import datetime
-import json
 from pathlib import Path
 from typing import Optional
 
-import pandas as pd
-
 from src.config import Config
+from src.metrics import RunningStats, SequentialStopper, merge_counts
+from src.sinks import make_sink, read_records
+from src.tracing import Tracer
 
 
 @dataclass
@@ -17,24 +17,92 @@ class Result:
     history: list[dict]
     timestamp: str
     failure: Optional[str] = None
+    duration: Optional[float] = None
+    timings: Optional[dict] = None
+    turn_mode: str = "separate"
+    game_id: Optional[int] = None
+    # Prompt/completion tokens of the speculative branches that were discarded
+    speculative_tokens: Optional[dict] = None
 
 
 class Evaluator:
-    def __init__(self, config: Config, log_dir: str = "logs"):
+    def __init__(
+        self,
+        config: Config,
+        log_dir: str = "logs",
+        sink: str = "jsonl",
+        keep_results: bool = False,
+        shard: Optional[int] = None,
+        resume: bool = False,
+    ):
         self.log_dir = Path(log_dir) / config.run_id
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        # Shards of a multi-process run share the run directory with their own files
+        self.sink = make_sink(sink, self.log_dir, shard=shard)
+        # Games are summarized by `stats` and written to the sink; only keep the
+        # full results in memory when asked to
+        self.keep_results = keep_results
         self.results = []
+        self.stats = RunningStats()
+        self.model_stats = {}
+        # Ids of the games already logged to this run directory
+        self.completed = set()
         self.config = config
-        self.config.save(self.log_dir / "config.json")
+        self.stopper = None
+        if config.stop_width is not None or config.stop_threshold is not None:
+            self.stopper = SequentialStopper(
+                alpha=config.stop_alpha,
+                target_width=config.stop_width,
+                threshold=config.stop_threshold,
+            )
+        if resume:
+            self._load_completed(sink)
+        if shard is None:
+            self.config.save(self.log_dir / "config.json")
+
+    def _load_completed(self, sink: str):
+        """Rebuild the stats of the games an interrupted run already logged."""
+        fields = Result.__dataclass_fields__
+        for record in read_records(sink, self.log_dir):
+            game_id = record.get("game_id")
+            if game_id is None or game_id in self.completed:
+                continue
+            result = Result(**{k: v for k, v in record.items() if k in fields})
+            self.completed.add(game_id)
+            self.stats.update(result)
+            if self.stopper is not None:
+                self.stopper.add(game_id, result.success)
+            if self.keep_results:
+                self.results.append(result)
 
-    def log_game(self, result: Result):
-        """Log the result of a game."""
+    def log_game(self, result: Result, tracer: Optional[Tracer] = None):
+        """Log the result of a game, with its trace if it was traced."""
         result.timestamp = datetime.now().isoformat()
-        self.results.append(result)
+        self.stats.update(result)
+        if self.stopper is not None and result.game_id is not None:
+            self.stopper.add(result.game_id, result.success)
+        if tracer is not None:
+            self.stats.add_trace(tracer)
+        if self.keep_results:
+            self.results.append(result)
+        self.sink.write(asdict(result))
+
+    def should_stop(self) -> bool:
+        """Whether the early-stopping criterion, if any, is met by the games so far."""
+        return self.stopper is not None and self.stopper.check()
+
+    def close(self):
+        """Flush every logged game to disk."""
+        self.sink.close()
 
-        log_file = self.log_dir / f"game_{result.timestamp}.json"
-        with open(log_file, "w") as f:
-            json.dump(asdict(result), f)
+    def log_model_stats(self, stats: dict):
+        """Record model activity counters (cache hits, batches, ...) for the run."""
+        self.model_stats = stats
+
+    def merge(self, stats: RunningStats, model_stats: dict):
+        """Fold in the stats of a shard of this run played by another process."""
+        self.stats.merge(stats)
+        self.model_stats = merge_counts(self.model_stats, model_stats)
 
     def calculate_metrics(self) -> dict:
         """Calculate metrics for the game agents.
@@ -42,20 +110,26 @@ class Evaluator:
         2. Average Turns: Average number of turns taken to guess the topic.
         3. Failure Counts: Count of each type of failure, to track agent's potential issues.
         4. # topics: Difficulty of the game.
+        5. Game latency: Quantiles of the wall-clock time per game.
+        6. Early stopping: With a stopping rule, the success-rate confidence interval
+           and how many of the `n_games` were not played.
+        7. Guess confusion: Per topic, the other topics wrong guesses named, and the
+           number of guesses that named no topic of the knowledge base.
+
+        Metrics are maintained incrementally by `log_game`, so this is cheap to call
+        at any point during a run.
 
         Returns:
-            dict: _description_
+            dict: Metric name to value; empty if no game was logged.
         """
-        if not self.results:
+        metrics = self.stats.summary()
+        if not metrics:
             return {}
 
-        df = pd.DataFrame([asdict(result) for result in self.results])
-
-        metrics = {
-            "total games": len(df),
-            "guess_success_rate": df.success.mean(),
-            "average_turns": df.num_turns.mean(),
-            "failure_counts": df.failure.value_counts().to_dict(),
-            "num_topics": df.topic.value_counts().to_dict(),
-        }
+        if self.model_stats:
+            metrics["model_stats"] = self.model_stats
+        if self.stopper is not None:
+            metrics["early_stopping"] = self.stopper.summary(
+                self.stats, self.config.n_games
+            )
         return metrics
@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class InvalidQuestionError(Exception):
     pass
 
@@ -12,3 +15,17 @@ class InvalidGuessError(Exception):
 
 class APIError(Exception):
     pass
+
+
+class RetryableAPIError(APIError):
+    """Transient API failure (throttling, overload, timeout) worth retrying."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FatalAPIError(APIError):
+    """API failure that retrying cannot fix, e.g. a bad request or invalid key."""
+
+    pass
@@ -0,0 +1,147 @@
+from collections.abc import Sequence
+from functools import lru_cache
+import hashlib
+import mmap
+import os
+from pathlib import Path
+import random
+import struct
+from typing import Optional, Union
+
+from src.config import EnvConfig
+
+
+INDEX_MAGIC = b"KBIDX001"
+# Magic, SHA-256 of the topics file, its size and mtime, number of topics
+INDEX_HEADER = struct.Struct("<8s32sQQQ")
+
+
+def index_path_for(path: Path) -> Path:
+    return path.with_name(path.name + ".idx")
+
+
+def build_index(path: Union[str, Path], index_path: Optional[Path] = None) -> Path:
+    """Write the offsets index of a topics file, one topic per line.
+
+    The index holds a header with the file's content hash, size and mtime, then a
+    (start, end) pair of uint64 byte offsets per non-blank line.
+    """
+    path = Path(path)
+    index_path = index_path or index_path_for(path)
+    stat = path.stat()
+    digest = hashlib.sha256()
+    offsets = bytearray()
+    count = 0
+    position = 0
+    with open(path, "rb") as f:
+        for line in f:
+            digest.update(line)
+            topic = line.rstrip(b"\r\n")
+            stripped = topic.strip()
+            if stripped:
+                start = position + topic.index(stripped[:1])
+                offsets += struct.pack("<QQ", start, start + len(stripped))
+                count += 1
+            position += len(line)
+
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(
+            INDEX_HEADER.pack(
+                INDEX_MAGIC, digest.digest(), stat.st_size, stat.st_mtime_ns, count
+            )
+        )
+        f.write(offsets)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def _read_header(index_path: Path) -> Optional[tuple]:
+    try:
+        with open(index_path, "rb") as f:
+            header = f.read(INDEX_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) != INDEX_HEADER.size:
+        return None
+    fields = INDEX_HEADER.unpack(header)
+    return fields if fields[0] == INDEX_MAGIC else None
+
+
+class KnowledgeBase(Sequence):
+    """Topics stored in a text file, one per line, read through a memory map.
+
+    An offsets index (`<path>.idx`, built on first use and whenever the file
+    changes) gives O(1) access to topic `i` without loading the catalog, so every
+    process of a run shares the file's pages instead of holding its own list. The
+    knowledge base is a read-only sequence of strings, usable wherever the
+    environments take a list of topics; `content_hash` identifies its contents.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.index_path = index_path_for(self.path)
+        stat = self.path.stat()
+        header = _read_header(self.index_path)
+        if header is None or header[2:4] != (stat.st_size, stat.st_mtime_ns):
+            build_index(self.path, self.index_path)
+            header = _read_header(self.index_path)
+        _, digest, size, _, self.count = header
+        self.content_hash = digest.hex()
+
+        # An empty file cannot be mapped, and has no topics to read anyway
+        self.data = b""
+        if size:
+            with open(self.path, "rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.index_path, "rb") as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_size = INDEX_HEADER.size
+        self.offsets = memoryview(self.index)[header_size:].cast("Q")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("knowledge base index out of range")
+        start, end = self.offsets[2 * i], self.offsets[2 * i + 1]
+        return self.data[start:end].decode("utf-8")
+
+    def sample(self, rng: random.Random = random) -> str:
+        """A uniformly random topic."""
+        return self[rng.randrange(self.count)]
+
+    def close(self):
+        self.offsets.release()
+        self.index.close()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+@lru_cache(maxsize=None)
+def load_knowledge_base(path: str) -> KnowledgeBase:
+    """Open a knowledge base file once per process, however many games use it."""
+    return KnowledgeBase(path)
+
+
+def resolve_knowledge_base(config: EnvConfig) -> Sequence:
+    """The topics of a run: the file at `knowledge_base_path`, else the inline list.
+
+    Raises ValueError if the file no longer matches the content hash the run was
+    configured with, e.g. when resuming a run after the catalog was edited.
+    """
+    if config.knowledge_base_path is None:
+        return config.knowledge_base
+    knowledge_base = load_knowledge_base(config.knowledge_base_path)
+    expected = config.knowledge_base_hash
+    if expected is not None and knowledge_base.content_hash != expected:
+        raise ValueError(
+            f"Knowledge base {config.knowledge_base_path} has changed: "
+            f"expected hash {expected}, found {knowledge_base.content_hash}."
+        )
+    return knowledge_base
@@ -1,16 +1,29 @@
 import argparse
 import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
 from datetime import datetime
 import json
+import multiprocessing
+import os
+from pathlib import Path
+import signal
 import time
-from typing import Optional
+from typing import Callable, Iterable, Optional, Sequence
 
 from src.env import Game20QEnv, TURN_TYPE
-from src.agent import HostAgent, GuesserAgent
-from src.model import OpenAIModelWrapper
+from src.batch_env import Game20QEnvBatch
+from src.agent import HostAgent, GuesserAgent, InfoGainGuesserAgent
+from src.knowledge_base import load_knowledge_base, resolve_knowledge_base
+from src.matcher import load_matcher
+from src.model import ModelRegistry
 from src.utils import PromptManager
 from src.config import Config, ModelConfig, EnvConfig, PromptConfig
 from src.evaluator import Evaluator, Result
+from src.metrics import RunningStats
+from src.scheduler import GameScheduler
+from src import tracing
 from src.exceptions import (
     InvalidQuestionError,
     InvalidAnswerError,
@@ -27,6 +40,14 @@ KNOWLEDGE_BASE = [
     "plane",
 ]
 
+TOPIC_ALIASES = {
+    "dog": ["puppy", "hound"],
+    "cat": ["kitten", "kitty"],
+    "chicken": ["hen", "rooster"],
+    "car": ["automobile"],
+    "plane": ["airplane", "aeroplane", "aircraft"],
+}
+
 HOST_SYSTEM_PROMPT = (
     "You are hosting a game of 20 questions game. Your role is to:\n"
     "1. understand the topic given by the enviornment\n"
@@ -41,9 +62,12 @@ GUESSER_SYSTEM_PROMPT = (
     "2. Track previous questions and answers\n"
     "3. Make eudcated guesses based on the information gathered\n"
     "4. Try to identify the topic within the allowed number of turns\n"
-    f"The topic is chosen from the following list: {', '.join(KNOWLEDGE_BASE)}\n"
+    "{topics}\n"
 )
 
+# Larger knowledge bases are not listed in the guesser's system prompt
+MAX_LISTED_TOPICS = 200
+
 PROMPT_TEMPLATES = {
     TURN_TYPE.ASK_QUESTION: (
         "Current game state:\n"
@@ -64,9 +88,43 @@ PROMPT_TEMPLATES = {
         "Answer: {current_answer}\n"
         "Make your best guess at the topic. Respond with only your guess in a single or a few words."
     ),
+    TURN_TYPE.GUESS_AND_ASK: (
+        "Current game state:\n"
+        "Turn: {turn}\n"
+        "Answer: {current_answer}\n"
+        "Make your best guess at the topic, then the yes/no question you would ask next if the guess is wrong. "
+        "Respond in exactly two lines:\n"
+        "Guess: <your guess in a single or a few words>\n"
+        "Question: <your next question>"
+    ),
+}
+
+# Completion budgets for `--turn-budgets`; the host only needs a yes or a no
+TURN_MAX_TOKENS = {
+    TURN_TYPE.ANSWER_QUESTION.value: 8,
+    TURN_TYPE.ASK_QUESTION.value: 64,
+    TURN_TYPE.MAKE_GUESS.value: 32,
+    TURN_TYPE.GUESS_AND_ASK.value: 96,
 }
 
 
+def guesser_system_prompt(template: str, knowledge_base: Sequence[str]) -> str:
+    """Fill the `{topics}` placeholder of the guesser's system prompt.
+
+    The topics are listed inline up to `MAX_LISTED_TOPICS`; a larger catalog would
+    not fit the model's context, so the prompt only says how many topics there are.
+    """
+    if len(knowledge_base) <= MAX_LISTED_TOPICS:
+        topics = ", ".join(knowledge_base)
+        line = f"The topic is chosen from the following list: {topics}"
+    else:
+        line = (
+            f"The topic is one of a catalog of {len(knowledge_base)} topics, "
+            "too many to list here."
+        )
+    return template.replace("{topics}", line)
+
+
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Run a game of 20 questions between two AI agents."
@@ -84,21 +142,233 @@ def parse_args():
         default=str(int(time.time())),
         help="Unique identifier for the run.",
     )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        metavar="RUN_ID",
+        help="Resume an interrupted eval run from its logs; other options are ignored.",
+    )
     parser.add_argument(
         "--n-games",
         type=int,
         default=5,
         help="Number of games to evaluate the agents on.",
     )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=16,
+        help="Maximum number of games in flight during evaluation.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes the evaluation games are split across.",
+    )
+    parser.add_argument(
+        "--sink",
+        type=str,
+        default="jsonl",
+        choices=["jsonl", "parquet", "files"],
+        help="How game results are stored; 'files' is the legacy one-file-per-game layout.",
+    )
+    parser.add_argument(
+        "--stop-width",
+        type=float,
+        default=None,
+        help="Stop once the success-rate confidence interval is this narrow.",
+    )
+    parser.add_argument(
+        "--stop-threshold",
+        type=float,
+        default=None,
+        help="Stop once the success rate is confidently above or below this value.",
+    )
+    parser.add_argument(
+        "--stop-alpha",
+        type=float,
+        default=0.05,
+        help="Error probability of the early-stopping confidence interval.",
+    )
     parser.add_argument(
         "--model",
         type=str,
         default="gpt-4o-mini",
         help="The OpenAI model to use for generating responses.",
     )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="openai",
+        choices=["openai", "vllm", "dummy"],
+        help="The model backend to send requests to.",
+    )
+    parser.add_argument(
+        "--server-url",
+        type=str,
+        default=None,
+        help="Chat completions endpoint of the vllm backend.",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=100,
+        help="Maximum number of pooled HTTP connections shared by all games.",
+    )
+    parser.add_argument(
+        "--keepalive-connections",
+        type=int,
+        default=20,
+        help="Maximum number of idle keep-alive connections kept in the pool.",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help=(
+            "Attempts per model call, counting the first one (1 disables retries), "
+            "with exponential backoff between them."
+        ),
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=None,
+        help="Run-wide cap on model requests per minute, shared by all games.",
+    )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=float,
+        default=None,
+        help="Run-wide cap on model tokens per minute, shared by all games.",
+    )
+    parser.add_argument(
+        "--hedge-quantile",
+        type=float,
+        default=None,
+        help="Resend model calls still running past this latency quantile of their turn type.",
+    )
+    parser.add_argument(
+        "--hedge-max-ratio",
+        type=float,
+        default=0.1,
+        help="Maximum share of model calls that get a hedged duplicate.",
+    )
+    parser.add_argument(
+        "--turn-budgets",
+        action="store_true",
+        help="Cap each model call's completion tokens by turn type (see TURN_MAX_TOKENS).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream responses and stop each one as soon as it can be parsed.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Maximum number of concurrent model calls coalesced into one request.",
+    )
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=0.005,
+        help="Seconds to wait for more model calls before sending a batch.",
+    )
+    parser.add_argument(
+        "--batch-messages",
+        action="store_true",
+        help=(
+            "Send each batch of the vllm backend as one request listing the "
+            "conversations under 'messages'. Only src.mock_server accepts this; "
+            "by default a batch is sent as concurrent single requests."
+        ),
+    )
+    parser.add_argument(
+        "--temperature",
+        type=float,
+        default=0.7,
+        help="Sampling temperature of the model calls.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=0,
+        help=(
+            "Number of model responses cached in memory (0 disables caching). "
+            "Requires --temperature 0."
+        ),
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=str,
+        default=None,
+        help="SQLite file that persists cached responses between runs.",
+    )
     parser.add_argument(
         "--max-turns", type=int, default=5, help="Maximum number of turns(questions)."
     )
+    parser.add_argument(
+        "--history-window",
+        type=int,
+        default=None,
+        help="Keep only this many recent messages per agent, plus a digest of the game.",
+    )
+    parser.add_argument(
+        "--max-prompt-tokens",
+        type=int,
+        default=None,
+        help="Trim the oldest history so each prompt stays within this many tokens.",
+    )
+    parser.add_argument(
+        "--turn-mode",
+        type=str,
+        default="separate",
+        choices=["separate", "combined"],
+        help="'combined' asks the guesser for its guess and next question in one call.",
+    )
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        help="Start the guesser's next call for both answers while the host is answering.",
+    )
+    parser.add_argument(
+        "--batch-games",
+        type=int,
+        default=1,
+        help=(
+            "Number of games stepped in lockstep, with one batched model call per "
+            "phase. --max-concurrency still counts games, so it allows "
+            "max-concurrency // batch-games groups in flight."
+        ),
+    )
+    parser.add_argument(
+        "--knowledge-base",
+        type=str,
+        default=None,
+        help="Topics file, one per line, used instead of the built-in topics.",
+    )
+    parser.add_argument(
+        "--oracle-path",
+        type=str,
+        default=None,
+        help="Precomputed answer oracle (see src.oracle) the host answers from.",
+    )
+    parser.add_argument(
+        "--guesser",
+        type=str,
+        default="llm",
+        choices=["llm", "info_gain"],
+        help="Guesser strategy; info_gain picks questions from the oracle matrix.",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Record per-turn latency histograms and token counts in the metrics.",
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -130,36 +400,72 @@ def print_result(env: Game20QEnv, result: Result):
         )
 
 
-async def run_play(config) -> Optional[Result]:
-    """Run a single game"""
-    # Initialize model and prompt managers
-    model = OpenAIModelWrapper(
-        model_name=config.model.name,
-        max_retries=config.model.max_retries,
-    )
+async def run_play(
+    config,
+    models: Optional[ModelRegistry] = None,
+    tracer: Optional[tracing.Tracer] = None,
+) -> Optional[Result]:
+    """Run a single game, recording its spans into `tracer` if one is given."""
+    if models is None:
+        async with ModelRegistry(config.model) as models:
+            return await run_play(config, models, tracer)
+
+    token = tracing.activate(tracer)
+    try:
+        result = await play_game(config, models)
+    finally:
+        tracing.deactivate(token)
+    if tracer is not None:
+        result.timings = tracer.summary()
+    return result
+
+
+async def play_game(config, models: ModelRegistry) -> Result:
+    # Borrow the run's shared model and initialize prompt managers
+    model = models.get()
+    knowledge_base = resolve_knowledge_base(config.env)
     host_prompts = PromptManager(
         config.prompts.templates,
         config.prompts.host_system,
+        history_window=config.prompts.history_window,
+        max_prompt_tokens=config.prompts.max_prompt_tokens,
     )
     guesser_prompts = PromptManager(
         config.prompts.templates,
-        config.prompts.guesser_system,
+        guesser_system_prompt(config.prompts.guesser_system, knowledge_base),
+        history_window=config.prompts.history_window,
+        max_prompt_tokens=config.prompts.max_prompt_tokens,
     )
 
-    host = HostAgent(model, host_prompts)
-    guesser = GuesserAgent(model, guesser_prompts)
+    oracle = None
+    if config.env.oracle_path:
+        from src.oracle import load_oracle
+
+        oracle = load_oracle(config.env.oracle_path)
+    generation = {"max_tokens": config.model.max_tokens, "stream": config.model.stream}
+    host = HostAgent(model, host_prompts, oracle=oracle, **generation)
+    if config.env.guesser == "info_gain":
+        if oracle is None:
+            raise ValueError("The info_gain guesser requires an oracle_path.")
+        guesser = InfoGainGuesserAgent(model, guesser_prompts, oracle, **generation)
+    else:
+        guesser = GuesserAgent(model, guesser_prompts, **generation)
 
     env = Game20QEnv(
         host,
         guesser,
-        knowledge_base=config.env.knowledge_base,
+        knowledge_base=knowledge_base,
         debug=config.env.debug,
         max_turns=config.env.max_turns,
+        turn_mode=config.env.turn_mode,
+        speculative=config.env.speculative,
+        aliases=config.env.aliases,
     )
 
     # Run the game
     observations = env.reset()
     done = False
+    start_time = time.perf_counter()
 
     try:
         while not done:
@@ -167,70 +473,335 @@ async def run_play(config) -> Optional[Result]:
             if any(dones):
                 done = True
     except Exception as e:
+        success = False
         failure_reason = exception_to_failure(e)
-        result = Result(
-            topic=env.topic,
-            num_turns=env.turn,
-            success=False,
-            history=env.history,
-            failure=failure_reason,
-            timestamp=datetime.now().isoformat(),
-        )
-        return result
+    else:
+        success = info.get("reason") == "correct_guess"
+        failure_reason = None if success else "Max turns exceeded"
+    duration = time.perf_counter() - start_time
 
-    success = info.get("reason") == "correct_guess"
+    # The game is over once it has a result, but its losing speculative branches
+    # may still be running; their tokens are part of its cost
+    await env.settle_speculation()
     result = Result(
         topic=env.topic,
         num_turns=env.turn,
         success=success,
         history=env.history,
-        failure=None if success else "Max turns exceeded",
+        failure=failure_reason,
         timestamp=datetime.now().isoformat(),
+        duration=duration,
+        turn_mode=env.turn_mode,
+        speculative_tokens=dict(env.speculative_tokens) or None,
     )
     return result
 
 
-async def run_eval(config: Config):
-    """Run multiple games to evaluate the agents."""
-    # TODO: Change evaluator to run in parallel
-    evaluator = Evaluator(config)
-    tasks = []
-
-    for game in range(config.n_games):
-        task = asyncio.create_task(run_play(config))
-        tasks.append(task)
+async def run_play_batch(
+    config,
+    n_games: int,
+    models: ModelRegistry,
+    tracer: Optional[tracing.Tracer] = None,
+) -> list[Result]:
+    """Run `n_games` games in lockstep, with one batched model call per phase."""
+    if config.env.oracle_path or config.env.guesser != "llm":
+        raise ValueError("Lockstep games only support the LLM host and guesser.")
+    if config.env.turn_mode != "separate" or config.env.speculative:
+        raise ValueError(
+            "Lockstep games only support the separate, non-speculative turns."
+        )
+    if config.model.stream:
+        raise ValueError("Lockstep games send batches, which cannot be streamed.")
+
+    def prompt_managers(system_prompt: str) -> list[PromptManager]:
+        return [
+            PromptManager(
+                config.prompts.templates,
+                system_prompt,
+                history_window=config.prompts.history_window,
+                max_prompt_tokens=config.prompts.max_prompt_tokens,
+            )
+            for _ in range(n_games)
+        ]
+
+    knowledge_base = resolve_knowledge_base(config.env)
+    guesser_system = guesser_system_prompt(
+        config.prompts.guesser_system, knowledge_base
+    )
+    env = Game20QEnvBatch(
+        models.get(),
+        prompt_managers(config.prompts.host_system),
+        prompt_managers(guesser_system),
+        knowledge_base=knowledge_base,
+        debug=config.env.debug,
+        max_turns=config.env.max_turns,
+        max_tokens=config.model.max_tokens,
+        aliases=config.env.aliases,
+    )
+    env.reset()
+    start_time = time.perf_counter()
 
-    results = await asyncio.gather(*tasks)
+    token = tracing.activate(tracer)
+    try:
+        await env.run()
+    finally:
+        tracing.deactivate(token)
+
+    results = []
+    for i in range(n_games):
+        if env.errors[i] is not None:
+            failure = exception_to_failure(env.errors[i])
+        else:
+            failure = None if env.success[i] else "Max turns exceeded"
+        results.append(
+            Result(
+                topic=env.topics[i],
+                num_turns=int(env.turn[i]),
+                success=bool(env.success[i]),
+                history=env.histories[i],
+                failure=failure,
+                timestamp=datetime.now().isoformat(),
+                duration=float(env.finished_at[i]) - start_time,
+            )
+        )
+    if tracer is not None:
+        results[0].timings = tracer.summary()
+    return results
+
+
+@contextmanager
+def on_shutdown_signal(callback: Callable[[], None]):
+    """Call `callback` on SIGINT/SIGTERM instead of interrupting the event loop."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, callback)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        yield
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+
+async def play_games(config: Config, game_ids: Iterable[int], evaluator: Evaluator):
+    """Play games on this event loop, logging each one as soon as it finishes."""
+    batch_games = config.env.batch_games
+    # Lockstep games are scheduled a group at a time; `max_concurrency` still
+    # counts games, rounded down to whole groups (at least one)
+    scheduler = GameScheduler(max(1, config.max_concurrency // batch_games))
+    models = ModelRegistry(config.model)
+
+    async def play(games):
+        tracer = tracing.Tracer() if config.trace else None
+        if batch_games > 1:
+            results = await run_play_batch(config, len(games), models, tracer)
+        else:
+            results, games = [await run_play(config, models, tracer)], [games]
+        for game_id, result in zip(games, results):
+            result.game_id = game_id
+        return results, tracer
+
+    # Lockstep games are scheduled in groups, each group being one task
+    if batch_games > 1:
+        game_ids, ids = [], list(game_ids)
+        for start in range(0, len(ids), batch_games):
+            end = start + batch_games
+            game_ids.append(ids[start:end])
+
+    # Stop scheduling on SIGINT/SIGTERM and drain the games already in flight
+    with on_shutdown_signal(scheduler.stop):
+        try:
+            async for results, tracer in scheduler.run(game_ids, play):
+                # A group's trace covers all of its games, so it is logged once
+                for result in results:
+                    evaluator.log_game(result, tracer)
+                    tracer = None
+                if evaluator.should_stop():
+                    scheduler.stop()
+        finally:
+            model_stats = models.stats()
+            if config.env.oracle_path:
+                from src.oracle import load_oracle
+
+                model_stats["oracle"] = load_oracle(config.env.oracle_path).stats()
+            evaluator.log_model_stats(model_stats)
+            await models.aclose()
+
+
+def report_worker_pid(pids: multiprocessing.SimpleQueue):
+    """Worker process initializer: tell the parent which process to signal."""
+    pids.put(os.getpid())
+
+
+def eval_shard(
+    config: Config, game_ids: list[int], shard: int, log_dir: str
+) -> tuple[RunningStats, dict]:
+    """Worker process entry point: play a shard of games on its own loop and pool."""
+    evaluator = Evaluator(config, log_dir=log_dir, sink=config.sink, shard=shard)
+    try:
+        asyncio.run(play_games(config, game_ids, evaluator))
+    finally:
+        evaluator.close()
+    return evaluator.stats, evaluator.model_stats
+
+
+def shard_rate_limits(config: Config) -> Config:
+    """Config whose rate limits are split evenly across `config.workers` processes."""
+    model = config.model
+    rpm, tpm = model.requests_per_minute, model.tokens_per_minute
+    model = replace(
+        model,
+        requests_per_minute=rpm / config.workers if rpm else rpm,
+        tokens_per_minute=tpm / config.workers if tpm else tpm,
+    )
+    return replace(config, model=model)
+
+
+async def run_sharded_eval(config: Config, game_ids: list[int], evaluator: Evaluator):
+    """Split the games across `config.workers` processes and merge their stats."""
+    loop = asyncio.get_running_loop()
+    workers = config.workers
+    log_dir = str(evaluator.log_dir.parent)
+    context = multiprocessing.get_context("spawn")
+    config = shard_rate_limits(config)
+    if config.env.knowledge_base_path is not None:
+        # Compile the guess matcher once here; the workers map the compiled file
+        load_matcher(resolve_knowledge_base(config.env), config.env.aliases)
+
+    pids = context.SimpleQueue()
+    worker_pids = []
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=context,
+        initializer=report_worker_pid,
+        initargs=(pids,),
+    ) as pool:
+        shards = [
+            loop.run_in_executor(
+                pool, eval_shard, config, game_ids[shard::workers], shard, log_dir
+            )
+            for shard in range(workers)
+        ]
+
+        def stop_workers():
+            # Ctrl-C reaches the workers through the process group, but a SIGTERM
+            # sent to this process alone (e.g. by a job scheduler) does not. Each
+            # worker drains its own games on SIGTERM, as on SIGINT
+            while not pids.empty():
+                worker_pids.append(pids.get())
+            for pid in worker_pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass  # Already done with its shard
+
+        with on_shutdown_signal(stop_workers):
+            for stats, model_stats in await asyncio.gather(*shards):
+                evaluator.merge(stats, model_stats)
+
+
+async def run_eval(config: Config, log_dir: str = "logs", resume: bool = False):
+    """Run multiple games to evaluate the agents.
+
+    With `resume`, the games already logged to the run directory are loaded and
+    only the remaining ones are played.
+    """
+    if config.workers > 1 and (
+        config.stop_width is not None or config.stop_threshold is not None
+    ):
+        raise ValueError("Early stopping needs a single worker to see every game.")
+
+    evaluator = Evaluator(config, log_dir=log_dir, sink=config.sink, resume=resume)
+    game_ids = [i for i in range(config.n_games) if i not in evaluator.completed]
+    if resume:
+        print(f"Resuming run {config.run_id}: {len(game_ids)} games left to play.")
 
-    for result in results:
-        evaluator.log_game(result)
+    try:
+        if config.workers > 1:
+            await run_sharded_eval(config, game_ids, evaluator)
+        elif not evaluator.should_stop():
+            await play_games(config, game_ids, evaluator)
+    finally:
+        evaluator.close()
 
     metrics = evaluator.calculate_metrics()
-    print(f"Metrics for {config.n_games} games:")
+    print(f"Metrics for {evaluator.stats.games} games:")
     print(json.dumps(metrics))
+    return metrics
 
 
 def main():
     """Run two agents playing a game of 20 questions."""
     args = parse_args()
 
+    if args.resume:
+        config = Config.load(Path("logs") / args.resume / "config.json")
+        asyncio.run(run_eval(config, resume=True))
+        return
+
+    if args.cache_size > 0 and args.temperature > 0:
+        # Every game with the same prompts would replay one sampled response
+        raise ValueError("Caching model responses requires --temperature 0.")
+
+    knowledge_base_hash = None
+    if args.knowledge_base is not None:
+        knowledge_base_hash = load_knowledge_base(args.knowledge_base).content_hash
+
     config = Config(
         model=ModelConfig(
             name=args.model,
-            max_retries=1,
+            max_retries=args.max_retries,
+            temperature=args.temperature,
+            backend=args.backend,
+            server_url=args.server_url,
+            pool_size=args.pool_size,
+            keepalive_connections=args.keepalive_connections,
+            batch_size=args.batch_size,
+            batch_window=args.batch_window,
+            batch_messages=args.batch_messages,
+            cache_size=args.cache_size,
+            cache_path=args.cache_path,
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            hedge_quantile=args.hedge_quantile,
+            hedge_max_ratio=args.hedge_max_ratio,
+            max_tokens=TURN_MAX_TOKENS if args.turn_budgets else None,
+            stream=args.stream,
         ),
         env=EnvConfig(
             max_turns=args.max_turns,
             debug=args.debug,
             knowledge_base=KNOWLEDGE_BASE,
+            aliases={} if args.knowledge_base else TOPIC_ALIASES,
+            knowledge_base_path=args.knowledge_base,
+            knowledge_base_hash=knowledge_base_hash,
+            oracle_path=args.oracle_path,
+            guesser=args.guesser,
+            batch_games=args.batch_games,
+            turn_mode=args.turn_mode,
+            speculative=args.speculative,
         ),
         prompts=PromptConfig(
             host_system=HOST_SYSTEM_PROMPT,
             guesser_system=GUESSER_SYSTEM_PROMPT,
             templates=PROMPT_TEMPLATES,
+            history_window=args.history_window,
+            max_prompt_tokens=args.max_prompt_tokens,
         ),
         run_id=args.run_id,
         n_games=args.n_games,
+        max_concurrency=args.max_concurrency,
+        workers=args.workers,
+        sink=args.sink,
+        trace=args.trace,
+        stop_width=args.stop_width,
+        stop_threshold=args.stop_threshold,
+        stop_alpha=args.stop_alpha,
     )
 
     if args.run_type == "play":
@@ -0,0 +1,465 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+import hashlib
+import io
+import json
+import mmap
+import os
+from pathlib import Path
+import re
+import struct
+import sys
+from typing import BinaryIO, Optional, Sequence, Union
+import unicodedata
+import zlib
+
+
+MATCHER_MAGIC = b"GMATCH01"
+# Magic, SHA-256 of the knowledge base and of the alias table, then the number of
+# vocabulary tokens, of automaton states, of hash table slots and the size of the
+# vocabulary blob
+MATCHER_HEADER = struct.Struct("<8s32s32sQQQQ")
+EMPTY_SLOT = 0xFFFFFFFF
+
+
+def normalize(text: str) -> list[str]:
+    """Lowercase alphanumeric tokens of `text`, with accents removed."""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def aliases_hash(aliases: Optional[dict[str, list[str]]]) -> bytes:
+    encoded = json.dumps(aliases or {}, sort_keys=True)
+    return hashlib.sha256(encoded.encode()).digest()
+
+
+# Pattern tokens up to which the automaton is built in pure Python; numpy only
+# pays off, and is only imported, for larger catalogs
+PYTHON_BUILD_MAX_TOKENS = 20_000
+
+
+def _collect_patterns(
+    topics: Sequence[str], aliases: Optional[dict[str, list[str]]]
+) -> tuple:
+    """Token ids of every topic and alias pattern, in order, and their vocabulary.
+
+    Returns the vocabulary, the patterns' tokens back to back, their lengths, their
+    topic ids and, per pattern, the id of its plural form's last token (-1 if none).
+    """
+    # Token ids in order of first appearance, assigned without a Python call
+    ids = defaultdict()
+    ids.default_factory = ids.__len__
+    token_id = ids.__getitem__
+    flat = array("i")
+    sizes = array("i")
+    owners = array("i")
+    plural_last = array("i")
+
+    def add(tokens: list[str], topic_id: int):
+        flat.extend(map(token_id, tokens))
+        sizes.append(len(tokens))
+        owners.append(topic_id)
+        last = tokens[-1]
+        plural = not (last.endswith("s") or last.isdigit())
+        plural_last.append(token_id(last + "s") if plural else -1)
+
+    targets = {tuple(normalize(topic)): topic for topic in aliases or {}}
+    target_ids: dict[str, int] = {}
+    for topic_id, topic in enumerate(topics):
+        tokens = normalize(topic)
+        if not tokens:
+            continue
+        add(tokens, topic_id)
+        if targets:
+            target = targets.get(tuple(tokens))
+            if target is not None:
+                target_ids.setdefault(target, topic_id)
+    for topic, names in (aliases or {}).items():
+        if topic not in target_ids:
+            continue
+        for name in names:
+            tokens = normalize(name)
+            if tokens:
+                add(tokens, target_ids[topic])
+
+    return list(ids), flat, sizes, owners, plural_last
+
+
+def _build_python(vocab_size: int, flat, sizes, owners, plural_last) -> tuple:
+    """Automaton arrays of the patterns, built in pure Python for small catalogs."""
+    starts = [0] * len(sizes)
+    for i in range(1, len(sizes)):
+        starts[i] = starts[i - 1] + sizes[i - 1]
+    tokens = list(flat)
+    lengths = list(sizes)
+    pattern_topics = list(owners)
+    for i, last in enumerate(plural_last):
+        if last >= 0:
+            start, end = starts[i], starts[i] + sizes[i]
+            starts.append(len(tokens))
+            tokens.extend(flat[start:end])
+            tokens[-1] = last
+            lengths.append(sizes[i])
+            pattern_topics.append(owners[i])
+
+    node = [0] * len(lengths)
+    edge_keys = []
+    levels = []
+    n_states = 1
+    depth = 0
+    alive = [i for i, length in enumerate(lengths) if length > 0]
+    while alive:
+        keys = [node[i] * vocab_size + tokens[starts[i] + depth] for i in alive]
+        unique = sorted(set(keys))
+        numbers = {key: n_states + j for j, key in enumerate(unique)}
+        for i, key in zip(alive, keys):
+            node[i] = numbers[key]
+        levels.append((n_states, n_states + len(unique)))
+        edge_keys.extend(unique)
+        n_states += len(unique)
+        depth += 1
+        alive = [i for i in alive if lengths[i] > depth]
+    parents = [key // vocab_size for key in edge_keys]
+    edge_tokens = [key % vocab_size for key in edge_keys]
+    edge_start = [bisect_left(parents, state) for state in range(n_states + 1)]
+    children = {key: e + 1 for e, key in enumerate(edge_keys)}
+
+    output = [-1] * n_states
+    output_len = [0] * n_states
+    for i, state in enumerate(node):
+        if output[state] == -1:
+            output[state] = pattern_topics[i]
+            output_len[state] = lengths[i]
+
+    fail = [0] * n_states
+    for lo, hi in levels[1:]:
+        for child in range(lo, hi):
+            token = edge_tokens[child - 1]
+            state = fail[parents[child - 1]]
+            link = children.get(state * vocab_size + token)
+            while link is None and state:
+                state = fail[state]
+                link = children.get(state * vocab_size + token)
+            fail[child] = link or 0
+            if output[child] == -1:
+                output[child] = output[fail[child]]
+                output_len[child] = output_len[fail[child]]
+
+    return n_states, edge_start, edge_tokens, fail, output, output_len
+
+
+def _build_numpy(vocab_size: int, flat, sizes, owners, plural_last) -> tuple:
+    """Automaton arrays of the patterns, built a trie depth at a time with numpy."""
+    import numpy as np
+
+    # Append the plural forms: copies of their patterns with the last token swapped
+    tokens = np.frombuffer(flat, dtype=np.int32)
+    lengths = np.frombuffer(sizes, dtype=np.int32)
+    pattern_topics = np.frombuffer(owners, dtype=np.int32)
+    plural_last = np.frombuffer(plural_last, dtype=np.int32)
+    starts = np.cumsum(lengths) - lengths
+    plurals = np.flatnonzero(plural_last >= 0)
+    plural_lengths = lengths[plurals]
+    plural_starts = np.cumsum(plural_lengths) - plural_lengths
+    copied = np.arange(plural_lengths.sum(), dtype=np.int64) + np.repeat(
+        starts[plurals] - plural_starts, plural_lengths
+    )
+    plural_tokens = tokens[copied]
+    plural_tokens[plural_starts + plural_lengths - 1] = plural_last[plurals]
+    starts = np.concatenate((starts, plural_starts + len(tokens)))
+    tokens = np.concatenate((tokens, plural_tokens))
+    lengths = np.concatenate((lengths, plural_lengths))
+    pattern_topics = np.concatenate((pattern_topics, pattern_topics[plurals]))
+    del plural_tokens, copied
+
+    # Trie, one depth at a time: the nodes of a depth are its distinct
+    # (parent, token) pairs, numbered in sorted order after the shallower ones
+    node = np.zeros(len(lengths), dtype=np.int32)
+    edge_keys = []
+    levels = []
+    n_states = 1
+    depth = 0
+    alive = np.flatnonzero(lengths > 0)
+    while len(alive):
+        keys = node[alive].astype(np.int64) * vocab_size
+        keys += tokens[starts[alive] + depth]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        node[alive] = n_states + inverse
+        levels.append((n_states, n_states + len(unique)))
+        edge_keys.append(unique)
+        n_states += len(unique)
+        depth += 1
+        alive = alive[lengths[alive] > depth]
+    edge_keys = np.concatenate(edge_keys) if edge_keys else np.zeros(0, np.int64)
+    parents = (edge_keys // vocab_size).astype(np.int32)
+    edge_tokens = (edge_keys % vocab_size).astype(np.int32)
+    edge_start = np.searchsorted(parents, np.arange(n_states + 1, dtype=np.int32))
+
+    # The first pattern ending at a state is its output
+    output = np.full(n_states, -1, dtype=np.int32)
+    output_len = np.zeros(n_states, dtype=np.int32)
+    ends, first = np.unique(node, return_index=True)
+    output[ends] = pattern_topics[first]
+    output_len[ends] = lengths[first]
+    del node, tokens, starts, lengths, pattern_topics, ends, first
+
+    # Failure links and inherited outputs, a depth at a time so that the failure
+    # state of every node, always shallower, is already final
+    fail = np.zeros(n_states, dtype=np.int32)
+    for lo, hi in levels[1:]:
+        states = np.arange(lo, hi, dtype=np.int32)
+        token = edge_tokens[states - 1]
+        state = fail[parents[states - 1]]
+        link = np.zeros(len(states), dtype=np.int32)
+        pending = np.arange(len(states))
+        while len(pending):
+            key = state[pending].astype(np.int64) * vocab_size + token[pending]
+            i = np.minimum(np.searchsorted(edge_keys, key), len(edge_keys) - 1)
+            found = edge_keys[i] == key
+            link[pending[found]] = i[found] + 1
+            # Not found at the root: the failure link stays at the root
+            pending = pending[~found & (state[pending] != 0)]
+            state[pending] = fail[state[pending]]
+        fail[states] = link
+        inherit = states[output[states] == -1]
+        output[inherit] = output[fail[inherit]]
+        output_len[inherit] = output_len[fail[inherit]]
+
+    return n_states, edge_start, edge_tokens, fail, output, output_len
+
+
+def _little_endian(typecode: str, values) -> bytes:
+    """`values` as little-endian 32-bit integers, signed for typecode "i"."""
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _pack_numpy(typecode: str, values) -> bytes:
+    import numpy as np
+
+    return np.asarray(values, dtype="<i4" if typecode == "i" else "<u4").tobytes()
+
+
+def compile_matcher(
+    f: BinaryIO,
+    topics: Sequence[str],
+    aliases: Optional[dict[str, list[str]]] = None,
+    topics_hash: bytes = b"",
+    use_numpy: Optional[bool] = None,
+):
+    """Compile the Aho-Corasick automaton of `topics` and `aliases` into `f`.
+
+    Patterns are the normalized topics, then their aliases, then the plural forms
+    of both; a state ending several patterns outputs the first. The trie is built
+    one depth at a time, so states are numbered breadth-first and the edges,
+    sorted by (parent, token), are stored as one array of tokens with the offset
+    of each state's first edge: the child of edge `e` is state `e + 1`. Tokens are
+    ids into the vocabulary, found through an open-addressing hash table on the
+    CRC-32 of each token.
+
+    Catalogs of more than `PYTHON_BUILD_MAX_TOKENS` pattern tokens are built with
+    numpy, smaller ones in pure Python (`use_numpy` forces either); both write the
+    same bytes.
+    """
+    words, flat, sizes, owners, plural_last = _collect_patterns(topics, aliases)
+    vocab_size = max(len(words), 1)
+    if use_numpy is None:
+        use_numpy = len(flat) > PYTHON_BUILD_MAX_TOKENS
+    build = _build_numpy if use_numpy else _build_python
+    n_states, edge_start, edge_tokens, fail, output, output_len = build(
+        vocab_size, flat, sizes, owners, plural_last
+    )
+    del flat, sizes, owners, plural_last
+
+    # Vocabulary: the tokens back to back, and a hash table of their ids
+    encoded = [word.encode() for word in words]
+    vocab_offsets = [0] * (len(words) + 1)
+    for i, word in enumerate(encoded):
+        vocab_offsets[i + 1] = vocab_offsets[i] + len(word)
+    table_size = 1 << (2 * vocab_size - 1).bit_length()
+    mask = table_size - 1
+    table = [EMPTY_SLOT] * table_size
+    for i, word in enumerate(encoded):
+        slot = zlib.crc32(word) & mask
+        while table[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        table[slot] = i
+
+    f.write(
+        MATCHER_HEADER.pack(
+            MATCHER_MAGIC,
+            topics_hash.ljust(32, b"\0"),
+            aliases_hash(aliases),
+            len(words),
+            n_states,
+            table_size,
+            vocab_offsets[-1],
+        )
+    )
+    pack = _pack_numpy if use_numpy else _little_endian
+    for typecode, values in (
+        ("I", vocab_offsets),
+        ("I", table),
+        ("I", edge_start),
+        ("I", edge_tokens),
+        ("I", fail),
+        ("i", output),
+        ("I", output_len),
+    ):
+        f.write(pack(typecode, values))
+    f.writelines(encoded)
+
+
+class GuessMatcher:
+    """Resolve free-text guesses to topics of a knowledge base.
+
+    Every topic, its aliases and their plural forms are normalized into token
+    sequences and compiled into one Aho-Corasick automaton over tokens. A guess is
+    matched in a single pass over its tokens, so matching takes time linear in the
+    guess whatever the size of the knowledge base. Tokens must match whole, so
+    "cat" does not match "category". When a guess names several topics, the one
+    with the most tokens wins ("hot dog" over "dog"), then the first named.
+
+    The automaton is read in place from its compiled form (see `compile_matcher`),
+    which may be a memory map shared by every process of a run. Topic ids are
+    positions in the knowledge base; a topic listed twice resolves to its first
+    position.
+    """
+
+    def __init__(
+        self,
+        topics: Sequence[str],
+        aliases: Optional[dict[str, list[str]]] = None,
+        data: Optional[Union[bytes, memoryview, mmap.mmap]] = None,
+    ):
+        self.topics = topics
+        if data is None:
+            buffer = io.BytesIO()
+            compile_matcher(buffer, topics, aliases)
+            data = buffer.getbuffer()
+        self.data = data
+        fields = MATCHER_HEADER.unpack_from(self.data)
+        n_vocab, n_states, table_size = fields[3:6]
+        view = memoryview(self.data)
+        position = MATCHER_HEADER.size
+
+        def take(fmt: str, count: int) -> memoryview:
+            nonlocal position
+            start, position = position, position + 4 * count
+            return view[start:position].cast(fmt)
+
+        self.vocab_offsets = take("I", n_vocab + 1)
+        self.vocab_table = take("I", table_size)
+        self.edge_start = take("I", n_states + 1)
+        self.edge_tokens = take("I", n_states - 1)
+        self.fail = take("I", n_states)
+        self.output = take("i", n_states)
+        self.output_len = take("I", n_states)
+        self.vocab = view[position:]
+        self.mask = table_size - 1
+
+    def _token_id(self, token: str) -> Optional[int]:
+        """Id of `token` in the vocabulary, None if absent."""
+        word = token.encode()
+        slot = zlib.crc32(word) & self.mask
+        while True:
+            i = self.vocab_table[slot]
+            if i == EMPTY_SLOT:
+                return None
+            start, end = self.vocab_offsets[i], self.vocab_offsets[i + 1]
+            if self.vocab[start:end] == word:
+                return i
+            slot = (slot + 1) & self.mask
+
+    def _goto(self, state: int, token_id: int) -> Optional[int]:
+        lo, hi = self.edge_start[state], self.edge_start[state + 1]
+        i = bisect_left(self.edge_tokens, token_id, lo, hi)
+        if i < hi and self.edge_tokens[i] == token_id:
+            return i + 1
+        return None
+
+    def match(self, guess: str) -> Optional[int]:
+        """Id of the topic `guess` names, or None if it names none."""
+        state = 0
+        best, best_len = None, 0
+        for token in normalize(guess):
+            token_id = self._token_id(token)
+            if token_id is None:
+                # No pattern goes through a token outside the vocabulary
+                state = 0
+                continue
+            child = self._goto(state, token_id)
+            while child is None and state:
+                state = self.fail[state]
+                child = self._goto(state, token_id)
+            state = child or 0
+            if self.output[state] != -1 and self.output_len[state] > best_len:
+                best, best_len = self.output[state], self.output_len[state]
+        return best
+
+    def resolve(self, guess: str) -> Optional[str]:
+        """Canonical topic `guess` names, or None if it names none."""
+        topic_id = self.match(guess)
+        return None if topic_id is None else self.topics[topic_id]
+
+
+def matcher_path_for(path: Path) -> Path:
+    return path.with_name(path.name + ".match")
+
+
+def load_matcher(
+    knowledge_base, aliases: Optional[dict[str, list[str]]] = None
+) -> GuessMatcher:
+    """Matcher of a file-backed knowledge base, compiled next to it and mapped.
+
+    The compiled automaton (`<path>.match`) is rebuilt when the knowledge base's
+    content hash or the alias table differ from the ones it was built for.
+    """
+    path = matcher_path_for(Path(knowledge_base.path))
+    topics_hash = bytes.fromhex(knowledge_base.content_hash)
+    expected = (MATCHER_MAGIC, topics_hash, aliases_hash(aliases))
+    try:
+        with open(path, "rb") as f:
+            header = f.read(MATCHER_HEADER.size)
+    except FileNotFoundError:
+        header = b""
+    if len(header) != MATCHER_HEADER.size or (
+        MATCHER_HEADER.unpack(header)[:3] != expected
+    ):
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            compile_matcher(f, knowledge_base, aliases, topics_hash)
+        os.replace(tmp_path, path)
+
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return GuessMatcher(knowledge_base, data=data)
+
+
+_matcher = (None, None, None)
+
+
+def get_matcher(
+    knowledge_base: Sequence[str], aliases: Optional[dict[str, list[str]]] = None
+) -> GuessMatcher:
+    """Matcher of a knowledge base, compiled once per run rather than per game.
+
+    Games of a run share the same knowledge base and alias table, which are not
+    modified while they are played. A file-backed knowledge base (with a `path`)
+    keeps its compiled matcher on disk, so the processes of a run map one copy.
+    """
+    global _matcher
+    cached_kb, cached_aliases, matcher = _matcher
+    if cached_kb is not knowledge_base or cached_aliases is not aliases:
+        if getattr(knowledge_base, "path", None) is not None:
+            matcher = load_matcher(knowledge_base, aliases)
+        else:
+            matcher = GuessMatcher(knowledge_base, aliases)
+        _matcher = (knowledge_base, aliases, matcher)
+    return matcher
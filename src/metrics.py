@@ -0,0 +1,269 @@
+from collections import Counter, defaultdict
+import math
+from typing import Optional
+
+
+class QuantileSketch:
+    """Streaming quantile estimates with bounded relative error.
+
+    Positive values are counted in logarithmic buckets (as in DDSketch), so any
+    quantile is within `relative_accuracy` of the true value while memory grows
+    only with the logarithm of the value range. Sketches can be merged exactly.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zero_count += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self.log_gamma)] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return min(max(0.0, self.min), self.max)
+
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                value = 2 * self.gamma**key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+
+        return self.max
+
+    def merge(self, other: "QuantileSketch"):
+        self.buckets.update(other.buckets)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def summary(self) -> dict:
+        if self.count == 0:
+            return {}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class RunningStats:
+    """Run metrics updated in O(1) per game, without keeping the games around."""
+
+    def __init__(self):
+        self.games = 0
+        self.successes = 0
+        self.turns_mean = 0.0
+        self.turns_m2 = 0.0
+        self.failure_counts = Counter()
+        self.topic_counts = Counter()
+        # Wrong guesses per topic, by the topic they named
+        self.confusion = defaultdict(Counter)
+        self.unresolved_guesses = 0
+        self.latency = QuantileSketch()
+        self.speculative_tokens = Counter()
+        self.spans = defaultdict(QuantileSketch)
+        self.counters = Counter()
+
+    def update(self, result):
+        """Add one game's `Result`."""
+        self.games += 1
+        self.successes += bool(result.success)
+
+        # Welford's online mean and variance
+        delta = result.num_turns - self.turns_mean
+        self.turns_mean += delta / self.games
+        self.turns_m2 += delta * (result.num_turns - self.turns_mean)
+
+        if result.failure is not None:
+            self.failure_counts[result.failure] += 1
+        self.topic_counts[result.topic] += 1
+        if result.duration is not None:
+            self.latency.add(result.duration)
+        if result.speculative_tokens:
+            self.speculative_tokens.update(result.speculative_tokens)
+
+        # Records written before guesses were resolved have no "guess_topic"
+        for turn in result.history:
+            if "guess_topic" not in turn:
+                continue
+            guessed = turn["guess_topic"]
+            if guessed is None:
+                self.unresolved_guesses += 1
+            elif guessed != result.topic:
+                self.confusion[result.topic][guessed] += 1
+
+    def add_trace(self, tracer):
+        """Fold one game's `Tracer` histograms and counters into the run's."""
+        for name, sketch in tracer.spans.items():
+            self.spans[name].merge(sketch)
+        self.counters.update(tracer.counters)
+
+    def merge(self, other: "RunningStats"):
+        """Fold in stats gathered elsewhere, e.g. by another worker."""
+        self.add_trace(other)
+        if other.games == 0:
+            return
+
+        games = self.games + other.games
+        delta = other.turns_mean - self.turns_mean
+        self.turns_m2 += other.turns_m2 + delta**2 * self.games * other.games / games
+        self.turns_mean += delta * other.games / games
+        self.games = games
+        self.successes += other.successes
+        self.failure_counts.update(other.failure_counts)
+        self.topic_counts.update(other.topic_counts)
+        for topic, guesses in other.confusion.items():
+            self.confusion[topic].update(guesses)
+        self.unresolved_guesses += other.unresolved_guesses
+        self.latency.merge(other.latency)
+        self.speculative_tokens.update(other.speculative_tokens)
+
+    def summary(self) -> dict:
+        if self.games == 0:
+            return {}
+
+        variance = self.turns_m2 / (self.games - 1) if self.games > 1 else 0.0
+        summary = {
+            "total games": self.games,
+            "guess_success_rate": self.successes / self.games,
+            "average_turns": self.turns_mean,
+            "turns_variance": variance,
+            "failure_counts": dict(self.failure_counts),
+            "num_topics": dict(self.topic_counts),
+            "game_latency": self.latency.summary(),
+        }
+        if self.confusion or self.unresolved_guesses:
+            summary["guess_confusion"] = {
+                topic: dict(guesses) for topic, guesses in self.confusion.items()
+            }
+            summary["unresolved_guesses"] = self.unresolved_guesses
+        if self.speculative_tokens:
+            summary["speculative_tokens"] = dict(self.speculative_tokens)
+        if self.spans or self.counters:
+            spans = {name: sketch.summary() for name, sketch in self.spans.items()}
+            summary["trace"] = {"spans": spans, "counters": dict(self.counters)}
+        return summary
+
+
+class SequentialStopper:
+    """Anytime-valid stopping rule for the guess success rate.
+
+    After `n` games, the success rate lies in `rate ± sqrt(log(2 / alpha_n) / 2n)`
+    with probability `1 - alpha_n` (Hoeffding). Spending `alpha_n = alpha / n(n+1)`
+    at game `n` sums to `alpha` over all `n`, so the intervals hold jointly at every
+    game and the run may stop at whichever game they first meet the criterion
+    without inflating the error rate. A run stops once the interval is narrower
+    than `target_width`, or lies entirely on one side of `threshold` (e.g. the
+    success rate of a baseline config).
+
+    The guarantee needs the games in the order they were started, not the order
+    they finish: with games in flight, short (often successful) games finish
+    first. Games are therefore added by id, and the rule only sees the longest
+    prefix of ids that have all finished.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.05,
+        target_width: Optional[float] = None,
+        threshold: Optional[float] = None,
+        min_games: int = 10,
+    ):
+        if target_width is None and threshold is None:
+            raise ValueError("Set a target_width or a threshold to stop at.")
+        self.alpha = alpha
+        self.target_width = target_width
+        self.threshold = threshold
+        self.min_games = min_games
+        self.reason = None
+        # Games finished ahead of an earlier one still running, by id
+        self.pending: dict[int, bool] = {}
+        # Successes and games of the finished prefix, and of it when the rule fired
+        self.successes = 0
+        self.games = 0
+        self.stopped_at = None
+
+    def interval(self, successes: int, games: int) -> tuple[float, float]:
+        if games == 0:
+            return 0.0, 1.0
+        alpha_n = self.alpha / (games * (games + 1))
+        half_width = math.sqrt(math.log(2 / alpha_n) / (2 * games))
+        rate = successes / games
+        return max(0.0, rate - half_width), min(1.0, rate + half_width)
+
+    def add(self, game_id: int, success: bool):
+        """Record the outcome of game `game_id`, ids counting from 0 in start order."""
+        self.pending[game_id] = bool(success)
+        while self.games in self.pending:
+            self.successes += self.pending.pop(self.games)
+            self.games += 1
+
+    def check(self) -> bool:
+        """Whether the criterion is met by the finished prefix of games."""
+        if self.reason is not None:
+            return True
+        if self.games < self.min_games:
+            return False
+
+        low, high = self.interval(self.successes, self.games)
+        if self.target_width is not None and high - low <= self.target_width:
+            self.reason = "target_width"
+        elif self.threshold is not None and low > self.threshold:
+            self.reason = "above_threshold"
+        elif self.threshold is not None and high < self.threshold:
+            self.reason = "below_threshold"
+        if self.reason is not None:
+            self.stopped_at = (self.successes, self.games)
+        return self.reason is not None
+
+    def summary(self, stats: RunningStats, n_games: int) -> dict:
+        """The interval the rule decided on, and the games not played of `n_games`.
+
+        After stopping, the games still in flight are drained into `stats` but not
+        into the interval, which stays the one that met the criterion.
+        """
+        successes, games = self.stopped_at or (self.successes, self.games)
+        low, high = self.interval(successes, games)
+        return {
+            "stopped": self.reason is not None,
+            "reason": self.reason,
+            "interval": [low, high],
+            "games": games,
+            "alpha": self.alpha,
+            "games_saved": max(0, n_games - stats.games),
+        }
+
+
+def merge_counts(left: dict, right: dict) -> dict:
+    """Sum two (possibly nested) dicts of counters."""
+    merged = dict(left)
+    for key, value in right.items():
+        if isinstance(value, dict):
+            merged[key] = merge_counts(merged.get(key, {}), value)
+        else:
+            merged[key] = merged.get(key, 0) + value
+    return merged
@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+from functools import lru_cache
+import hashlib
+import json
+import random
+import re
+from typing import Optional
+
+
+def scripted_reply(messages: list[dict[str, str]]) -> str:
+    """Deterministic host/guesser behaviour for the prompts used by `src.main`.
+
+    The host answers yes or no from a hash of the topic and question. The guesser
+    asks a numbered question each turn and guesses the knowledge-base topics in
+    order, so a game against topic `i` of the knowledge base is won on turn `i + 1`.
+    """
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    prompt = messages[-1]["content"] if messages else ""
+    turn_match = re.search(r"Turn: (\d+)", prompt)
+    turn = int(turn_match.group(1)) if turn_match else 1
+
+    if "Answer only with 'yes' or 'no'" in prompt:
+        topic = re.search(r"topic is: (.*)", prompt)
+        question = re.search(r"question: (.*)", prompt)
+        key = "|".join(match.group(1) if match else "" for match in (topic, question))
+        return "yes" if hashlib.md5(key.encode()).digest()[0] % 2 else "no"
+
+    if "Ask a single yes/no question" in prompt:
+        return f"Is it thing number {turn}?"
+
+    if "Make your best guess" in prompt:
+        topics = re.search(r"following list: (.*)", system)
+        candidates = topics.group(1).split(", ") if topics else ["dog"]
+        guess = candidates[(turn - 1) % len(candidates)]
+        if "Question:" in prompt:
+            return f"Guess: {guess}\nQuestion: Is it thing number {turn + 1}?"
+        return guess
+
+    return "ok"
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count, about four characters per token."""
+    return max(1, len(text) // 4)
+
+
+# Trailing chatter appended by `padding`; contains neither "yes" nor "no"
+PADDING_SENTENCE = "That is my final answer."
+
+
+@lru_cache(maxsize=None)
+def stats_key():
+    """Key of the request counters in an app from `create_app`, e.g. `app[stats_key()]`.
+
+    Made on first use so that importing this module does not import aiohttp.
+    """
+    from aiohttp import web
+
+    return web.AppKey("stats", dict)
+
+
+def create_app(
+    latency_median: float = 0.0,
+    latency_sigma: float = 0.0,
+    seed: int = 0,
+    token_latency: float = 0.0,
+    padding: int = 0,
+):
+    """Build an aiohttp app serving `POST /v1/chat/completions`.
+
+    Each request sleeps for a log-normally distributed latency with the given median
+    and sigma (drawn from a seeded generator), plus `token_latency` seconds per
+    completion token. `padding` appends that many sentences of chatter on a new line
+    of every reply, as verbose models do; `max_tokens` truncates replies. Besides
+    single conversations, a list of conversations under `messages` is answered with
+    one choice per conversation, as sent by `VLLMModelWrapper` with
+    `batch_messages`. This batch protocol is specific to this mock server.
+    With `stream`, a single conversation is answered as server-sent events, a word
+    at a time, and generation stops when the client disconnects.
+    """
+    from aiohttp import web
+
+    rng = random.Random(seed)
+    stats = {
+        "requests": 0,
+        "completions": 0,
+        "completion_tokens": 0,
+        "streams_closed": 0,
+    }
+
+    def reply(messages: list[dict[str, str]], max_tokens: Optional[int]) -> str:
+        content = scripted_reply(messages)
+        if padding:
+            content += "\n" + " ".join([PADDING_SENTENCE] * padding)
+        if max_tokens is not None:
+            content = content[: 4 * max_tokens]
+        return content
+
+    def choice(
+        index: int, messages: list[dict[str, str]], max_tokens: Optional[int]
+    ) -> tuple[dict, dict]:
+        content = reply(messages, max_tokens)
+        usage = {
+            "prompt_tokens": sum(count_tokens(m["content"]) for m in messages),
+            "completion_tokens": count_tokens(content),
+        }
+        message = {"role": "assistant", "content": content}
+        return {"index": index, "message": message, "finish_reason": "stop"}, usage
+
+    async def stream_completion(request, payload: dict, messages: list):
+        stats["requests"] += 1
+        stats["completions"] += 1
+        content = reply(messages, payload.get("max_tokens"))
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(data):
+            await response.write(f"data: {json.dumps(data)}\n\n".encode())
+
+        try:
+            for word in re.findall(r"\S+\s*|\s+", content):
+                tokens = count_tokens(word)
+                if token_latency > 0:
+                    await asyncio.sleep(token_latency * tokens)
+                await send({"choices": [{"index": 0, "delta": {"content": word}}]})
+                stats["completion_tokens"] += tokens
+            if payload.get("stream_options", {}).get("include_usage"):
+                prompt_tokens = sum(count_tokens(m["content"]) for m in messages)
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": count_tokens(content),
+                }
+                await send({"choices": [], "usage": usage})
+            await response.write(b"data: [DONE]\n\n")
+        except asyncio.CancelledError:
+            stats["streams_closed"] += 1
+            raise
+        except ConnectionResetError:
+            # The client has read all it needed and hung up
+            stats["streams_closed"] += 1
+        return response
+
+    async def chat_completions(request):
+        payload = await request.json()
+        conversations = payload.get("messages", [])
+        batched = bool(conversations) and isinstance(conversations[0], list)
+        if batched and payload.get("stream"):
+            return web.json_response(
+                {"error": "batched requests cannot be streamed"}, status=400
+            )
+
+        if latency_median > 0:
+            await asyncio.sleep(latency_median * rng.lognormvariate(0, latency_sigma))
+
+        if payload.get("stream"):
+            return await stream_completion(request, payload, conversations)
+        if not batched:
+            conversations = [conversations]
+
+        choices, prompt_tokens, completion_tokens = [], 0, 0
+        for index, messages in enumerate(conversations):
+            result, usage = choice(index, messages, payload.get("max_tokens"))
+            choices.append(result)
+            prompt_tokens += usage["prompt_tokens"]
+            completion_tokens += usage["completion_tokens"]
+
+        if token_latency > 0:
+            await asyncio.sleep(token_latency * completion_tokens)
+        stats["requests"] += 1
+        stats["completions"] += len(choices)
+        stats["completion_tokens"] += completion_tokens
+        return web.json_response(
+            {
+                "id": f"mock-{stats['requests']}",
+                "object": "chat.completion",
+                "model": payload.get("model", "mock"),
+                "choices": choices,
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+    app = web.Application()
+    app[stats_key()] = stats
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve a deterministic mock LLM speaking the chat completions API."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--latency-median",
+        type=float,
+        default=0.0,
+        help="Median response latency in seconds.",
+    )
+    parser.add_argument(
+        "--latency-sigma",
+        type=float,
+        default=0.0,
+        help="Sigma of the log-normal latency distribution.",
+    )
+    parser.add_argument(
+        "--token-latency",
+        type=float,
+        default=0.0,
+        help="Seconds spent generating each completion token.",
+    )
+    parser.add_argument(
+        "--padding",
+        type=int,
+        default=0,
+        help="Sentences of chatter appended to every reply.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    """Run the mock server until interrupted."""
+    from aiohttp import web
+
+    args = parse_args()
+    app = create_app(
+        args.latency_median,
+        args.latency_sigma,
+        args.seed,
+        token_latency=args.token_latency,
+        padding=args.padding,
+    )
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,43 @@
 from abc import ABC, abstractmethod
 import asyncio
-from openai import AsyncOpenAI
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import hashlib
+import json
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
 
-from src.exceptions import APIError
+from src import tracing
+from src.config import ModelConfig
+from src.exceptions import APIError, FatalAPIError, RetryableAPIError
+from src.metrics import QuantileSketch
+from src.ratelimit import RateLimiter, backoff_delay, parse_retry_after
+from src.utils import estimate_tokens
 
 
-RETRY_WAIT_TIME = 1.0
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# Statuses worth retrying besides 5xx: timeout, conflict and too many requests
+RETRYABLE_STATUSES = {408, 409, 429}
+
+_call_kind: ContextVar[Optional[str]] = ContextVar("call_kind", default=None)
+
+
+@contextmanager
+def call_kind(kind: Optional[str]):
+    """Label the model calls made in this block, e.g. with the turn type."""
+    token = _call_kind.set(kind)
+    try:
+        yield
+    finally:
+        _call_kind.reset(token)
 
 
 class ModelWrapper(ABC):
@@ -14,48 +46,916 @@ class ModelWrapper(ABC):
         """Generate text based on the prompt."""
         pass
 
+    async def generate_batch(
+        self, prompts: list[list[dict[str, str]]], **kwargs
+    ) -> list[str]:
+        """Generate one response per prompt.
+
+        The default sends each prompt as its own request; backends that accept several
+        prompts in a single request override this.
+        """
+        responses = await asyncio.gather(
+            *(self.generate(prompt, **kwargs) for prompt in prompts)
+        )
+        return list(responses)
+
+    async def generate_stream(
+        self,
+        prompts: list[dict[str, str]],
+        stop_when: Optional[Callable[[str], bool]] = None,
+        **kwargs,
+    ) -> str:
+        """Generate a response, streamed and cut off once `stop_when(text)` holds.
+
+        The default does not stream and returns the full response of `generate`;
+        backends that can stream override this and close the stream early.
+        """
+        return await self.generate(prompts, **kwargs)
+
+    def stats(self) -> dict:
+        """Counters describing the model's activity so far."""
+        return {}
+
+    async def aclose(self):
+        """Release any resources held by the model."""
+        pass
+
+
+def http_error(status: int, message: str, retry_after: Optional[str] = None):
+    """Classify a failed HTTP response as a retryable or a fatal API error."""
+    if status in RETRYABLE_STATUSES or status >= 500:
+        return RetryableAPIError(message, retry_after=parse_retry_after(retry_after))
+    return FatalAPIError(message)
+
+
+def prompt_tokens(prompts: list) -> int:
+    """Estimated prompt tokens of one conversation or a batch of them."""
+    if prompts and isinstance(prompts[0], list):
+        return sum(prompt_tokens(prompt) for prompt in prompts)
+    return sum(estimate_tokens(message["content"] or "") for message in prompts)
+
+
+async def generate_with_retries(
+    request: Callable[[], Awaitable[str]],
+    max_retries: int,
+    limiter: Optional[RateLimiter] = None,
+    tokens: int = 0,
+) -> str:
+    """Await `request` until it succeeds, backing off between failed attempts.
+
+    Every attempt first waits for `limiter`, if any, to admit a request of about
+    `tokens` tokens. Failed attempts are retried after an exponential backoff with
+    full jitter, or after the server's Retry-After if that is longer; a Retry-After
+    also pauses the limiter, so the other games back off too. `FatalAPIError`s are
+    raised at once.
+    """
+    for attempt in range(max_retries):
+        if limiter is not None:
+            with tracing.span("model.rate_limit_wait"):
+                await limiter.acquire(tokens)
+        try:
+            with tracing.span("model.network"):
+                return await request()
+        except FatalAPIError:
+            raise
+        except Exception as e:
+            print(f"Attempt {attempt + 1} failed: {e}")
+            tracing.count("model.retries")
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after is not None and limiter is not None:
+                limiter.pause(retry_after)
+            if attempt < max_retries - 1:
+                delay = backoff_delay(
+                    attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY, retry_after
+                )
+                with tracing.span("model.retry_wait"):
+                    await asyncio.sleep(delay)
+
+    raise APIError("Failed to generate response.")
+
+
+def settle_tokens(limiter: Optional[RateLimiter], usage: Optional[dict], tokens: int):
+    """Charge `limiter` for the tokens a response used beyond the `tokens` estimate."""
+    if limiter is not None and usage:
+        used = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+        limiter.consume(used - tokens)
+
+
+def settle_stream_usage(
+    limiter: Optional[RateLimiter], usage: Optional[dict], tokens: int, text: str
+):
+    """Account for a streamed response, estimating its usage if it was cut off."""
+    if usage is None:
+        usage = {"prompt_tokens": tokens, "completion_tokens": estimate_tokens(text)}
+    tracing.add_tokens(usage)
+    settle_tokens(limiter, usage, tokens)
+
+
+def openai_error(error: Exception) -> Exception:
+    """Classify an error raised by the OpenAI client; others are left as they are."""
+    import openai
+
+    if isinstance(error, openai.APIStatusError):
+        return http_error(
+            error.status_code, str(error), error.response.headers.get("retry-after")
+        )
+    return error
+
 
 class OpenAIModelWrapper(ModelWrapper):
     def __init__(
         self,
         model_name: str = "gpt-4o-mini",
         max_retries: int = 3,
+        temperature: Optional[float] = None,
+        client: Optional["AsyncOpenAI"] = None,
+        limiter: Optional[RateLimiter] = None,
     ):
+        if client is None:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(max_retries=0)
+
         self.model_name = model_name
-        self.client = AsyncOpenAI()
+        self.client = client
         self.max_retries = max_retries
+        self.limiter = limiter
+        self.default_kwargs = {}
+        if temperature is not None:
+            self.default_kwargs["temperature"] = temperature
 
     async def generate(self, prompts: list[dict[str, str]], **kwargs) -> str:
-        for attempt in range(self.max_retries):
+        kwargs = {**self.default_kwargs, **kwargs}
+        tokens = prompt_tokens(prompts)
+
+        async def request() -> str:
             try:
                 response = await self.client.chat.completions.create(
                     model=self.model_name, messages=prompts, **kwargs
                 )
+            except Exception as e:
+                raise openai_error(e) from e
+
+            if not response.choices:
+                raise APIError("No response choices returned.")
+
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                usage = {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                }
+                tracing.add_tokens(usage)
+                settle_tokens(self.limiter, usage, tokens)
+            return response.choices[0].message.content
 
-                if not response.choices:
-                    raise APIError("No response choices returned.")
+        return await generate_with_retries(
+            request, self.max_retries, self.limiter, tokens
+        )
 
-                return response.choices[0].message.content
+    async def generate_stream(
+        self,
+        prompts: list[dict[str, str]],
+        stop_when: Optional[Callable[[str], bool]] = None,
+        **kwargs,
+    ) -> str:
+        kwargs = {**self.default_kwargs, **kwargs}
+        tokens = prompt_tokens(prompts)
 
+        async def request() -> str:
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=prompts,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **kwargs,
+                )
             except Exception as e:
-                print(f"Attempt {attempt + 1} failed: {e}")
-                if attempt < self.max_retries - 1:
-                    asyncio.sleep(RETRY_WAIT_TIME)
+                raise openai_error(e) from e
+
+            text, usage = "", None
+            try:
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = {
+                            "prompt_tokens": chunk.usage.prompt_tokens,
+                            "completion_tokens": chunk.usage.completion_tokens,
+                        }
+                    if chunk.choices:
+                        text += chunk.choices[0].delta.content or ""
+                        if stop_when is not None and stop_when(text):
+                            tracing.count("model.stream_cutoffs")
+                            break
+            finally:
+                await stream.close()
 
-        raise APIError("Failed to generate response.")
+            settle_stream_usage(self.limiter, usage, tokens, text)
+            return text
+
+        return await generate_with_retries(
+            request, self.max_retries, self.limiter, tokens
+        )
+
+    async def aclose(self):
+        await self.client.close()
 
 
 class VLLMModelWrapper(ModelWrapper):
-    def __init__(self, server_url: str):
+    """Async client for a vLLM server's OpenAI-compatible chat completions endpoint.
+
+    `server_url` is the full endpoint URL, e.g.
+    `http://localhost:8000/v1/chat/completions`. One HTTP session (and connection
+    pool) is opened lazily on the first request and reused until `aclose`.
+
+    Batches are sent as concurrent single requests, which vLLM batches on its own.
+    `batch_messages` instead sends a whole batch in one request, as a list of
+    conversations under `messages`. That protocol is specific to this repo's
+    `src.mock_server`; vLLM's own server rejects it.
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        model_name: Optional[str] = None,
+        max_retries: int = 3,
+        temperature: Optional[float] = None,
+        timeout: float = 60.0,
+        pool_size: int = 100,
+        keepalive_expiry: float = 30.0,
+        limiter: Optional[RateLimiter] = None,
+        batch_messages: bool = False,
+    ):
         self.server_url = server_url
+        self.model_name = model_name
+        self.batch_messages = batch_messages
+        self.max_retries = max_retries
+        self.limiter = limiter
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keepalive_expiry = keepalive_expiry
+        self.default_kwargs = {}
+        if temperature is not None:
+            self.default_kwargs["temperature"] = temperature
+        self.session = None
+
+    def _get_session(self):
+        import aiohttp
+
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size, keepalive_timeout=self.keepalive_expiry
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    def _payload(self, messages: list, kwargs: dict) -> dict:
+        payload = {"messages": messages, **self.default_kwargs, **kwargs}
+        if self.model_name is not None:
+            payload["model"] = self.model_name
+        return payload
+
+    def _check_status(self, response):
+        if response.status >= 400:
+            raise http_error(
+                response.status,
+                f"{response.status} {response.reason} from {self.server_url}",
+                response.headers.get("Retry-After"),
+            )
+
+    async def _post(self, payload: dict, tokens: int) -> list[dict]:
+        session = self._get_session()
+        async with session.post(self.server_url, json=payload) as response:
+            self._check_status(response)
+            data = await response.json()
+
+        if not data.get("choices"):
+            raise APIError("No response choices returned.")
+
+        tracing.add_tokens(data.get("usage"))
+        settle_tokens(self.limiter, data.get("usage"), tokens)
+        return data["choices"]
+
+    async def generate(self, prompts: list[dict[str, str]], **kwargs) -> str:
+        payload = self._payload(prompts, kwargs)
+        tokens = prompt_tokens(prompts)
 
-    def generate(self, prompt: str, **kwargs) -> str:
-        import requests
+        async def request() -> str:
+            choices = await self._post(payload, tokens)
+            return choices[0]["message"]["content"].strip()
 
-        response = requests.post(self.server_url, json={"prompt": prompt, **kwargs})
-        return response.json()["response"].strip()
+        return await generate_with_retries(
+            request, self.max_retries, self.limiter, tokens
+        )
+
+    async def generate_stream(
+        self,
+        prompts: list[dict[str, str]],
+        stop_when: Optional[Callable[[str], bool]] = None,
+        **kwargs,
+    ) -> str:
+        """Read the response as server-sent events, closing the connection early.
+
+        Dropping the connection once `stop_when` holds makes the server abort the
+        generation, so the tokens after the cutoff are neither waited for nor made.
+        """
+        payload = self._payload(prompts, kwargs)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        tokens = prompt_tokens(prompts)
+
+        async def request() -> str:
+            text, usage = "", None
+            session = self._get_session()
+            async with session.post(self.server_url, json=payload) as response:
+                self._check_status(response)
+                async for line in response.content:
+                    field, _, data = line.decode().partition(":")
+                    data = data.strip()
+                    if field != "data":
+                        continue
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or usage
+                    if chunk.get("choices"):
+                        text += chunk["choices"][0]["delta"].get("content") or ""
+                        if stop_when is not None and stop_when(text):
+                            tracing.count("model.stream_cutoffs")
+                            response.close()
+                            break
+
+            settle_stream_usage(self.limiter, usage, tokens, text)
+            return text.strip()
+
+        return await generate_with_retries(
+            request, self.max_retries, self.limiter, tokens
+        )
+
+    async def generate_batch(
+        self, prompts: list[list[dict[str, str]]], **kwargs
+    ) -> list[str]:
+        """Send every conversation in one request if `batch_messages` is set.
+
+        The server receives the conversations as a list under `messages` and returns
+        one choice per conversation, with `index` giving its position in the batch.
+        """
+        if not self.batch_messages:
+            return await super().generate_batch(prompts, **kwargs)
+
+        payload = self._payload(prompts, kwargs)
+        tokens = prompt_tokens(prompts)
+
+        async def request() -> list[str]:
+            choices = await self._post(payload, tokens)
+            if len(choices) != len(prompts):
+                raise APIError(f"Expected {len(prompts)} choices, got {len(choices)}.")
+            choices = sorted(choices, key=lambda choice: choice.get("index", 0))
+            return [choice["message"]["content"].strip() for choice in choices]
+
+        return await generate_with_retries(
+            request, self.max_retries, self.limiter, tokens
+        )
+
+    async def aclose(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
 
 
 class DummyModelWrapper(ModelWrapper):
-    def generate(self, prompt: str, **kwargs) -> str:
+    async def generate(self, prompt: str, **kwargs) -> str:
         return "Dummy response"
+
+
+def make_openai_client(config: ModelConfig) -> "AsyncOpenAI":
+    """Create an OpenAI client whose connection pool is sized from the config."""
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    limits = httpx.Limits(
+        max_connections=config.pool_size,
+        max_keepalive_connections=config.keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+    # Retries are left to `generate_with_retries`, which shares the run's backoff
+    return AsyncOpenAI(
+        max_retries=0, http_client=DefaultAsyncHttpxClient(limits=limits)
+    )
+
+
+def split_count(total: int, weights: list[int]) -> list[int]:
+    """Split `total` in proportion to `weights` into integers that sum to it."""
+    weight_sum = sum(weights)
+    if weight_sum == 0:
+        return [0] * len(weights)
+    shares, cumulative, assigned = [], 0, 0
+    for weight in weights:
+        cumulative += weight
+        share = round(total * cumulative / weight_sum) - assigned
+        shares.append(share)
+        assigned += share
+    return shares
+
+
+class BatchingModelWrapper(ModelWrapper):
+    """Coalesce concurrent `generate` calls into batched requests.
+
+    Calls are collected for up to `batch_window` seconds, or until `max_batch_size`
+    calls are waiting, and then sent together through the wrapped model's
+    `generate_batch`. Only calls with identical keyword arguments share a batch.
+    """
+
+    def __init__(
+        self,
+        model: ModelWrapper,
+        max_batch_size: int = 32,
+        batch_window: float = 0.005,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.model = model
+        self.model_name = getattr(model, "model_name", None)
+        self.default_kwargs = getattr(model, "default_kwargs", {})
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.pending: dict[str, tuple[dict, list]] = {}
+        self.timers: dict[str, asyncio.TimerHandle] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.requests_batched = 0
+
+    async def generate(self, prompts: list[dict[str, str]], **kwargs) -> str:
+        loop = asyncio.get_running_loop()
+        key = repr(sorted(kwargs.items()))
+        future = loop.create_future()
+
+        _, batch = self.pending.setdefault(key, (kwargs, []))
+        batch.append((prompts, future, tracing.current(), time.perf_counter()))
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            self.timers[key] = loop.call_later(self.batch_window, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: str):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        if key not in self.pending:
+            return
+        kwargs, batch = self.pending.pop(key)
+
+        task = asyncio.create_task(self._send(batch, kwargs))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, batch: list, kwargs: dict):
+        # Timings and tokens are recorded per caller below, not into whichever
+        # game's tracer this task happened to inherit
+        scratch = tracing.Tracer()
+        tracing.activate(scratch)
+        self.batches_sent += 1
+        self.requests_batched += len(batch)
+        sent = time.perf_counter()
+        try:
+            responses = await self.model.generate_batch(
+                [prompts for prompts, *_ in batch], **kwargs
+            )
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        done = time.perf_counter()
+        # The batch's usage is split by each caller's share of the prompt and
+        # (estimated) completion tokens
+        prompt_shares = split_count(
+            scratch.counters["tokens.prompt"],
+            [prompt_tokens(prompts) for prompts, *_ in batch],
+        )
+        completion_shares = split_count(
+            scratch.counters["tokens.completion"],
+            [estimate_tokens(response) for response in responses],
+        )
+        for (_, future, tracer, enqueued), response, prompt, completion in zip(
+            batch, responses, prompt_shares, completion_shares
+        ):
+            if tracer is not None:
+                tracer.record("model.queue_wait", sent - enqueued)
+                tracer.record("model.network", done - sent)
+                if prompt or completion:
+                    tracer.count("tokens.prompt", prompt)
+                    tracer.count("tokens.completion", completion)
+            if not future.done():
+                future.set_result(response)
+
+    async def generate_batch(
+        self, prompts: list[list[dict[str, str]]], **kwargs
+    ) -> list[str]:
+        return await self.model.generate_batch(prompts, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            **self.model.stats(),
+            "batches_sent": self.batches_sent,
+            "requests_batched": self.requests_batched,
+        }
+
+    async def aclose(self):
+        for key in list(self.pending):
+            self._flush(key)
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.model.aclose()
+
+
+class HedgingModelWrapper(ModelWrapper):
+    """Send a duplicate of calls that are slower than usual and keep the first reply.
+
+    Call latencies are tracked per `call_kind` (the turn type, for agent calls).
+    Once `min_samples` calls of a kind have finished, a call still running after
+    that kind's `quantile` latency gets a hedge: the same request sent again. The
+    first to succeed is returned and the other is left to finish in the background
+    rather than cancelled, for the same reason as discarded speculative branches
+    (see `Game20QEnv._discard`). Hedges are capped at `max_ratio` of all calls so a
+    slow backend does not get its load doubled.
+    """
+
+    def __init__(
+        self,
+        model: ModelWrapper,
+        quantile: float = 0.95,
+        max_ratio: float = 0.1,
+        min_samples: int = 20,
+    ):
+        self.model = model
+        self.model_name = getattr(model, "model_name", None)
+        self.default_kwargs = getattr(model, "default_kwargs", {})
+        self.quantile = quantile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.latencies: defaultdict[Optional[str], QuantileSketch] = defaultdict(
+            QuantileSketch
+        )
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        # Losing requests still running, kept referenced until they finish
+        self.discarded: set[asyncio.Task] = set()
+
+    def threshold(self, kind: Optional[str]) -> Optional[float]:
+        """Seconds after which a call of `kind` is hedged; None while unknown."""
+        sketch = self.latencies[kind]
+        if sketch.count < self.min_samples:
+            return None
+        return sketch.quantile(self.quantile)
+
+    async def generate(self, prompts: list[dict[str, str]], **kwargs) -> str:
+        return await self._hedged(lambda: self.model.generate(prompts, **kwargs))
+
+    async def generate_stream(
+        self,
+        prompts: list[dict[str, str]],
+        stop_when: Optional[Callable[[str], bool]] = None,
+        **kwargs,
+    ) -> str:
+        return await self._hedged(
+            lambda: self.model.generate_stream(prompts, stop_when, **kwargs)
+        )
+
+    async def _hedged(self, call: Callable[[], Awaitable[str]]) -> str:
+        kind = _call_kind.get()
+        self.calls += 1
+        start = time.perf_counter()
+        primary = asyncio.create_task(call())
+        tasks = {primary}
+        try:
+            threshold = self.threshold(kind)
+            if threshold is not None:
+                await asyncio.wait(tasks, timeout=threshold)
+                if not primary.done() and self._may_hedge():
+                    self.hedges_sent += 1
+                    tracing.count("model.hedges")
+                    tasks.add(asyncio.create_task(call()))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if task is not primary:
+                        self.hedges_won += 1
+                        tracing.count("model.hedges_won")
+                    self.latencies[kind].add(time.perf_counter() - start)
+                    return task.result()
+            raise error
+        except asyncio.CancelledError:
+            # The caller gave up, as it would on an unhedged call
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            for task in tasks:
+                if not task.done():
+                    self.discarded.add(task)
+                    task.add_done_callback(self._discarded_done)
+                elif not task.cancelled():
+                    # Retrieve the losing hedge's error, if any, so it is not logged
+                    task.exception()
+
+    def _discarded_done(self, task: asyncio.Task):
+        self.discarded.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+    def _may_hedge(self) -> bool:
+        return self.hedges_sent < self.max_ratio * self.calls
+
+    async def generate_batch(
+        self, prompts: list[list[dict[str, str]]], **kwargs
+    ) -> list[str]:
+        return await self.model.generate_batch(prompts, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            **self.model.stats(),
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+        }
+
+    async def aclose(self):
+        await asyncio.gather(*self.discarded, return_exceptions=True)
+        await self.model.aclose()
+
+
+class CachedModelWrapper(ModelWrapper):
+    """Serve repeated requests from a response cache.
+
+    Requests are keyed on a hash of the model name, the messages and the sampling
+    arguments. Recent responses live in an in-memory LRU of `max_size` entries; if
+    `path` is given, every response is also stored in a SQLite database so later runs
+    can reuse it. Identical requests already in flight share one backend call.
+    Only useful for deterministic sampling, e.g. `temperature=0`.
+
+    The database may be shared by several processes, e.g. the workers of a run: it
+    is opened in WAL mode and every write is committed on its own, so no process
+    holds the write lock for long. Database calls run on a dedicated thread rather
+    than blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        model: ModelWrapper,
+        max_size: int = 1024,
+        path: Optional[str] = None,
+    ):
+        self.model = model
+        self.model_name = getattr(model, "model_name", None)
+        self.max_size = max_size
+        self.memory: OrderedDict[str, str] = OrderedDict()
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.db = None
+        self.db_executor = None
+        if path is not None:
+            # Autocommit, so each statement holds the write lock only while it runs
+            self.db = sqlite3.connect(
+                path, timeout=30.0, isolation_level=None, check_same_thread=False
+            )
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL)"
+            )
+            # One thread, so the connection is never used concurrently
+            self.db_executor = ThreadPoolExecutor(max_workers=1)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def cache_key(self, prompts: list[dict[str, str]], kwargs: dict) -> str:
+        data = {
+            "model": self.model_name,
+            "messages": prompts,
+            "kwargs": {**getattr(self.model, "default_kwargs", {}), **kwargs},
+        }
+        encoded = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    async def _run_db(self, query: str, params: tuple) -> Optional[tuple]:
+        def run():
+            return self.db.execute(query, params).fetchone()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.db_executor, run)
+
+    async def _lookup(self, key: str) -> Optional[str]:
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+
+        if self.db is not None:
+            row = await self._run_db(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            )
+            if row is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, row[0])
+                return row[0]
+
+        return None
+
+    def _remember(self, key: str, response: str):
+        self.memory[key] = response
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    async def _store(self, key: str, response: str):
+        self._remember(key, response)
+        if self.db is not None:
+            await self._run_db(
+                "INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)",
+                (key, response),
+            )
+
+    async def generate(self, prompts: list[dict[str, str]], **kwargs) -> str:
+        key = self.cache_key(prompts, kwargs)
+        return await self._cached(key, lambda: self.model.generate(prompts, **kwargs))
+
+    async def generate_stream(
+        self,
+        prompts: list[dict[str, str]],
+        stop_when: Optional[Callable[[str], bool]] = None,
+        **kwargs,
+    ) -> str:
+        # A response cut off early differs from the full one, so it is keyed apart
+        stop = getattr(stop_when, "__name__", None)
+        key = self.cache_key(prompts, {**kwargs, "stop_when": stop})
+        return await self._cached(
+            key, lambda: self.model.generate_stream(prompts, stop_when, **kwargs)
+        )
+
+    async def _cached(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        response = await self._lookup(key)
+        if response is not None:
+            return response
+
+        if key in self.inflight:
+            self.hits += 1
+            return await asyncio.shield(self.inflight[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            response = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            del self.inflight[key]
+
+        future.set_result(response)
+        await self._store(key, response)
+        return response
+
+    async def generate_batch(
+        self, prompts: list[list[dict[str, str]]], **kwargs
+    ) -> list[str]:
+        keys = [self.cache_key(prompt, kwargs) for prompt in prompts]
+        responses = [await self._lookup(key) for key in keys]
+        misses = [i for i, response in enumerate(responses) if response is None]
+
+        if misses:
+            self.misses += len(misses)
+            generated = await self.model.generate_batch(
+                [prompts[i] for i in misses], **kwargs
+            )
+            for i, response in zip(misses, generated):
+                responses[i] = response
+                await self._store(keys[i], response)
+
+        return responses
+
+    def stats(self) -> dict:
+        return {
+            **self.model.stats(),
+            "cache_hits": self.hits,
+            "cache_disk_hits": self.disk_hits,
+            "cache_misses": self.misses,
+        }
+
+    async def aclose(self):
+        if self.db is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.db_executor, self.db.close)
+            self.db_executor.shutdown()
+            self.db = None
+        await self.model.aclose()
+
+
+class ModelRegistry:
+    """Run-scoped pool of model wrappers shared by every game in a run.
+
+    Games borrow models with `get` instead of building their own, so a run opens one
+    client and one connection pool per model. Use as an async context manager, or
+    call `aclose` when the run is over. With `requests_per_minute` or
+    `tokens_per_minute` set, every model's calls go through one shared `RateLimiter`.
+    """
+
+    def __init__(self, config: ModelConfig):
+        self.config = config
+        self.models: dict[str, ModelWrapper] = {}
+        self.limiter = None
+        if config.requests_per_minute or config.tokens_per_minute:
+            self.limiter = RateLimiter(
+                config.requests_per_minute, config.tokens_per_minute
+            )
+
+    def get(self, name: Optional[str] = None) -> ModelWrapper:
+        """Return the shared model for `name`, creating it on first use."""
+        name = name or self.config.name
+        if name not in self.models:
+            model = self._build(name)
+            if self.config.batch_size > 1:
+                model = BatchingModelWrapper(
+                    model,
+                    max_batch_size=self.config.batch_size,
+                    batch_window=self.config.batch_window,
+                )
+            if self.config.hedge_quantile is not None:
+                model = HedgingModelWrapper(
+                    model,
+                    quantile=self.config.hedge_quantile,
+                    max_ratio=self.config.hedge_max_ratio,
+                )
+            if self.config.cache_size > 0:
+                model = CachedModelWrapper(
+                    model,
+                    max_size=self.config.cache_size,
+                    path=self.config.cache_path,
+                )
+            self.models[name] = model
+        return self.models[name]
+
+    def _build(self, name: str) -> ModelWrapper:
+        if self.config.backend == "openai":
+            return OpenAIModelWrapper(
+                model_name=name,
+                max_retries=self.config.max_retries,
+                temperature=self.config.temperature,
+                client=make_openai_client(self.config),
+                limiter=self.limiter,
+            )
+        elif self.config.backend == "vllm":
+            if self.config.server_url is None:
+                raise ValueError("The vllm backend requires a server_url.")
+            return VLLMModelWrapper(
+                self.config.server_url,
+                model_name=name,
+                max_retries=self.config.max_retries,
+                temperature=self.config.temperature,
+                timeout=self.config.timeout,
+                pool_size=self.config.pool_size,
+                keepalive_expiry=self.config.keepalive_expiry,
+                limiter=self.limiter,
+                batch_messages=self.config.batch_messages,
+            )
+        elif self.config.backend == "dummy":
+            return DummyModelWrapper()
+        else:
+            raise ValueError(f"Unknown model backend: {self.config.backend}")
+
+    def stats(self) -> dict:
+        """Activity counters of every model borrowed during the run."""
+        stats = {name: model.stats() for name, model in self.models.items()}
+        if self.limiter is not None:
+            stats["rate_limiter"] = self.limiter.stats()
+        return stats
+
+    async def aclose(self):
+        models, self.models = self.models, {}
+        await asyncio.gather(*(model.aclose() for model in models.values()))
+
+    async def __aenter__(self) -> "ModelRegistry":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+from functools import lru_cache
+from pathlib import Path
+import re
+from typing import Optional
+
+import numpy as np
+
+from src.config import ModelConfig
+from src.exceptions import APIError
+from src.model import ModelRegistry, ModelWrapper
+from src.scheduler import GameScheduler
+import src.utils as utils
+
+
+LABEL_SYSTEM_PROMPT = (
+    "You are labelling facts for a game of 20 questions. "
+    "Answer questions about the given topic truthfully with only 'yes' or 'no'."
+)
+
+LABEL_TEMPLATE = "Topic: {topic}\nQuestion: {question}\nAnswer only with 'yes' or 'no'."
+
+# Topics read at once when counting answers, bounding the temporaries
+COUNT_CHUNK_ROWS = 1024
+# Answers after which the guesser's candidates are shared by the games of a run
+MAX_SHARED_DEPTH = 4
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and drop punctuation so near-identical texts match."""
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+class AnswerOracle:
+    """Precomputed yes/no answers for every topic × question pair.
+
+    `answers[i, j]` is the answer for topic `i` and question `j`; `known[i, j]` is
+    False where labelling did not produce a usable answer, so callers fall back
+    to the LLM for those pairs.
+    """
+
+    def __init__(
+        self,
+        topics: list[str],
+        questions: list[str],
+        answers: np.ndarray,
+        known: Optional[np.ndarray] = None,
+    ):
+        answers = np.asarray(answers, dtype=bool)
+        if answers.shape != (len(topics), len(questions)):
+            raise ValueError("Answer matrix shape must be (topics, questions).")
+
+        self.topics = list(topics)
+        self.questions = list(questions)
+        self.answers = answers
+        self.known = (
+            np.ones_like(answers) if known is None else np.asarray(known, dtype=bool)
+        )
+        self.topic_index = {topic.lower(): i for i, topic in enumerate(self.topics)}
+        self.question_index = {
+            normalize_question(question): j for j, question in enumerate(self.questions)
+        }
+        self.hits = 0
+        self.misses = 0
+        self._tree = (None, None)
+
+    def lookup(self, topic: str, question: str) -> Optional[str]:
+        """Return the stored answer, or None if the pair is not in the matrix."""
+        i = self.topic_index.get(topic.lower()) if topic else None
+        j = self.question_index.get(normalize_question(question)) if question else None
+        if i is None or j is None or not self.known[i, j]:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return "yes" if self.answers[i, j] else "no"
+
+    def stats(self) -> dict:
+        return {"oracle_hits": self.hits, "oracle_misses": self.misses}
+
+    def answer_counts(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Per question, how many topics of the `rows` mask are known to say yes/no."""
+        yes = np.zeros(len(self.questions), dtype=np.int64)
+        labelled = np.zeros(len(self.questions), dtype=np.int64)
+        indices = np.flatnonzero(rows)
+        for start in range(0, len(indices), COUNT_CHUNK_ROWS):
+            stop = start + COUNT_CHUNK_ROWS
+            chunk = indices[start:stop]
+            known = self.known[chunk]
+            yes += np.count_nonzero(known & self.answers[chunk], axis=0)
+            labelled += np.count_nonzero(known, axis=0)
+        return yes, labelled - yes
+
+    def candidate_tree(self, knowledge_base) -> "CandidateTree":
+        """The guesser's shared candidate states for games over `knowledge_base`."""
+        cached_kb, tree = self._tree
+        if cached_kb is not knowledge_base:
+            tree = CandidateTree(self, knowledge_base)
+            self._tree = (knowledge_base, tree)
+        return tree
+
+    def save(self, path: str):
+        """Store the matrix as bit-packed arrays in a compressed .npz file."""
+        np.savez_compressed(
+            path,
+            topics=np.array(self.topics),
+            questions=np.array(self.questions),
+            answers=np.packbits(self.answers, axis=1),
+            known=np.packbits(self.known, axis=1),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "AnswerOracle":
+        with np.load(path) as data:
+            topics = data["topics"].tolist()
+            questions = data["questions"].tolist()
+            n_questions = len(questions)
+            answers = np.unpackbits(data["answers"], axis=1, count=n_questions)
+            known = np.unpackbits(data["known"], axis=1, count=n_questions)
+        return cls(topics, questions, answers.astype(bool), known.astype(bool))
+
+
+class CandidateTree:
+    """Candidates of the info-gain guesser after each sequence of answers.
+
+    A node is the candidate mask and per-question yes/no counts reached by a path
+    of (question, answer) pairs from the knowledge base's topics. The first
+    answers remove the most topics, so the nodes of the first `max_depth` answers
+    are computed once, when a game first reaches them, and shared by every game
+    of the run; deeper down each game updates its own copy.
+    """
+
+    def __init__(
+        self,
+        oracle: AnswerOracle,
+        knowledge_base,
+        max_depth: int = MAX_SHARED_DEPTH,
+    ):
+        self.oracle = oracle
+        self.max_depth = max_depth
+        candidates = np.zeros(len(oracle.topics), dtype=bool)
+        for topic in knowledge_base:
+            index = oracle.topic_index.get(topic.lower())
+            if index is not None:
+                candidates[index] = True
+        self.nodes = {(): (candidates, *oracle.answer_counts(candidates))}
+
+    def root(self) -> tuple:
+        return self.nodes[()]
+
+    def child(self, path: tuple, question: int, answer: bool) -> Optional[tuple]:
+        """Node after answering `question` at `path`, None below `max_depth`."""
+        key = path + ((question, answer),)
+        if len(key) > self.max_depth:
+            return None
+        node = self.nodes.get(key)
+        if node is None:
+            candidates, yes, no = self.nodes[path]
+            oracle = self.oracle
+            mismatched = oracle.answers[:, question] != answer
+            removed = candidates & oracle.known[:, question] & mismatched
+            removed_yes, removed_no = oracle.answer_counts(removed)
+            node = (candidates & ~removed, yes - removed_yes, no - removed_no)
+            self.nodes[key] = node
+        return node
+
+
+@lru_cache(maxsize=None)
+def load_oracle(path: str) -> AnswerOracle:
+    """Load an oracle once per process, however many games use it."""
+    return AnswerOracle.load(path)
+
+
+async def label_matrix(
+    model: ModelWrapper,
+    topics: list[str],
+    questions: list[str],
+    batch_size: int = 32,
+    max_concurrency: int = 8,
+) -> AnswerOracle:
+    """Ask the model every topic × question pair and collect the answers.
+
+    Pairs are sent in batches of `batch_size` through `generate_batch`, with up to
+    `max_concurrency` batches in flight. A batch that still fails after its
+    retries leaves its pairs unknown rather than aborting the whole job.
+    """
+    answers = np.zeros((len(topics), len(questions)), dtype=bool)
+    known = np.zeros_like(answers)
+    n_cells = len(topics) * len(questions)
+
+    async def label_batch(start: int):
+        end = min(start + batch_size, n_cells)
+        cells = [divmod(cell, len(questions)) for cell in range(start, end)]
+        prompts = [
+            [
+                {"role": "system", "content": LABEL_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": LABEL_TEMPLATE.format(
+                        topic=topics[i], question=questions[j]
+                    ),
+                },
+            ]
+            for i, j in cells
+        ]
+        try:
+            responses = await model.generate_batch(prompts)
+        except APIError as e:
+            print(f"Labelling pairs {start} to {end - 1} failed: {e}")
+            responses = [None] * len(cells)
+        return cells, responses
+
+    scheduler = GameScheduler(max_concurrency)
+    async for cells, responses in scheduler.run(
+        range(0, n_cells, batch_size), label_batch
+    ):
+        for (i, j), response in zip(cells, responses):
+            answer = utils.check_valid_response(response) if response else ""
+            if answer:
+                answers[i, j] = answer == "yes"
+                known[i, j] = True
+
+    return AnswerOracle(topics, questions, answers, known)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Label a topic × question matrix for the host's answer oracle."
+    )
+    parser.add_argument(
+        "--topics", type=str, required=True, help="File with one topic per line."
+    )
+    parser.add_argument(
+        "--questions",
+        type=str,
+        required=True,
+        help="File with one yes/no question per line.",
+    )
+    parser.add_argument(
+        "--out", type=str, required=True, help="Output .npz file for the oracle."
+    )
+    parser.add_argument(
+        "--model", type=str, default="gpt-4o-mini", help="Model used for labelling."
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="openai",
+        choices=["openai", "vllm"],
+        help="The model backend to send requests to.",
+    )
+    parser.add_argument(
+        "--server-url",
+        type=str,
+        default=None,
+        help="Chat completions endpoint of the vllm backend.",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=32, help="Pairs labelled per request."
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of labelling requests in flight.",
+    )
+    return parser.parse_args()
+
+
+def read_lines(path: str) -> list[str]:
+    lines = Path(path).read_text().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+async def build_oracle(args):
+    config = ModelConfig(
+        name=args.model,
+        temperature=0.0,
+        backend=args.backend,
+        server_url=args.server_url,
+    )
+    async with ModelRegistry(config) as models:
+        oracle = await label_matrix(
+            models.get(),
+            read_lines(args.topics),
+            read_lines(args.questions),
+            batch_size=args.batch_size,
+            max_concurrency=args.max_concurrency,
+        )
+    oracle.save(args.out)
+    print(f"Labelled {oracle.known.sum()} of {oracle.known.size} pairs into {args.out}")
+
+
+def main():
+    """Bulk-label a topic × question matrix into an oracle file."""
+    asyncio.run(build_oracle(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Bucket refilled continuously at `rate_per_minute`, holding at most that much."""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken, capped to what the bucket can hold."""
+        deficit = min(amount, self.capacity) - self.level
+        return max(0.0, deficit / self.rate)
+
+
+class RateLimiter:
+    """Run-wide limit on requests and tokens per minute, shared by every game.
+
+    Each model call `acquire`s one request and its estimated prompt tokens before
+    it is sent, waiting in FIFO order until both buckets allow it; the tokens the
+    response actually used are settled afterwards with `consume`, which may drive
+    the token bucket negative so that later calls wait. When the API throttles
+    anyway, `pause` holds back every call until its Retry-After has passed, so one
+    429 does not turn into a burst of them.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.requests = None
+        self.tokens = None
+        if requests_per_minute:
+            self.requests = TokenBucket(requests_per_minute)
+        if tokens_per_minute:
+            self.tokens = TokenBucket(tokens_per_minute)
+        self.resume_at = 0.0
+        self.lock = asyncio.Lock()
+        self.waits = 0
+        self.wait_time = 0.0
+        self.pauses = 0
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until a request using about `tokens` tokens may be sent."""
+        async with self.lock:
+            start = time.monotonic()
+            waited = False
+            while True:
+                now = time.monotonic()
+                wait = self.resume_at - now
+                if self.requests is not None:
+                    self.requests.refill(now)
+                    wait = max(wait, self.requests.wait_time(1))
+                if self.tokens is not None:
+                    self.tokens.refill(now)
+                    wait = max(wait, self.tokens.wait_time(tokens))
+                if wait <= 0:
+                    break
+                waited = True
+                await asyncio.sleep(wait)
+
+            if self.requests is not None:
+                self.requests.level -= 1
+            if self.tokens is not None:
+                self.tokens.level -= tokens
+            if waited:
+                self.waits += 1
+                self.wait_time += now - start
+
+    def consume(self, tokens: int):
+        """Settle tokens used beyond (or, if negative, below) the acquired estimate."""
+        if self.tokens is not None:
+            self.tokens.refill(time.monotonic())
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level - tokens)
+
+    def pause(self, seconds: float):
+        """Hold back every call for `seconds`, e.g. after a 429 with Retry-After."""
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+        self.pauses += 1
+
+    def stats(self) -> dict:
+        return {
+            "rate_limit_waits": self.waits,
+            "rate_limit_wait_seconds": self.wait_time,
+            "rate_limit_pauses": self.pauses,
+        }
+
+
+def backoff_delay(
+    attempt: int,
+    base: float,
+    max_delay: float,
+    retry_after: Optional[float] = None,
+) -> float:
+    """Exponential backoff with full jitter, never shorter than `retry_after`."""
+    delay = random.uniform(0, min(max_delay, base * 2**attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given in seconds or as a date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
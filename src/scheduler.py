@@ -0,0 +1,54 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class GameScheduler:
+    """Run games with a bounded number in flight, yielding results as they finish."""
+
+    def __init__(self, max_concurrency: int = 16):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.max_concurrency = max_concurrency
+        self.stopped = False
+
+    def stop(self):
+        """Stop scheduling new games; games already in flight are drained."""
+        self.stopped = True
+
+    async def run(
+        self,
+        game_ids: Iterable[int],
+        play: Callable[[int], Awaitable[T]],
+    ) -> AsyncIterator[T]:
+        """Play every game id, yielding each result as soon as its game completes.
+
+        At most `max_concurrency` games are in flight at once, so memory stays flat
+        regardless of how many games are scheduled. If the consumer stops iterating
+        or the surrounding task is cancelled, in-flight games are cancelled and awaited.
+        """
+        game_ids = iter(game_ids)
+        pending = set()
+
+        try:
+            while True:
+                while not self.stopped and len(pending) < self.max_concurrency:
+                    game_id = next(game_ids, None)
+                    if game_id is None:
+                        break
+                    pending.add(asyncio.create_task(play(game_id)))
+
+                if not pending:
+                    return
+
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
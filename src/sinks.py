@@ -0,0 +1,292 @@
+from abc import ABC, abstractmethod
+import json
+import os
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Iterator, Optional
+
+
+class ResultSink(ABC):
+    """Destination for per-game result records."""
+
+    PREFIX = "results"
+
+    @abstractmethod
+    def write(self, record: dict):
+        """Store one game record."""
+        pass
+
+    def flush(self):
+        """Push buffered records to storage."""
+        pass
+
+    def close(self):
+        """Flush and release the sink."""
+        self.flush()
+
+    @classmethod
+    def read(cls, log_dir: Path) -> Iterator[dict]:
+        """Yield every record written to `log_dir` by sinks of this type."""
+        raise NotImplementedError
+
+
+class FileSink(ResultSink):
+    """Legacy layout: one small JSON file per game."""
+
+    PREFIX = "game"
+
+    def __init__(self, log_dir: Path, prefix: Optional[str] = None):
+        self.log_dir = Path(log_dir)
+        self.prefix = prefix or self.PREFIX
+        self.count = 0
+
+    def write(self, record: dict):
+        # The counter keeps games finishing in the same instant from colliding
+        name = f"{self.prefix}_{record['timestamp']}_{self.count:06d}.json"
+        log_file = self.log_dir / name
+        self.count += 1
+        with open(log_file, "w") as f:
+            json.dump(record, f)
+
+    @classmethod
+    def read(cls, log_dir: Path) -> Iterator[dict]:
+        for path in sorted(Path(log_dir).glob(f"{cls.PREFIX}*.json")):
+            try:
+                with open(path) as f:
+                    yield json.load(f)
+            except json.JSONDecodeError:
+                continue  # Interrupted while writing
+
+
+class JSONLSink(ResultSink):
+    """Append-only JSONL segments, buffered and periodically fsynced.
+
+    Records are buffered in memory and appended to `{prefix}-{n:05d}.jsonl` every
+    `buffer_size` records. The file is fsynced at most every `fsync_interval`
+    seconds, and a new segment is started once the current one reaches
+    `max_segment_bytes`.
+    """
+
+    def __init__(
+        self,
+        log_dir: Path,
+        prefix: Optional[str] = None,
+        buffer_size: int = 64,
+        fsync_interval: float = 5.0,
+        max_segment_bytes: Optional[int] = None,
+    ):
+        self.log_dir = Path(log_dir)
+        self.prefix = prefix or self.PREFIX
+        self.buffer_size = buffer_size
+        self.fsync_interval = fsync_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.buffer = []
+        self.segment = len(list(self.log_dir.glob(f"{self.prefix}-?????.jsonl")))
+        self.file = None
+        self.last_fsync = time.monotonic()
+
+    def _open_segment(self):
+        path = self.log_dir / f"{self.prefix}-{self.segment:05d}.jsonl"
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict):
+        self.buffer.append(json.dumps(record) + "\n")
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            if self.file is None:
+                self._open_segment()
+            self.file.write("".join(self.buffer))
+            self.file.flush()
+            self.buffer = []
+
+        if self.file is None:
+            return
+
+        if time.monotonic() - self.last_fsync >= self.fsync_interval:
+            self._fsync()
+
+        if self.max_segment_bytes and self.file.tell() >= self.max_segment_bytes:
+            self._fsync()
+            self.file.close()
+            self.file = None
+            self.segment += 1
+
+    def _fsync(self):
+        os.fsync(self.file.fileno())
+        self.last_fsync = time.monotonic()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self._fsync()
+            self.file.close()
+            self.file = None
+
+    @classmethod
+    def read(cls, log_dir: Path) -> Iterator[dict]:
+        for path in sorted(Path(log_dir).glob(f"{cls.PREFIX}*.jsonl")):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Partial last line of an interrupted run
+
+
+class ParquetSink(ResultSink):
+    """Columnar output for large runs: one Parquet part file per `row_group_size` rows.
+
+    Parts are only written once full, so periodic flushes do not produce many tiny
+    files; the remainder is written on `close`. Nested fields such as the game
+    history are stored as JSON strings, and the names of those columns are kept in
+    the part's schema metadata so `read` can decode them.
+    """
+
+    # Columns stored as JSON by parts written before they were listed in the metadata
+    LEGACY_JSON_COLUMNS = ("history", "timings")
+
+    def __init__(
+        self,
+        log_dir: Path,
+        prefix: Optional[str] = None,
+        row_group_size: int = 10_000,
+    ):
+        import pyarrow  # noqa: F401  Fail early if the optional dependency is missing
+
+        self.log_dir = Path(log_dir)
+        self.prefix = prefix or self.PREFIX
+        self.row_group_size = row_group_size
+        self.rows = []
+        self.json_columns = set()
+        self.part = len(list(self.log_dir.glob(f"{self.prefix}-?????.parquet")))
+
+    def write(self, record: dict):
+        row = {}
+        for key, value in record.items():
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+                self.json_columns.add(key)
+            row[key] = value
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self._write_part()
+
+    def _write_part(self):
+        if not self.rows:
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self.log_dir / f"{self.prefix}-{self.part:05d}.parquet"
+        metadata = {"json_columns": json.dumps(sorted(self.json_columns))}
+        pq.write_table(pa.Table.from_pylist(self.rows, metadata=metadata), path)
+        self.part += 1
+        self.rows = []
+        self.json_columns = set()
+
+    def close(self):
+        self._write_part()
+
+    @classmethod
+    def read(cls, log_dir: Path) -> Iterator[dict]:
+        import pyarrow.parquet as pq
+
+        for path in sorted(Path(log_dir).glob(f"{cls.PREFIX}*.parquet")):
+            table = pq.read_table(path)
+            metadata = table.schema.metadata or {}
+            if b"json_columns" in metadata:
+                json_columns = json.loads(metadata[b"json_columns"])
+            else:
+                json_columns = cls.LEGACY_JSON_COLUMNS
+            for row in table.to_pylist():
+                for key in json_columns:
+                    if isinstance(row.get(key), str):
+                        row[key] = json.loads(row[key])
+                yield row
+
+
+class ThreadedSink(ResultSink):
+    """Run another sink on a background thread so writes never block the event loop."""
+
+    FLUSH = object()
+    CLOSE = object()
+
+    def __init__(self, sink: ResultSink, flush_interval: float = 1.0):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            try:
+                if item is None or item is self.FLUSH:
+                    self.sink.flush()
+                elif item is self.CLOSE:
+                    self.sink.close()
+                    return
+                else:
+                    self.sink.write(item)
+            except Exception as e:
+                self.error = e
+            finally:
+                if item is not None:
+                    self.queue.task_done()
+
+    def write(self, record: dict):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(record)
+
+    def flush(self):
+        """Block until every queued record has been written and flushed."""
+        self.queue.put(self.FLUSH)
+        self.queue.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(self.CLOSE)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+SINKS = {
+    "jsonl": JSONLSink,
+    "parquet": ParquetSink,
+    "files": FileSink,
+}
+
+
+def read_records(name: str, log_dir: Path) -> Iterator[dict]:
+    """Yield the records the named sink wrote to `log_dir`, from every shard."""
+    if name not in SINKS:
+        raise ValueError(f"Unknown result sink: {name}")
+    return SINKS[name].read(log_dir)
+
+
+def make_sink(name: str, log_dir: Path, shard: Optional[int] = None) -> ResultSink:
+    """Create the named sink, writing from a background thread.
+
+    Sinks of different shards (worker processes) of one run write to separate files
+    in the same directory.
+    """
+    if name not in SINKS:
+        raise ValueError(f"Unknown result sink: {name}")
+
+    sink_cls = SINKS[name]
+    prefix = None if shard is None else f"{sink_cls.PREFIX}-w{shard:03d}"
+    return ThreadedSink(sink_cls(log_dir, prefix=prefix))
@@ -0,0 +1,94 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import time
+from typing import Optional
+
+from src.metrics import QuantileSketch
+
+
+_current_tracer: ContextVar[Optional["Tracer"]] = ContextVar(
+    "current_tracer", default=None
+)
+
+_NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """Per-game timing histograms, counters and token usage.
+
+    A tracer is activated for the task playing one game; code anywhere below it
+    records into it through the module-level `span`, `record`, `count` and
+    `add_tokens` helpers, which do nothing when no tracer is active.
+    """
+
+    def __init__(self):
+        self.spans: dict[str, QuantileSketch] = defaultdict(QuantileSketch)
+        self.counters = Counter()
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name].add(time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.spans[name].add(seconds)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def merge(self, other: "Tracer"):
+        for name, sketch in other.spans.items():
+            self.spans[name].merge(sketch)
+        self.counters.update(other.counters)
+
+    def summary(self) -> dict:
+        return {
+            "spans": {name: sketch.summary() for name, sketch in self.spans.items()},
+            "counters": dict(self.counters),
+        }
+
+
+def activate(tracer: Optional[Tracer]):
+    """Make `tracer` current for this task; returns a token for `deactivate`."""
+    return _current_tracer.set(tracer)
+
+
+def deactivate(token):
+    _current_tracer.reset(token)
+
+
+def current() -> Optional[Tracer]:
+    return _current_tracer.get()
+
+
+def span(name: str):
+    """Context manager timing a block into the current tracer, if any."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name)
+
+
+def record(name: str, seconds: float):
+    tracer = _current_tracer.get()
+    if tracer is not None:
+        tracer.record(name, seconds)
+
+
+def count(name: str, value: int = 1):
+    tracer = _current_tracer.get()
+    if tracer is not None:
+        tracer.count(name, value)
+
+
+def add_tokens(usage: Optional[dict]):
+    """Count the token usage reported by an API response."""
+    tracer = _current_tracer.get()
+    if tracer is None or not usage:
+        return
+    tracer.count("tokens.prompt", usage.get("prompt_tokens") or 0)
+    tracer.count("tokens.completion", usage.get("completion_tokens") or 0)
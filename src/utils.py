@@ -1,20 +1,99 @@
+from functools import lru_cache
 import re
-from typing import Optional
+from string import Formatter
+from typing import Optional, Union
 
-from src.env import Observation
+from src import tracing
+from src.env import Observation, TURN_TYPE
+
+
+@lru_cache(maxsize=None)
+def compile_template(template: Union[str, tuple]) -> tuple[str, tuple[str, ...]]:
+    """Join a (possibly tuple) template once and list the fields it uses."""
+    if isinstance(template, tuple):
+        template = "".join(template)
+    fields = []
+    for _, name, _, _ in Formatter().parse(template):
+        if name:
+            name = re.split(r"[.\[]", name, maxsplit=1)[0]
+            if name not in fields:
+                fields.append(name)
+    return template, tuple(fields)
+
+
+_joined_knowledge_base = (None, "")
+
+
+def join_knowledge_base(knowledge_base: list[str]) -> str:
+    """Comma-separated knowledge base, joined once per run rather than per prompt.
+
+    Games of a run share the same knowledge base list, which is not modified
+    while they are played.
+    """
+    global _joined_knowledge_base
+    cached, joined = _joined_knowledge_base
+    if cached is not knowledge_base:
+        joined = ", ".join(knowledge_base)
+        _joined_knowledge_base = (knowledge_base, joined)
+    return joined
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token."""
+    return max(1, len(text) // 4)
+
+
+DIGEST_HEADER = "Game so far:\n"
+
+
+def history_digest(history: list[dict]) -> list[str]:
+    """One compact line per completed turn of the game."""
+    return [
+        f"Turn {turn['turn']}: Q: {turn['question']} -> A: {turn['answer']} -> Guess: {turn['guess']}"
+        for turn in history
+    ]
 
 
 class PromptManager:
+    """Conversation of one agent, rendered into the messages sent to the model.
+
+    By default every message is kept and resent on each call, so prompt tokens
+    grow quadratically with the number of turns. With `history_window`, only
+    the system prompt and the last `history_window` messages are kept.
+    `max_prompt_tokens` drops the oldest messages until the estimated prompt size
+    fits the budget. Once messages have been dropped either way, the turns played
+    so far are summarized from `Observation.history` in a digest message, which
+    only loses its oldest lines if the latest message alone still does not fit.
+    """
+
     def __init__(
-        self, prompt_templates: dict[str], system_prompt: Optional[str] = None
+        self,
+        prompt_templates: dict[str],
+        system_prompt: Optional[str] = None,
+        history_window: Optional[int] = None,
+        max_prompt_tokens: Optional[int] = None,
     ):
         self.messages = []
         self.prompt_templates = prompt_templates
+        self.history_window = history_window
+        self.max_prompt_tokens = max_prompt_tokens
+        self.num_system = 0
+        self.digest = []
+        # Messages dropped by the history window
+        self.dropped = 0
         if system_prompt:
             self.add_system_message(system_prompt)
 
     def add_message(self, role: str, content: str):
         self.messages.append({"role": role, "content": content})
+        if role == "system":
+            self.num_system += 1
+        elif self.history_window is not None:
+            first = self.num_system
+            last = len(self.messages) - self.history_window
+            if last > first:
+                del self.messages[first:last]
+                self.dropped += last - first
 
     def add_system_message(self, message: str):
         self.add_message("system", message)
@@ -27,39 +106,95 @@ class PromptManager:
 
     def format_observation(self, obs: Observation) -> str:
         """Format the observation into a prompt."""
-        prompt_template = self.prompt_templates[obs.turn_type]
-        if isinstance(prompt_template, tuple):
-            prompt_template = "".join(prompt_template)
-
-        template_vars = obs._asdict()
-        if obs.knowledge_base is not None:
-            template_vars.update(
-                {
-                    "knowledge_base": ", ".join(obs.knowledge_base),
-                }
-            )
-
-        formatted_content = prompt_template.format(
-            **{k: v for k, v in template_vars.items() if f"{{{k}}}" in prompt_template}
-        )
+        prompt_template, fields = compile_template(self.prompt_templates[obs.turn_type])
 
-        return formatted_content
+        template_vars = {}
+        for name in fields:
+            if name == "knowledge_base" and obs.knowledge_base is not None:
+                template_vars[name] = join_knowledge_base(obs.knowledge_base)
+            else:
+                template_vars[name] = getattr(obs, name)
+
+        return prompt_template.format(**template_vars)
 
     def build_agent_prompt(self, obs: Observation) -> list[dict[str, str]]:
         """Build the prompt for the agent based on the observation."""
-        context = self.format_observation(obs)
+        with tracing.span("prompt.build"):
+            context = self.format_observation(obs)
 
-        # Add context as user message
-        self.add_user_message(context)
+            # Add context as user message
+            self.add_user_message(context)
+            if self.history_window is not None or self.max_prompt_tokens is not None:
+                self.digest = history_digest(obs.history)
 
-        return self.get_messages()
+            return self.get_messages()
 
     def get_messages(self) -> list[dict[str, str]]:
-        return self.messages
+        if not self.digest and self.max_prompt_tokens is None:
+            return self.messages
+
+        num_system = self.num_system
+        system, recent = self.messages[:num_system], self.messages[num_system:]
+        digest = self.digest if self.dropped else []
+        if self.max_prompt_tokens is not None:
+            digest, recent = self._fit_budget(system, recent)
+
+        if not digest:
+            return system + recent
+        summary = {"role": "user", "content": DIGEST_HEADER + "\n".join(digest)}
+        return system + [summary] + recent
+
+    def _fit_budget(
+        self, system: list[dict], recent: list[dict]
+    ) -> tuple[list[str], list[dict]]:
+        """Drop the oldest messages, then the oldest digest lines, over budget.
+
+        The digest replaces the messages that were dropped, so it is only sent
+        once some were. The system prompt and the latest message are always kept.
+        """
+        budget = self.max_prompt_tokens - sum(
+            estimate_tokens(m["content"]) for m in system
+        )
+        sizes = [estimate_tokens(m["content"]) for m in recent]
+        lines = [estimate_tokens(line) for line in self.digest]
+        total = sum(sizes)
+        digest_size = estimate_tokens(DIGEST_HEADER) + sum(lines)
+
+        start = 0
+        while total + (digest_size if start or self.dropped else 0) > budget:
+            if start >= len(recent) - 1:
+                break
+            total -= sizes[start]
+            start += 1
+        if not (start or self.dropped):
+            return [], recent
+
+        total += digest_size
+        first = 0
+        while total > budget and first < len(lines):
+            total -= lines[first]
+            first += 1
+        return self.digest[first:], recent[start:]
+
+    def fork(self) -> "PromptManager":
+        """Independent copy of this conversation, e.g. for a speculative branch."""
+        forked = PromptManager(
+            self.prompt_templates,
+            history_window=self.history_window,
+            max_prompt_tokens=self.max_prompt_tokens,
+        )
+        forked.messages = list(self.messages)
+        forked.num_system = self.num_system
+        forked.digest = list(self.digest)
+        forked.dropped = self.dropped
+        return forked
 
     def clear(self):
         """Clear conversation history."""
         self.messages = []
+        self.num_system = 0
+        self.digest = []
+        self.dropped = 0
 
 
 def parse_check_valid_topic(response: str, knowledge_base: list) -> str:
@@ -109,3 +244,56 @@ def parse_check_guess(response: str) -> str:
         raise ValueError("Guesser must make a valid guess.")
 
     return response.replace("*", "").replace('"', "").split("\n")[0]
+
+
+def parse_guess_and_question(response: str) -> tuple[str, Optional[str]]:
+    """Split a combined response into the guess and the next question."""
+    if not response:
+        raise ValueError("Guesser must make a valid guess.")
+
+    guess = question = None
+    for line in response.replace("*", "").split("\n"):
+        label, _, value = line.partition(":")
+        label = label.strip().lower()
+        if label == "guess" and guess is None:
+            guess = value.strip().replace('"', "")
+        elif label == "question" and question is None and value.strip():
+            question = parse_check_question(value.strip())
+
+    # Without labels, take the first line as the guess and look for a question after it
+    if guess is None:
+        guess = parse_check_guess(response)
+    if question is None:
+        _, _, rest = response.partition("\n")
+        question = parse_check_question(rest) if rest.strip() else None
+
+    return guess, question
+
+
+def has_answer(text: str) -> bool:
+    """Whether a partial host response already contains a whole "yes" or "no"."""
+    return re.search(r"\b(yes|no)\b\W", text.lower()) is not None
+
+
+def has_question(text: str) -> bool:
+    """Whether a partial response already contains the question to parse."""
+    return "?" in text
+
+
+def has_guess(text: str) -> bool:
+    """Whether the first line of a partial response, the guess, is complete."""
+    return "\n" in text
+
+
+def has_guess_and_question(text: str) -> bool:
+    """Whether a partial combined response has the guess line and a question after it."""
+    return "?" in text.partition("\n")[2]
+
+
+# When a streamed response of each turn type has all its parser reads
+STOP_CONDITIONS = {
+    TURN_TYPE.ANSWER_QUESTION: has_answer,
+    TURN_TYPE.ASK_QUESTION: has_question,
+    TURN_TYPE.MAKE_GUESS: has_guess,
+    TURN_TYPE.GUESS_AND_ASK: has_guess_and_question,
+}
@@ -1,9 +1,10 @@
 import pytest
 from unittest.mock import AsyncMock, Mock
 from src.env import Observation, TURN_TYPE, AGENT_ROLE
-from src.agent import HostAgent, GuesserAgent
+from src.agent import HostAgent, GuesserAgent, InfoGainGuesserAgent
 from src.utils import PromptManager
 from src.model import ModelWrapper
+import src.utils as utils
 
 
 @pytest.fixture
@@ -68,6 +69,33 @@ class TestHostAgent:
         mock_model.generate.assert_awaited_once()
 
 
+@pytest.mark.asyncio
+class TestGeneration:
+    async def test_max_tokens_by_turn_type(
+        self, mock_model, mock_prompt_manager, base_observation
+    ):
+        agent = GuesserAgent(
+            mock_model, mock_prompt_manager, max_tokens={"ask_question": 16}
+        )
+        await agent.act(base_observation)
+        assert mock_model.generate.await_args.kwargs == {"max_tokens": 16}
+
+        await agent.act(base_observation._replace(turn_type=TURN_TYPE.MAKE_GUESS))
+        assert mock_model.generate.await_args.kwargs == {}
+
+    async def test_stream_uses_turn_stop_condition(
+        self, mock_model, mock_prompt_manager, base_observation
+    ):
+        mock_model.generate_stream = AsyncMock(return_value="no.")
+        agent = HostAgent(mock_model, mock_prompt_manager, stream=True)
+        obs = base_observation._replace(turn_type=TURN_TYPE.ANSWER_QUESTION)
+
+        assert await agent.respond(obs) == "no"
+        _, stop_when = mock_model.generate_stream.await_args.args
+        assert stop_when is utils.STOP_CONDITIONS[TURN_TYPE.ANSWER_QUESTION]
+        mock_model.generate.assert_not_awaited()
+
+
 @pytest.mark.asyncio
 class TestGuesserAgent:
     async def test_init(self, mock_model, mock_prompt_manager):
@@ -110,3 +138,112 @@ class TestGuesserAgent:
         guess = await agent.make_guess(obs)
         assert guess == "cat"
         mock_model.generate.assert_awaited_once()
+
+
+@pytest.fixture
+def oracle():
+    np = pytest.importorskip("numpy")
+    from src.oracle import AnswerOracle
+
+    return AnswerOracle(
+        topics=["dog", "cat", "car", "plane"],
+        questions=["Is it a dog?", "Is it alive?", "Can it fly?"],
+        answers=np.array(
+            [
+                [True, True, False],
+                [False, True, False],
+                [False, False, False],
+                [False, False, True],
+            ]
+        ),
+    )
+
+
+@pytest.mark.asyncio
+class TestInfoGainGuesserAgent:
+    async def test_picks_balanced_question(self, mock_model, oracle):
+        agent = InfoGainGuesserAgent(mock_model, PromptManager({}), oracle)
+        agent._init_candidates(["dog", "cat", "car", "plane"])
+        # "Is it alive?" splits the four topics in half
+        assert agent.best_question() == 1
+
+    async def test_questions_without_llm(self, mock_model, oracle):
+        from src.env import Game20QEnv
+
+        templates = {turn_type: "{turn}" for turn_type in TURN_TYPE}
+        host = HostAgent(mock_model, PromptManager(templates), oracle=oracle)
+        guesser = InfoGainGuesserAgent(mock_model, PromptManager(templates), oracle)
+        env = Game20QEnv(host, guesser, ["dog", "cat", "car", "plane"], max_turns=5)
+
+        for topic in ["dog", "cat", "car", "plane"]:
+            env.host = host
+            env.guesser = InfoGainGuesserAgent(
+                mock_model, PromptManager(templates), oracle
+            )
+            env.reset()
+            env.topic = topic
+            done = False
+            while not done:
+                _, _, dones, info = await env.step()
+                done = all(dones)
+            assert info["reason"] == "correct_guess"
+            assert env.turn == 2
+            assert all(turn["question"] in oracle.questions for turn in env.history)
+
+        # Only the first guess of each game, with two candidates left, used the LLM
+        assert mock_model.generate.await_count == 4
+
+    async def test_falls_back_to_llm_guess(self, mock_model, oracle, base_observation):
+        agent = InfoGainGuesserAgent(mock_model, PromptManager({}), oracle)
+        agent.prompt_manager = Mock(spec=PromptManager)
+        agent._init_candidates(["dog", "cat", "car", "plane"])
+        mock_model.generate.return_value = "car"
+
+        obs = base_observation._replace(
+            turn_type=TURN_TYPE.MAKE_GUESS, current_answer="no"
+        )
+        agent.pending_question = 1
+        assert await agent.make_guess(obs) == "car"
+        mock_model.generate.assert_awaited_once()
+        assert agent.candidates.tolist() == [False, False, True, True]
+
+    async def test_wrong_single_guess_removes_candidate(self, mock_model, oracle):
+        agent = InfoGainGuesserAgent(mock_model, PromptManager({}), oracle)
+        agent._init_candidates(["car", "plane"])
+        agent.pending_guess = 2
+
+        mock_model.generate.return_value = "Is it red?"
+        obs = Observation(
+            turn=2,
+            history=[],
+            turn_type=TURN_TYPE.ASK_QUESTION,
+            active=True,
+            role=AGENT_ROLE.GUESSER,
+            remaining_turns=3,
+            knowledge_base=["car", "plane"],
+        )
+        agent.prompt_manager = Mock(spec=PromptManager)
+        await agent.ask_question(obs)
+        assert agent.candidates.tolist() == [False, False, False, True]
+
+    async def test_games_share_candidate_counts(self, mock_model, oracle):
+        np = pytest.importorskip("numpy")
+        knowledge_base = ["dog", "cat", "car", "plane"]
+        first = InfoGainGuesserAgent(mock_model, PromptManager({}), oracle)
+        second = InfoGainGuesserAgent(mock_model, PromptManager({}), oracle)
+        first._init_candidates(knowledge_base)
+        second._init_candidates(knowledge_base)
+        assert first.tree is second.tree
+        first.tree.max_depth = 1
+
+        # The first answer comes from the shared tree, the second is applied locally
+        for agent in (first, second):
+            agent._apply_answer(1, True)
+            agent._apply_answer(0, False)
+        assert first.path is None
+        assert first.candidates.tolist() == [False, True, False, False]
+        assert second.candidates.tolist() == first.candidates.tolist()
+        cat = oracle.answers[1]
+        assert first.yes_counts.tolist() == cat.astype(int).tolist()
+        assert first.no_counts.tolist() == np.logical_not(cat).astype(int).tolist()
+        assert len(first.tree.nodes) == 2
@@ -0,0 +1,98 @@
+import pytest
+
+from src.batch_env import Game20QEnvBatch
+from src.env import TURN_TYPE
+from src.exceptions import APIError, InvalidQuestionError
+from src.main import (
+    GUESSER_SYSTEM_PROMPT,
+    HOST_SYSTEM_PROMPT,
+    KNOWLEDGE_BASE,
+    PROMPT_TEMPLATES,
+    guesser_system_prompt,
+)
+from src.mock_server import scripted_reply
+from src.model import ModelWrapper
+from src.utils import PromptManager
+
+GUESSER_SYSTEM = guesser_system_prompt(GUESSER_SYSTEM_PROMPT, KNOWLEDGE_BASE)
+
+
+class ScriptedModelWrapper(ModelWrapper):
+    def __init__(self, reply=scripted_reply):
+        self.reply = reply
+        self.batch_sizes = []
+
+    async def generate(self, prompts, **kwargs):
+        return self.reply(prompts)
+
+    async def generate_batch(self, prompts, **kwargs):
+        self.batch_sizes.append(len(prompts))
+        return [self.reply(messages) for messages in prompts]
+
+
+def make_env(model, n_games, max_turns=5):
+    return Game20QEnvBatch(
+        model,
+        [PromptManager(PROMPT_TEMPLATES, HOST_SYSTEM_PROMPT) for _ in range(n_games)],
+        [PromptManager(PROMPT_TEMPLATES, GUESSER_SYSTEM) for _ in range(n_games)],
+        knowledge_base=KNOWLEDGE_BASE,
+        max_turns=max_turns,
+    )
+
+
+@pytest.mark.asyncio
+async def test_games_finish_independently():
+    model = ScriptedModelWrapper()
+    env = make_env(model, len(KNOWLEDGE_BASE))
+    # The scripted guesser guesses topic i of the knowledge base on turn i + 1
+    env.reset(topics=KNOWLEDGE_BASE)
+
+    await env.run()
+
+    assert env.all_done
+    assert env.success.all()
+    assert env.turn.tolist() == [1, 2, 3, 4, 5]
+    assert [len(history) for history in env.histories] == [1, 2, 3, 4, 5]
+    assert env.histories[1][-1]["guess"] == "cat"
+    # One call per phase, with finished games masked out
+    assert model.batch_sizes == [5, 5, 5, 4, 4, 4, 3, 3, 3, 2, 2, 2, 1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_max_turns():
+    model = ScriptedModelWrapper()
+    env = make_env(model, 2, max_turns=2)
+    env.reset(topics=["plane", "plane"])
+
+    await env.run()
+
+    assert not env.success.any()
+    assert env.turn.tolist() == [3, 3]
+    assert all(error is None for error in env.errors)
+    assert len(model.batch_sizes) == 6
+
+
+@pytest.mark.asyncio
+async def test_invalid_question_ends_game():
+    model = ScriptedModelWrapper(reply=lambda messages: "Not a question")
+    env = make_env(model, 3)
+    env.reset()
+
+    await env.step()
+
+    assert env.all_done
+    assert all(isinstance(error, InvalidQuestionError) for error in env.errors)
+    assert env.current_type == TURN_TYPE.ANSWER_QUESTION
+
+
+@pytest.mark.asyncio
+async def test_model_error_ends_active_games():
+    def fail(messages):
+        raise APIError("down")
+
+    env = make_env(ScriptedModelWrapper(reply=fail), 2)
+    env.reset()
+    await env.step()
+
+    assert env.all_done
+    assert all(isinstance(error, APIError) for error in env.errors)
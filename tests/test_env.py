@@ -4,9 +4,14 @@ import asyncio
 from typing import Dict
 from unittest.mock import AsyncMock, Mock
 
+from src import tracing
+from src.agent import GuesserAgent
 from src.env import Game20QEnv, TURN_TYPE, AGENT_ROLE
 from src.exceptions import InvalidQuestionError, InvalidAnswerError, InvalidGuessError
-from src.main import KNOWLEDGE_BASE
+from src.main import KNOWLEDGE_BASE, TOPIC_ALIASES
+from src.matcher import GuessMatcher
+from src.model import ModelWrapper
+from src.utils import PromptManager
 
 
 class MockAgent:
@@ -16,6 +21,12 @@ class MockAgent:
         )
         self.respond = AsyncMock(return_value=responses.get("answer", "yes"))
         self.make_guess = AsyncMock(return_value=responses.get("guess", "chicken"))
+        self.guess_and_ask = AsyncMock(
+            return_value=(
+                responses.get("guess", "chicken"),
+                responses.get("question", "Is it alive?"),
+            )
+        )
 
 
 @pytest.fixture
@@ -116,6 +127,7 @@ async def test_wrong_guess(env, mock_host, mock_guesser):  # Use fixtures as par
     env = Game20QEnv(mock_host, mock_guesser, KNOWLEDGE_BASE)
 
     env.reset()
+    env.topic = "chicken"
     await env.step()  # Ask question
     await env.step()  # Answer question
     obs, rewards, dones, info = await env.step()  # Make wrong guess
@@ -126,6 +138,33 @@ async def test_wrong_guess(env, mock_host, mock_guesser):  # Use fixtures as par
     assert env.current_type == TURN_TYPE.ASK_QUESTION
 
 
+@pytest.mark.asyncio
+async def test_guess_must_name_the_topic():
+    guesser = MockAgent({"guess": "Some category of animal"})
+    env = Game20QEnv(MockAgent({}), guesser, KNOWLEDGE_BASE)
+    env.reset()
+    env.topic = "cat"
+    await env.step()
+    await env.step()
+    obs, rewards, dones, info = await env.step()
+
+    assert not any(dones)
+    assert info["turn_info"]["guess_topic"] is None
+
+    guesser.make_guess.return_value = "A dog"
+    await env.step()
+    await env.step()
+    obs, rewards, dones, info = await env.step()
+    assert info["turn_info"]["guess_topic"] == "dog"
+
+    guesser.make_guess.return_value = "A kitten!"
+    env.matcher = GuessMatcher(KNOWLEDGE_BASE, TOPIC_ALIASES)
+    await env.step()
+    await env.step()
+    obs, rewards, dones, info = await env.step()
+    assert info["reason"] == "correct_guess"
+
+
 @pytest.mark.asyncio
 async def test_invalid_responses(env):
     env.reset()
@@ -159,3 +198,119 @@ async def test_invalid_responses(env):
     env.guesser.make_guess.return_value.set_result(123)
     with pytest.raises(InvalidGuessError):
         await env.step()
+
+
+@pytest.mark.asyncio
+async def test_combined_turn_mode():
+    host = MockAgent({"answer": "no"})
+    guesser = MockAgent({"question": "Is it red?", "guess": "dog"})
+    env = Game20QEnv(host, guesser, KNOWLEDGE_BASE, max_turns=3, turn_mode="combined")
+    env.reset()
+    env.topic = "chicken"
+
+    await env.step()  # Ask question
+    await env.step()  # Answer question
+    assert env.current_type == TURN_TYPE.GUESS_AND_ASK
+
+    obs, rewards, dones, info = await env.step()  # Guess and ask the next question
+    assert info["turn_info"]["guess"] == "dog"
+    assert env.turn == 2
+    assert env.current_question == "Is it red?"
+    assert env.current_type == TURN_TYPE.ANSWER_QUESTION
+
+    await env.step()  # Answer question
+    await env.step()  # Guess and ask
+    await env.step()  # Answer question
+    # The last turn has no next question
+    assert env.current_type == TURN_TYPE.MAKE_GUESS
+    await env.step()
+    obs, rewards, dones, info = await env.step()
+
+    assert info["reason"] == "max_turns"
+    assert len(env.history) == 3
+    assert guesser.ask_question.await_count == 1
+    assert guesser.guess_and_ask.await_count == 2
+    assert guesser.make_guess.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_combined_turn_mode_correct_guess():
+    env = Game20QEnv(MockAgent({}), MockAgent({}), KNOWLEDGE_BASE, turn_mode="combined")
+    env.reset()
+    env.topic = "chicken"
+    await env.step()
+    await env.step()
+    obs, rewards, dones, info = await env.step()
+
+    assert info["reason"] == "correct_guess"
+    assert env.turn == 1
+
+
+def test_unknown_turn_mode():
+    with pytest.raises(ValueError):
+        Game20QEnv(MockAgent({}), MockAgent({}), KNOWLEDGE_BASE, turn_mode="fast")
+
+
+class EchoGuesserModel(ModelWrapper):
+    async def generate(self, prompts, **kwargs):
+        prompt = prompts[-1]["content"]
+        if prompt.startswith("ask"):
+            return "Is it alive?"
+        await asyncio.sleep(0)
+        return prompt.replace("answer", "guess")
+
+
+@pytest.mark.asyncio
+async def test_speculative_guess():
+    templates = {
+        TURN_TYPE.ASK_QUESTION: "ask {turn}",
+        TURN_TYPE.MAKE_GUESS: "answer {current_answer}",
+    }
+    guesser = GuesserAgent(EchoGuesserModel(), PromptManager(templates))
+    host = MockAgent({"answer": "no"})
+
+    async def slow_answer(observation):
+        await asyncio.sleep(0.01)
+        return "no"
+
+    host.respond = slow_answer
+    env = Game20QEnv(host, guesser, KNOWLEDGE_BASE, speculative=True)
+    env.reset()
+    env.topic = "chicken"
+
+    tracer = tracing.Tracer()
+    token = tracing.activate(tracer)
+    try:
+        await env.step()  # Ask question
+        await env.step()  # Answer question, guessing for both answers meanwhile
+        assert env.speculation[1].done()
+        obs, rewards, dones, info = await env.step()  # Make guess
+    finally:
+        tracing.deactivate(token)
+
+    assert info["turn_info"]["guess"] == "guess no"
+    # The guesser continues from the branch that was kept
+    assert [m["content"] for m in guesser.prompt_manager.messages] == [
+        "ask 1",
+        "Is it alive?",
+        "answer no",
+        "guess no",
+    ]
+    assert tracer.counters["speculative.branches"] == 2
+    assert tracer.counters["speculative.discarded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_speculative_invalid_answer_cancels_branches():
+    guesser = GuesserAgent(EchoGuesserModel(), PromptManager({}))
+    guesser.fork = Mock(side_effect=lambda: MockAgent({}))
+    env = Game20QEnv(
+        MockAgent({"answer": "maybe"}), guesser, KNOWLEDGE_BASE, speculative=True
+    )
+    env.reset()
+    env.current_type = TURN_TYPE.ANSWER_QUESTION
+
+    with pytest.raises(InvalidAnswerError):
+        await env.step()
+    assert env.speculation is None
+    assert guesser.fork.call_count == 2
@@ -42,7 +42,7 @@ class TestEvaluator:
         assert (temp_log_dir / sample_config.run_id / "config.json").exists()
 
     def test_log_game(self, sample_config, temp_log_dir, sample_history):
-        evaluator = Evaluator(sample_config, log_dir=str(temp_log_dir))
+        evaluator = Evaluator(sample_config, log_dir=str(temp_log_dir), sink="files")
         result = Result(
             topic="car",
             num_turns=2,
@@ -51,9 +51,11 @@ class TestEvaluator:
             timestamp=datetime.now().isoformat(),
         )
         evaluator.log_game(result)
+        evaluator.close()
 
-        # Check result was added to evaluator
-        assert len(evaluator.results) == 1
+        # Check result was counted by the evaluator
+        assert evaluator.stats.games == 1
+        assert evaluator.results == []
 
         # Check game log file exists
         game_logs = list(Path(evaluator.log_dir).glob("game_*.json"))
@@ -66,6 +68,27 @@ class TestEvaluator:
             assert log_data["num_turns"] == 2
             assert log_data["success"] is True
 
+    def test_log_game_jsonl(self, sample_config, temp_log_dir, sample_history):
+        evaluator = Evaluator(sample_config, log_dir=str(temp_log_dir))
+        for topic in ["car", "dog"]:
+            evaluator.log_game(
+                Result(
+                    topic=topic,
+                    num_turns=2,
+                    success=True,
+                    history=sample_history,
+                    timestamp=datetime.now().isoformat(),
+                )
+            )
+        evaluator.close()
+
+        segments = list(Path(evaluator.log_dir).glob("results-*.jsonl"))
+        assert len(segments) == 1
+        with open(segments[0]) as f:
+            records = [json.loads(line) for line in f]
+        assert [r["topic"] for r in records] == ["car", "dog"]
+        assert records[0]["history"] == sample_history
+
     def test_calculate_metrics(self, sample_config, temp_log_dir, sample_history):
         evaluator = Evaluator(sample_config, log_dir=str(temp_log_dir))
 
@@ -95,3 +118,94 @@ class TestEvaluator:
         assert metrics["guess_success_rate"] == 0.5
         assert metrics["average_turns"] == 3.5
         assert len(metrics["failure_counts"]) == 1
+
+    def test_keep_results(self, sample_config, temp_log_dir, sample_history):
+        evaluator = Evaluator(
+            sample_config, log_dir=str(temp_log_dir), keep_results=True
+        )
+        result = Result(
+            topic="car",
+            num_turns=2,
+            success=True,
+            history=sample_history,
+            timestamp=datetime.now().isoformat(),
+        )
+        evaluator.log_game(result)
+        assert evaluator.results == [result]
+
+    def test_no_games(self, sample_config, temp_log_dir):
+        evaluator = Evaluator(sample_config, log_dir=str(temp_log_dir))
+        assert evaluator.calculate_metrics() == {}
+
+    def test_model_stats_in_metrics(self, sample_config, temp_log_dir, sample_history):
+        evaluator = Evaluator(sample_config, log_dir=str(temp_log_dir))
+        evaluator.log_game(
+            Result(
+                topic="car",
+                num_turns=2,
+                success=True,
+                history=sample_history,
+                timestamp=datetime.now().isoformat(),
+            )
+        )
+        evaluator.log_model_stats({"gpt": {"cache_hits": 3, "cache_misses": 1}})
+
+        metrics = evaluator.calculate_metrics()
+        assert metrics["model_stats"]["gpt"]["cache_hits"] == 3
+
+    def test_resume_loads_completed_games(
+        self, sample_config, temp_log_dir, sample_history
+    ):
+        evaluator = Evaluator(sample_config, log_dir=str(temp_log_dir))
+        for game_id in (0, 2):
+            evaluator.log_game(
+                Result(
+                    topic="car",
+                    num_turns=2,
+                    success=game_id == 0,
+                    history=sample_history,
+                    timestamp=datetime.now().isoformat(),
+                    game_id=game_id,
+                )
+            )
+        evaluator.close()
+
+        resumed = Evaluator(sample_config, log_dir=str(temp_log_dir), resume=True)
+        assert resumed.completed == {0, 2}
+        assert resumed.calculate_metrics() == evaluator.calculate_metrics()
+
+    def test_resume_parquet_speculative_tokens(
+        self, sample_config, temp_log_dir, sample_history
+    ):
+        pytest.importorskip("pyarrow")
+        sample_config.sink = "parquet"
+        sample_config.env.speculative = True
+        evaluator = Evaluator(sample_config, log_dir=str(temp_log_dir), sink="parquet")
+        for game_id, tokens in enumerate([None, {"prompt": 10, "completion": 2}]):
+            evaluator.log_game(
+                Result(
+                    topic="car",
+                    num_turns=2,
+                    success=True,
+                    history=sample_history,
+                    timestamp=datetime.now().isoformat(),
+                    game_id=game_id,
+                    speculative_tokens=tokens,
+                )
+            )
+        evaluator.close()
+
+        resumed = Evaluator(
+            sample_config, log_dir=str(temp_log_dir), sink="parquet", resume=True
+        )
+        metrics = resumed.calculate_metrics()
+        assert metrics["speculative_tokens"] == {"prompt": 10, "completion": 2}
+        assert metrics == evaluator.calculate_metrics()
+
+
+def test_config_round_trip(sample_config, tmp_path):
+    sample_config.n_games = 7
+    sample_config.prompts.history_window = 4
+    sample_config.save(tmp_path / "config.json")
+
+    assert Config.load(tmp_path / "config.json") == sample_config
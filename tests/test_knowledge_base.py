@@ -0,0 +1,132 @@
+import os
+import random
+
+import pytest
+
+from src.config import Config, EnvConfig, ModelConfig, PromptConfig
+from src.env import Game20QEnv
+from src.knowledge_base import KnowledgeBase, resolve_knowledge_base
+from src.main import (
+    GUESSER_SYSTEM_PROMPT,
+    HOST_SYSTEM_PROMPT,
+    MAX_LISTED_TOPICS,
+    PROMPT_TEMPLATES,
+    guesser_system_prompt,
+    run_play,
+)
+from src.mock_server import scripted_reply
+from src.model import ModelWrapper
+
+
+@pytest.fixture
+def topics_file(tmp_path):
+    path = tmp_path / "topics.txt"
+    path.write_bytes("dog\r\n  cat  \n\nchicken\ncrème brûlée\n".encode())
+    return path
+
+
+def test_reads_topics(topics_file):
+    kb = KnowledgeBase(topics_file)
+    assert len(kb) == 4
+    assert list(kb) == ["dog", "cat", "chicken", "crème brûlée"]
+    assert kb[-1] == "crème brûlée"
+    assert kb[1:3] == ["cat", "chicken"]
+    with pytest.raises(IndexError):
+        kb[4]
+    assert kb.sample(random.Random(0)) in kb
+    kb.close()
+
+
+def test_index_is_reused_until_file_changes(topics_file):
+    first = KnowledgeBase(topics_file)
+    built = os.stat(first.index_path).st_mtime_ns
+    assert KnowledgeBase(topics_file).content_hash == first.content_hash
+    assert os.stat(first.index_path).st_mtime_ns == built
+
+    topics_file.write_text("dog\ncat\n")
+    changed = KnowledgeBase(topics_file)
+    assert list(changed) == ["dog", "cat"]
+    assert changed.content_hash != first.content_hash
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+    assert len(KnowledgeBase(path)) == 0
+
+
+def test_env_samples_from_file(topics_file):
+    env = Game20QEnv(None, None, knowledge_base=KnowledgeBase(topics_file))
+    random.seed(0)
+    assert {env.reset() and env.topic for _ in range(50)} == {
+        "dog",
+        "cat",
+        "chicken",
+        "crème brûlée",
+    }
+
+
+def test_config_references_file_by_hash(topics_file, tmp_path):
+    kb_hash = KnowledgeBase(topics_file).content_hash
+    config = Config(
+        model=ModelConfig(backend="dummy"),
+        env=EnvConfig(
+            knowledge_base_path=str(topics_file), knowledge_base_hash=kb_hash
+        ),
+        prompts=PromptConfig(
+            host_system=HOST_SYSTEM_PROMPT,
+            guesser_system=GUESSER_SYSTEM_PROMPT,
+            templates=PROMPT_TEMPLATES,
+        ),
+        run_id="kb-run",
+    )
+    config.save(tmp_path / "config.json")
+    assert "knowledge_base" not in (tmp_path / "config.json").read_text().replace(
+        "knowledge_base_", ""
+    )
+
+    loaded = Config.load(tmp_path / "config.json")
+    assert list(resolve_knowledge_base(loaded.env)) == list(KnowledgeBase(topics_file))
+
+    loaded.env.knowledge_base_hash = "0" * 64
+    with pytest.raises(ValueError):
+        resolve_knowledge_base(loaded.env)
+
+
+@pytest.mark.asyncio
+async def test_guesser_is_told_the_file_topics(topics_file):
+    config = Config(
+        model=ModelConfig(backend="dummy"),
+        env=EnvConfig(knowledge_base_path=str(topics_file), max_turns=4),
+        prompts=PromptConfig(
+            host_system=HOST_SYSTEM_PROMPT,
+            guesser_system=GUESSER_SYSTEM_PROMPT,
+            templates=PROMPT_TEMPLATES,
+        ),
+        run_id="kb-play",
+    )
+    systems = set()
+
+    class ScriptedModel(ModelWrapper):
+        async def generate(self, prompts, **kwargs):
+            systems.add(prompts[0]["content"])
+            return scripted_reply(prompts)
+
+    class Registry:
+        def get(self, name=None):
+            return ScriptedModel()
+
+    random.seed(1)
+    result = await run_play(config, Registry())
+
+    # The scripted guesser guesses the listed topics in order
+    assert result.success
+    assert any("dog, cat, chicken, crème brûlée" in system for system in systems)
+
+
+def test_large_catalog_is_not_listed():
+    topics = [f"topic {i}" for i in range(MAX_LISTED_TOPICS + 1)]
+    prompt = guesser_system_prompt(GUESSER_SYSTEM_PROMPT, topics)
+    assert "topic 0" not in prompt
+    assert f"catalog of {len(topics)} topics" in prompt
+    assert "{topics}" not in prompt
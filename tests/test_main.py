@@ -0,0 +1,181 @@
+import asyncio
+
+import pytest
+
+from src.config import Config, EnvConfig, ModelConfig, PromptConfig
+from src.main import (
+    GUESSER_SYSTEM_PROMPT,
+    HOST_SYSTEM_PROMPT,
+    PROMPT_TEMPLATES,
+    run_eval,
+    run_play,
+)
+from src import sinks, tracing
+import src.main
+from src.mock_server import scripted_reply
+from src.model import ModelWrapper
+
+
+@pytest.fixture
+def dummy_config():
+    return Config(
+        model=ModelConfig(backend="dummy"),
+        env=EnvConfig(max_turns=3),
+        prompts=PromptConfig(
+            host_system=HOST_SYSTEM_PROMPT,
+            guesser_system=GUESSER_SYSTEM_PROMPT,
+            templates=PROMPT_TEMPLATES,
+        ),
+        run_id="test-run",
+        n_games=6,
+        max_concurrency=2,
+    )
+
+
+@pytest.mark.asyncio
+async def test_run_eval(dummy_config, tmp_path, capsys):
+    await run_eval(dummy_config, log_dir=str(tmp_path))
+
+    records = list(sinks.read_records("jsonl", tmp_path / "test-run"))
+    assert len(records) == 6
+    # The dummy model never asks a question
+    assert all(record["failure"] == "Invalid question" for record in records)
+    assert "Metrics for 6 games" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_run_eval_workers(dummy_config, tmp_path, capsys):
+    dummy_config.workers = 2
+    await run_eval(dummy_config, log_dir=str(tmp_path))
+
+    run_dir = tmp_path / "test-run"
+    assert (run_dir / "config.json").exists()
+    assert len(list(run_dir.glob("results-w000-*.jsonl"))) == 1
+    assert len(list(run_dir.glob("results-w001-*.jsonl"))) == 1
+    assert len(list(sinks.read_records("jsonl", run_dir))) == 6
+    assert "Metrics for 6 games" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_run_eval_batch_games(dummy_config, tmp_path, capsys):
+    dummy_config.env.batch_games = 4
+    await run_eval(dummy_config, log_dir=str(tmp_path))
+
+    records = list(sinks.read_records("jsonl", tmp_path / "test-run"))
+    assert len(records) == 6
+    assert all(record["failure"] == "Invalid question" for record in records)
+    assert "Metrics for 6 games" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_batch_games_count_towards_max_concurrency(
+    dummy_config, tmp_path, monkeypatch
+):
+    dummy_config.env.batch_games = 4
+    dummy_config.max_concurrency = 8
+    dummy_config.n_games = 40
+    in_flight, peak = 0, 0
+    run_play_batch = src.main.run_play_batch
+
+    async def counting_play_batch(config, n_games, models, tracer=None):
+        nonlocal in_flight, peak
+        in_flight += n_games
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await run_play_batch(config, n_games, models, tracer)
+        finally:
+            in_flight -= n_games
+
+    monkeypatch.setattr(src.main, "run_play_batch", counting_play_batch)
+    await run_eval(dummy_config, log_dir=str(tmp_path))
+    assert peak == 8
+
+
+@pytest.mark.asyncio
+async def test_run_play_combined_turn_mode(dummy_config):
+    dummy_config.env.turn_mode = "combined"
+    dummy_config.env.max_turns = 5
+    replies = []
+
+    class ScriptedModel(ModelWrapper):
+        async def generate(self, prompts, **kwargs):
+            replies.append(scripted_reply(prompts))
+            return replies[-1]
+
+    class Registry:
+        def get(self, name=None):
+            return ScriptedModel()
+
+    result = await run_play(dummy_config, Registry())
+
+    assert result.success
+    assert result.turn_mode == "combined"
+    # One question, then an answer and a combined guess/question per turn
+    assert len(replies) == 1 + 2 * result.num_turns
+
+
+@pytest.mark.parametrize("traced", [False, True])
+@pytest.mark.asyncio
+async def test_run_play_counts_discarded_branches(dummy_config, traced):
+    dummy_config.env.speculative = True
+    dummy_config.env.max_turns = 1
+
+    class ScriptedModel(ModelWrapper):
+        async def generate(self, prompts, **kwargs):
+            prompt = prompts[-1]["content"]
+            if "Answer only with 'yes' or 'no'" in prompt:
+                return "yes"
+            # The branch guessing for "no" loses and outlives the game
+            if "Answer: no" in prompt:
+                await asyncio.sleep(0.05)
+            tracing.add_tokens({"prompt_tokens": 10, "completion_tokens": 1})
+            return scripted_reply(prompts)
+
+    class Registry:
+        def get(self, name=None):
+            return ScriptedModel()
+
+    tracer = tracing.Tracer() if traced else None
+    result = await run_play(dummy_config, Registry(), tracer)
+
+    assert result.speculative_tokens == {"prompt": 10, "completion": 1}
+    if traced:
+        counters = result.timings["counters"]
+        assert counters["speculative.tokens.prompt"] == 10
+        assert counters["speculative.tokens.completion"] == 1
+
+
+@pytest.mark.asyncio
+async def test_run_eval_early_stopping(dummy_config, tmp_path, capsys):
+    dummy_config.n_games = 1000
+    dummy_config.stop_threshold = 0.5
+    metrics = await run_eval(dummy_config, log_dir=str(tmp_path))
+
+    records = list(sinks.read_records("jsonl", tmp_path / "test-run"))
+    early_stopping = metrics["early_stopping"]
+    assert early_stopping["reason"] == "below_threshold"
+    assert len(records) == metrics["total games"] < 100
+    assert early_stopping["games_saved"] == 1000 - len(records)
+
+
+@pytest.mark.asyncio
+async def test_run_eval_resume(dummy_config, tmp_path, capsys):
+    uninterrupted = await run_eval(dummy_config, log_dir=str(tmp_path / "full"))
+
+    await run_eval(dummy_config, log_dir=str(tmp_path))
+    # Simulate a crash: the last games never reached the log, the last line is cut
+    run_dir = tmp_path / "test-run"
+    segment = next(run_dir.glob("results-*.jsonl"))
+    lines = segment.read_text().splitlines(keepends=True)
+    segment.write_text("".join(lines[:3]) + lines[3][:10])
+
+    config = Config.load(run_dir / "config.json")
+    metrics = await run_eval(config, log_dir=str(tmp_path), resume=True)
+
+    assert "3 games left to play" in capsys.readouterr().out
+    records = list(sinks.read_records("jsonl", run_dir))
+    assert sorted(record["game_id"] for record in records) == list(range(6))
+    for key in ("total games", "guess_success_rate", "average_turns"):
+        assert metrics[key] == uninterrupted[key]
+    assert metrics["failure_counts"] == uninterrupted["failure_counts"]
@@ -0,0 +1,110 @@
+import io
+import os
+
+import pytest
+
+from src.knowledge_base import KnowledgeBase
+from src.main import KNOWLEDGE_BASE, TOPIC_ALIASES
+from src.matcher import (
+    GuessMatcher,
+    compile_matcher,
+    get_matcher,
+    load_matcher,
+    matcher_path_for,
+    normalize,
+)
+
+
+def test_normalize():
+    assert normalize("  Crème Brûlée!") == ["creme", "brulee"]
+    assert normalize("A hot-dog, maybe?") == ["a", "hot", "dog", "maybe"]
+
+
+class TestGuessMatcher:
+    def test_whole_tokens_only(self):
+        matcher = GuessMatcher(["cat", "dog"])
+        assert matcher.match("Is it a cat?") == 0
+        assert matcher.match("A category of dogs") == 1
+        assert matcher.match("concatenate") is None
+
+    def test_aliases_and_plurals(self):
+        matcher = GuessMatcher(KNOWLEDGE_BASE, TOPIC_ALIASES)
+        assert matcher.resolve("My guess is an airplane.") == "plane"
+        assert matcher.resolve("Kittens") == "cat"
+        assert matcher.resolve("CHICKENS") == "chicken"
+        assert matcher.resolve("A spaceship") is None
+
+    def test_alias_of_unknown_topic_is_ignored(self):
+        matcher = GuessMatcher(["dog"], {"horse": ["pony"]})
+        assert matcher.match("pony") is None
+
+    def test_longest_match_wins(self):
+        matcher = GuessMatcher(["dog", "hot dog", "ice cream"])
+        assert matcher.resolve("I think it's a hot dog") == "hot dog"
+        assert matcher.resolve("dog or hot dog?") == "hot dog"
+        # Equally long matches: the first named
+        assert matcher.resolve("ice cream, or a hot dog") == "ice cream"
+
+    def test_overlapping_patterns(self):
+        # "new york city" fails over to "york city" when "state" does not follow
+        matcher = GuessMatcher(["new york state", "york city"])
+        assert matcher.resolve("new york city") == "york city"
+
+    def test_accents(self):
+        matcher = GuessMatcher(["Crème brûlée"])
+        assert matcher.resolve("creme brulee") == "Crème brûlée"
+
+    def test_duplicate_topic_resolves_to_first(self):
+        assert GuessMatcher(["dog", "Dog"]).match("DOG") == 0
+
+    def test_exact_name_beats_plural_form(self):
+        matcher = GuessMatcher(["dog", "dogs"])
+        assert matcher.resolve("dogs") == "dogs"
+
+    def test_empty_knowledge_base(self):
+        assert GuessMatcher([]).match("dog") is None
+
+
+def test_python_and_numpy_builds_are_identical():
+    pytest.importorskip("numpy")
+    topics = KNOWLEDGE_BASE + ["hot dog", "dogs", "new york state", "york city", "Dog"]
+    topics += ["", "Crème brûlée", "route 66", "a b c d", "b c", "c"]
+    compiled = []
+    for use_numpy in (False, True):
+        f = io.BytesIO()
+        compile_matcher(f, topics, TOPIC_ALIASES, b"hash", use_numpy=use_numpy)
+        compiled.append(f.getvalue())
+    assert compiled[0] == compiled[1]
+
+
+def test_get_matcher_is_cached_per_knowledge_base():
+    matcher = get_matcher(KNOWLEDGE_BASE, TOPIC_ALIASES)
+    assert get_matcher(KNOWLEDGE_BASE, TOPIC_ALIASES) is matcher
+    assert get_matcher(list(KNOWLEDGE_BASE), TOPIC_ALIASES) is not matcher
+
+
+def test_compiled_file_is_reused_until_inputs_change(tmp_path):
+    path = tmp_path / "topics.txt"
+    path.write_text("dog\ncat\nhot dog\n")
+    kb = KnowledgeBase(path)
+    matcher = load_matcher(kb, {"dog": ["puppy"]})
+    assert matcher.resolve("a hot dog") == "hot dog"
+    assert matcher.resolve("puppies or a puppy") == "dog"
+
+    compiled = matcher_path_for(path)
+    built = os.stat(compiled).st_mtime_ns
+    assert load_matcher(kb, {"dog": ["puppy"]}).resolve("puppy") == "dog"
+    assert os.stat(compiled).st_mtime_ns == built
+
+    # A different alias table or an edited file invalidates the compiled automaton
+    assert load_matcher(kb, {}).resolve("puppy") is None
+    path.write_text("dog\ncat\nhorse\n")
+    assert load_matcher(KnowledgeBase(path), {}).resolve("horses") == "horse"
+
+
+def test_get_matcher_maps_file_backed_knowledge_base(tmp_path):
+    path = tmp_path / "topics.txt"
+    path.write_text("dog\ncat\n")
+    matcher = get_matcher(KnowledgeBase(path))
+    assert matcher_path_for(path).exists()
+    assert matcher.resolve("Cats!") == "cat"
@@ -0,0 +1,191 @@
+import random
+import statistics
+
+import pytest
+
+from src.evaluator import Result
+from src.metrics import QuantileSketch, RunningStats, SequentialStopper
+
+
+def make_result(
+    topic="dog", num_turns=3, success=True, failure=None, duration=1.0, history=()
+):
+    return Result(
+        topic=topic,
+        num_turns=num_turns,
+        success=success,
+        history=list(history),
+        timestamp="",
+        failure=failure,
+        duration=duration,
+    )
+
+
+class TestQuantileSketch:
+    def test_relative_accuracy(self):
+        rng = random.Random(0)
+        values = [rng.lognormvariate(0, 1) for _ in range(10_000)]
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+
+        values.sort()
+        for q in [0.5, 0.95, 0.99]:
+            exact = values[int(q * (len(values) - 1))]
+            assert sketch.quantile(q) == pytest.approx(exact, rel=0.02)
+
+    def test_merge(self):
+        left, right, both = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for i in range(1, 101):
+            (left if i % 2 else right).add(i)
+            both.add(i)
+        left.merge(right)
+        assert left.summary() == both.summary()
+
+    def test_empty(self):
+        assert QuantileSketch().quantile(0.5) is None
+        assert QuantileSketch().summary() == {}
+
+
+class TestRunningStats:
+    def test_summary(self):
+        stats = RunningStats()
+        turns = [2, 5, 3, 7]
+        for i, n in enumerate(turns):
+            stats.update(
+                make_result(
+                    topic="dog" if i < 3 else "cat",
+                    num_turns=n,
+                    success=i % 2 == 0,
+                    failure=None if i % 2 == 0 else "Max turns exceeded",
+                )
+            )
+
+        summary = stats.summary()
+        assert summary["total games"] == 4
+        assert summary["guess_success_rate"] == 0.5
+        assert summary["average_turns"] == pytest.approx(statistics.mean(turns))
+        assert summary["turns_variance"] == pytest.approx(statistics.variance(turns))
+        assert summary["failure_counts"] == {"Max turns exceeded": 2}
+        assert summary["num_topics"] == {"dog": 3, "cat": 1}
+        assert summary["game_latency"]["count"] == 4
+
+    def test_merge_matches_single_pass(self):
+        rng = random.Random(1)
+        results = [
+            make_result(num_turns=rng.randint(1, 20), duration=rng.random())
+            for _ in range(50)
+        ]
+        single, left, right = RunningStats(), RunningStats(), RunningStats()
+        for i, result in enumerate(results):
+            single.update(result)
+            (left if i < 20 else right).update(result)
+        left.merge(right)
+
+        merged, expected = left.summary(), single.summary()
+        assert merged["total games"] == expected["total games"]
+        assert merged["average_turns"] == pytest.approx(expected["average_turns"])
+        assert merged["turns_variance"] == pytest.approx(expected["turns_variance"])
+        assert merged["game_latency"] == pytest.approx(expected["game_latency"])
+
+    def test_guess_confusion(self):
+        history = [
+            {"guess": "a cat", "guess_topic": "cat"},
+            {"guess": "a puppy", "guess_topic": "dog"},
+            {"guess": "a rock", "guess_topic": None},
+        ]
+        left, right = RunningStats(), RunningStats()
+        left.update(make_result(topic="dog", history=history))
+        right.update(make_result(topic="dog", history=history[:1]))
+        # Records written before guesses were resolved
+        right.update(make_result(topic="car", history=[{"guess": "a car"}]))
+        assert "guess_confusion" not in RunningStats().summary()
+
+        left.merge(right)
+        summary = left.summary()
+        assert summary["guess_confusion"] == {"dog": {"cat": 2}}
+        assert summary["unresolved_guesses"] == 1
+
+    def test_speculative_tokens(self):
+        left, right = RunningStats(), RunningStats()
+        left.update(make_result())
+        assert "speculative_tokens" not in left.summary()
+
+        for stats in (left, right):
+            result = make_result()
+            result.speculative_tokens = {"prompt": 10, "completion": 2}
+            stats.update(result)
+        left.merge(right)
+        assert left.summary()["speculative_tokens"] == {"prompt": 20, "completion": 4}
+
+
+class TestSequentialStopper:
+    def test_interval_narrows(self):
+        stopper = SequentialStopper(target_width=0.1)
+        low, high = stopper.interval(50, 100)
+        assert low < 0.5 < high
+        wide = high - low
+        low, high = stopper.interval(5000, 10000)
+        assert high - low < wide
+
+    def test_intervals_cover_the_rate_at_every_game(self):
+        rng = random.Random(0)
+        stopper = SequentialStopper(alpha=0.05, target_width=0.1)
+        misses = 0
+        for _ in range(50):
+            successes = 0
+            for games in range(1, 501):
+                successes += rng.random() < 0.3
+                low, high = stopper.interval(successes, games)
+                if not low <= 0.3 <= high:
+                    misses += 1
+                    break
+        assert misses <= 3
+
+    def test_stops_below_threshold(self):
+        stopper = SequentialStopper(threshold=0.5)
+        stats = RunningStats()
+        while not stopper.check():
+            stopper.add(stats.games, False)
+            stats.update(make_result(success=False))
+        assert stopper.reason == "below_threshold"
+        assert stats.games < 50
+        summary = stopper.summary(stats, n_games=1000)
+        assert summary["games_saved"] == 1000 - stats.games
+        assert summary["games"] == stats.games
+        assert summary["interval"][1] < 0.5
+
+    def test_only_sees_the_finished_prefix(self):
+        stopper = SequentialStopper(threshold=0.5, min_games=1)
+        # Games 1-29 finish, all successful, while game 0 is still running
+        for game_id in range(1, 30):
+            stopper.add(game_id, True)
+        assert stopper.games == 0
+        assert not stopper.check()
+
+        stopper.add(0, False)
+        assert (stopper.successes, stopper.games) == (29, 30)
+        assert stopper.check()
+        assert stopper.reason == "above_threshold"
+
+    def test_interval_is_the_one_that_stopped(self):
+        stopper = SequentialStopper(threshold=0.5, min_games=1)
+        stats = RunningStats()
+        game_id = 0
+        while not stopper.check():
+            stopper.add(game_id, True)
+            game_id += 1
+        interval = stopper.summary(stats, n_games=100)["interval"]
+
+        # Games still in flight when the run stopped are drained afterwards
+        for _ in range(20):
+            stopper.add(game_id, False)
+            game_id += 1
+        summary = stopper.summary(stats, n_games=100)
+        assert summary["interval"] == interval
+        assert summary["interval"][0] > 0.5
+        assert summary["games"] == game_id - 20
+
+    def test_requires_a_criterion(self):
+        with pytest.raises(ValueError):
+            SequentialStopper()
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import signal
+
+import pytest
+import pytest_asyncio
+
+from src.config import Config, EnvConfig, ModelConfig, PromptConfig
+from src.env import TURN_TYPE
+from src.main import (
+    GUESSER_SYSTEM_PROMPT,
+    HOST_SYSTEM_PROMPT,
+    KNOWLEDGE_BASE,
+    PROMPT_TEMPLATES,
+    guesser_system_prompt,
+    run_eval,
+)
+from src.mock_server import create_app, scripted_reply, stats_key
+from src.model import VLLMModelWrapper
+from src.utils import STOP_CONDITIONS
+
+GUESSER_SYSTEM = guesser_system_prompt(GUESSER_SYSTEM_PROMPT, KNOWLEDGE_BASE)
+
+
+def host_prompt(topic, question):
+    return [
+        {"role": "system", "content": HOST_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": PROMPT_TEMPLATES[TURN_TYPE.ANSWER_QUESTION].format(
+                turn=1, topic=topic, current_question=question
+            ),
+        },
+    ]
+
+
+class TestScriptedReply:
+    def test_host_is_deterministic(self):
+        first = scripted_reply(host_prompt("dog", "Is it alive?"))
+        assert first in ["yes", "no"]
+        assert scripted_reply(host_prompt("dog", "Is it alive?")) == first
+
+    def test_guesser_guesses_in_order(self):
+        for turn, topic in enumerate(KNOWLEDGE_BASE, start=1):
+            messages = [
+                {"role": "system", "content": GUESSER_SYSTEM},
+                {"role": "user", "content": f"Turn: {turn}\nMake your best guess."},
+            ]
+            assert scripted_reply(messages) == topic
+
+    def test_guesser_asks_question(self):
+        prompt = "Turn: 3\nAsk a single yes/no question"
+        messages = [{"role": "user", "content": prompt}]
+        assert scripted_reply(messages).endswith("?")
+
+
+@pytest_asyncio.fixture
+async def mock_server():
+    pytest.importorskip("aiohttp")
+    from aiohttp.test_utils import TestServer
+
+    server = TestServer(create_app())
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_run_eval_against_mock_server(mock_server, tmp_path):
+    config = Config(
+        model=ModelConfig(
+            backend="vllm",
+            server_url=str(mock_server.make_url("/v1/chat/completions")),
+        ),
+        env=EnvConfig(max_turns=len(KNOWLEDGE_BASE), knowledge_base=KNOWLEDGE_BASE),
+        prompts=PromptConfig(
+            host_system=HOST_SYSTEM_PROMPT,
+            guesser_system=GUESSER_SYSTEM_PROMPT,
+            templates=PROMPT_TEMPLATES,
+        ),
+        run_id="mock-run",
+        n_games=20,
+        max_concurrency=8,
+    )
+    await run_eval(config, log_dir=str(tmp_path))
+
+    records = []
+    for path in (tmp_path / "mock-run").glob("results-*.jsonl"):
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f)
+
+    assert len(records) == 20
+    assert all(record["success"] for record in records)
+    for record in records:
+        assert record["num_turns"] == KNOWLEDGE_BASE.index(record["topic"]) + 1
+
+    stats = mock_server.app[stats_key()]
+    assert stats["requests"] == sum(3 * record["num_turns"] for record in records)
+
+
+@pytest_asyncio.fixture
+async def slow_server():
+    pytest.importorskip("aiohttp")
+    from aiohttp.test_utils import TestServer
+
+    server = TestServer(create_app(latency_median=0.02))
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_sigterm_stops_sharded_eval(slow_server, tmp_path):
+    config = Config(
+        model=ModelConfig(
+            backend="vllm",
+            server_url=str(slow_server.make_url("/v1/chat/completions")),
+        ),
+        env=EnvConfig(max_turns=len(KNOWLEDGE_BASE), knowledge_base=KNOWLEDGE_BASE),
+        prompts=PromptConfig(
+            host_system=HOST_SYSTEM_PROMPT,
+            guesser_system=GUESSER_SYSTEM_PROMPT,
+            templates=PROMPT_TEMPLATES,
+        ),
+        run_id="sigterm-run",
+        n_games=2000,
+        max_concurrency=4,
+        workers=2,
+    )
+
+    async def terminate():
+        # Once the workers are playing, stop the run the way a job scheduler would
+        while slow_server.app[stats_key()]["requests"] < 50:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.5)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    killer = asyncio.create_task(terminate())
+    await run_eval(config, log_dir=str(tmp_path))
+    await killer
+
+    records = []
+    for path in (tmp_path / "sigterm-run").glob("results-*.jsonl"):
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f)
+    assert 0 < len(records) < config.n_games
+
+
+@pytest_asyncio.fixture
+async def chatty_server():
+    pytest.importorskip("aiohttp")
+    from aiohttp.test_utils import TestServer
+
+    server = TestServer(create_app(padding=20, token_latency=0.001))
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_is_cut_off(chatty_server):
+    model = VLLMModelWrapper(str(chatty_server.make_url("/v1/chat/completions")))
+    prompt = host_prompt("dog", "Is it alive?")
+    stop_when = STOP_CONDITIONS[TURN_TYPE.ANSWER_QUESTION]
+    try:
+        full = await model.generate(prompt)
+        cut = await model.generate_stream(prompt, stop_when)
+        streamed = await model.generate_stream(prompt)
+        budgeted = await model.generate(prompt, max_tokens=2)
+    finally:
+        await model.aclose()
+
+    assert streamed == full
+    assert cut.split()[0] == full.split()[0] and len(cut) < len(full)
+    assert len(budgeted) <= 8
+    stats = chatty_server.app[stats_key()]
+    assert stats["completions"] == 4
+    assert stats["streams_closed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_streamed_eval_against_chatty_server(chatty_server, tmp_path):
+    config = Config(
+        model=ModelConfig(
+            backend="vllm",
+            server_url=str(chatty_server.make_url("/v1/chat/completions")),
+            stream=True,
+        ),
+        env=EnvConfig(max_turns=len(KNOWLEDGE_BASE), knowledge_base=KNOWLEDGE_BASE),
+        prompts=PromptConfig(
+            host_system=HOST_SYSTEM_PROMPT,
+            guesser_system=GUESSER_SYSTEM_PROMPT,
+            templates=PROMPT_TEMPLATES,
+        ),
+        run_id="stream-run",
+        n_games=5,
+        max_concurrency=5,
+        trace=True,
+    )
+    metrics = await run_eval(config, log_dir=str(tmp_path))
+
+    assert metrics["guess_success_rate"] == 1.0
+    stats = chatty_server.app[stats_key()]
+    assert stats["streams_closed"] == stats["completions"]
+    assert metrics["trace"]["counters"]["model.stream_cutoffs"] == stats["completions"]
@@ -0,0 +1,528 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, Mock
+
+import src.model
+from src.config import ModelConfig
+from src.exceptions import APIError, FatalAPIError
+from src.model import (
+    BatchingModelWrapper,
+    CachedModelWrapper,
+    DummyModelWrapper,
+    HedgingModelWrapper,
+    ModelWrapper,
+    ModelRegistry,
+    OpenAIModelWrapper,
+    VLLMModelWrapper,
+    call_kind,
+)
+from src.ratelimit import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    monkeypatch.setattr(src.model, "RETRY_BASE_DELAY", 0.0)
+
+
+@pytest.fixture
+def mock_client():
+    client = Mock()
+    response = Mock()
+    response.choices = [Mock(message=Mock(content="yes"))]
+    client.chat.completions.create = AsyncMock(return_value=response)
+    client.close = AsyncMock()
+    return client
+
+
+@pytest.mark.asyncio
+class TestOpenAIModelWrapper:
+    async def test_generate_uses_default_kwargs(self, mock_client):
+        model = OpenAIModelWrapper("test-model", temperature=0.0, client=mock_client)
+        response = await model.generate([{"role": "user", "content": "hi"}])
+
+        assert response == "yes"
+        kwargs = mock_client.chat.completions.create.await_args.kwargs
+        assert kwargs["model"] == "test-model"
+        assert kwargs["temperature"] == 0.0
+
+    async def test_generate_raises_after_retries(self, mock_client):
+        mock_client.chat.completions.create.side_effect = RuntimeError("boom")
+        model = OpenAIModelWrapper(max_retries=2, client=mock_client)
+        with pytest.raises(APIError):
+            await model.generate([{"role": "user", "content": "hi"}])
+        assert mock_client.chat.completions.create.await_count == 2
+
+    async def test_retries_rate_limits_but_not_fatal_errors(self, mock_client):
+        openai = pytest.importorskip("openai")
+        import httpx
+
+        def error(cls, status):
+            request = httpx.Request("POST", "http://test")
+            response = httpx.Response(
+                status, headers={"retry-after": "0"}, request=request
+            )
+            return cls("error", response=response, body=None)
+
+        create = mock_client.chat.completions.create
+        create.side_effect = [error(openai.RateLimitError, 429), create.return_value]
+        model = OpenAIModelWrapper(max_retries=2, client=mock_client)
+        assert await model.generate([{"role": "user", "content": "hi"}]) == "yes"
+
+        create.side_effect = error(openai.AuthenticationError, 401)
+        create.reset_mock()
+        with pytest.raises(FatalAPIError):
+            await model.generate([{"role": "user", "content": "hi"}])
+        assert create.await_count == 1
+
+    async def test_aclose_closes_client(self, mock_client):
+        model = OpenAIModelWrapper(client=mock_client)
+        await model.aclose()
+        mock_client.close.assert_awaited_once()
+
+
+class EchoModelWrapper(ModelWrapper):
+    def __init__(self):
+        self.batches = []
+
+    async def generate(self, prompts, **kwargs):
+        return prompts[-1]["content"]
+
+    async def generate_batch(self, prompts, **kwargs):
+        self.batches.append((len(prompts), kwargs))
+        return [prompt[-1]["content"] for prompt in prompts]
+
+
+def user_prompt(content):
+    return [{"role": "user", "content": content}]
+
+
+@pytest.mark.asyncio
+class TestBatchingModelWrapper:
+    async def test_coalesces_concurrent_calls(self):
+        backend = EchoModelWrapper()
+        model = BatchingModelWrapper(backend, max_batch_size=8, batch_window=0.01)
+
+        responses = await asyncio.gather(
+            *(model.generate(user_prompt(str(i))) for i in range(5))
+        )
+
+        assert responses == [str(i) for i in range(5)]
+        assert backend.batches == [(5, {})]
+
+    async def test_flushes_at_max_batch_size(self):
+        backend = EchoModelWrapper()
+        model = BatchingModelWrapper(backend, max_batch_size=2, batch_window=10.0)
+
+        responses = await asyncio.gather(
+            *(model.generate(user_prompt(str(i))) for i in range(4))
+        )
+
+        assert responses == ["0", "1", "2", "3"]
+        assert [size for size, _ in backend.batches] == [2, 2]
+
+    async def test_separates_different_kwargs(self):
+        backend = EchoModelWrapper()
+        model = BatchingModelWrapper(backend, batch_window=0.01)
+
+        await asyncio.gather(
+            model.generate(user_prompt("a"), temperature=0.0),
+            model.generate(user_prompt("b"), temperature=1.0),
+            model.generate(user_prompt("c"), temperature=0.0),
+        )
+
+        assert sorted(backend.batches, key=lambda b: b[0]) == [
+            (1, {"temperature": 1.0}),
+            (2, {"temperature": 0.0}),
+        ]
+
+    async def test_propagates_errors(self):
+        backend = EchoModelWrapper()
+        backend.generate_batch = AsyncMock(side_effect=APIError("down"))
+        model = BatchingModelWrapper(backend, batch_window=0.01)
+
+        results = await asyncio.gather(
+            model.generate(user_prompt("a")),
+            model.generate(user_prompt("b")),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, APIError) for r in results)
+
+    async def test_registry_wraps_when_batching(self):
+        registry = ModelRegistry(ModelConfig(backend="dummy", batch_size=4))
+        model = registry.get()
+        assert isinstance(model, BatchingModelWrapper)
+        assert await model.generate(user_prompt("a")) == "Dummy response"
+        await registry.aclose()
+
+
+class CountingModelWrapper(EchoModelWrapper):
+    model_name = "test-model"
+    default_kwargs = {"temperature": 0.0}
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def generate(self, prompts, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return prompts[-1]["content"]
+
+
+class SlowOnceModelWrapper(EchoModelWrapper):
+    """Answers at once, except for the fourth call, with a "slow" prompt."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate(self, prompts, **kwargs):
+        self.calls += 1
+        if prompts[-1]["content"] == "slow" and self.calls == 4:
+            try:
+                await asyncio.sleep(0.2)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return prompts[-1]["content"]
+
+
+@pytest.mark.asyncio
+class TestHedgingModelWrapper:
+    async def test_hedges_slow_call(self):
+        backend = SlowOnceModelWrapper()
+        model = HedgingModelWrapper(backend, max_ratio=1.0, min_samples=3)
+        with call_kind("ask_question"):
+            for _ in range(3):
+                await model.generate(user_prompt("fast"))
+            assert await model.generate(user_prompt("slow")) == "slow"
+        await asyncio.sleep(0)
+
+        assert backend.calls == 5
+        assert model.stats() == {"hedges_sent": 1, "hedges_won": 1}
+        assert model.latencies["ask_question"].count == 4
+        # The slow request is left to finish rather than cancelled
+        assert len(model.discarded) == 1
+        await model.aclose()
+        assert backend.cancelled == 0
+        assert not model.discarded
+
+    async def test_waits_for_samples_of_same_kind(self):
+        backend = SlowOnceModelWrapper()
+        model = HedgingModelWrapper(backend, max_ratio=1.0, min_samples=3)
+        for _ in range(3):
+            await model.generate(user_prompt("fast"))
+        with call_kind("answer_question"):
+            task = asyncio.create_task(model.generate(user_prompt("slow")))
+            await asyncio.sleep(0.05)
+        assert not task.done()
+        assert model.hedges_sent == 0
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def test_caps_hedge_load(self):
+        backend = SlowOnceModelWrapper()
+        model = HedgingModelWrapper(backend, max_ratio=0.0, min_samples=3)
+        for _ in range(3):
+            await model.generate(user_prompt("fast"))
+        task = asyncio.create_task(model.generate(user_prompt("slow")))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        assert model.hedges_sent == 0
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert backend.cancelled == 1
+
+    async def test_registry_wraps_when_hedging(self):
+        registry = ModelRegistry(ModelConfig(backend="dummy", hedge_quantile=0.95))
+        assert isinstance(registry.get(), HedgingModelWrapper)
+        await registry.aclose()
+
+
+@pytest.mark.asyncio
+class TestCachedModelWrapper:
+    async def test_memory_hit(self):
+        backend = CountingModelWrapper()
+        model = CachedModelWrapper(backend, max_size=4)
+
+        assert await model.generate(user_prompt("a")) == "a"
+        assert await model.generate(user_prompt("a")) == "a"
+        assert backend.calls == 1
+        assert model.stats()["cache_hits"] == 1
+        assert model.stats()["cache_misses"] == 1
+
+    async def test_kwargs_change_key(self):
+        backend = CountingModelWrapper()
+        model = CachedModelWrapper(backend)
+
+        await model.generate(user_prompt("a"))
+        await model.generate(user_prompt("a"), max_tokens=5)
+        assert backend.calls == 2
+
+    async def test_lru_eviction(self):
+        backend = CountingModelWrapper()
+        model = CachedModelWrapper(backend, max_size=2)
+
+        for content in ["a", "b", "a", "c", "b"]:
+            await model.generate(user_prompt(content))
+
+        # "b" was the least recently used entry when "c" was inserted
+        assert backend.calls == 4
+        assert list(model.memory) == [model.cache_key(user_prompt(c), {}) for c in "cb"]
+
+    async def test_concurrent_identical_requests_share_call(self):
+        backend = CountingModelWrapper()
+        model = CachedModelWrapper(backend)
+
+        responses = await asyncio.gather(
+            *(model.generate(user_prompt("a")) for _ in range(5))
+        )
+        assert responses == ["a"] * 5
+        assert backend.calls == 1
+
+    async def test_disk_tier_survives_runs(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        first = CachedModelWrapper(CountingModelWrapper(), path=path)
+        await first.generate(user_prompt("a"))
+        await first.aclose()
+
+        backend = CountingModelWrapper()
+        second = CachedModelWrapper(backend, path=path)
+        assert await second.generate(user_prompt("a")) == "a"
+        assert backend.calls == 0
+        assert second.stats()["cache_disk_hits"] == 1
+        await second.aclose()
+
+    async def test_disk_tier_shared_between_processes(self, tmp_path):
+        # Each worker of a run opens its own connection to the same file
+        path = str(tmp_path / "cache.sqlite")
+        first = CachedModelWrapper(CountingModelWrapper(), path=path)
+        await first.generate(user_prompt("a"))
+
+        backend = CountingModelWrapper()
+        second = CachedModelWrapper(backend, path=path)
+        await second.generate(user_prompt("b"))
+        assert await second.generate(user_prompt("a")) == "a"
+        assert backend.calls == 1
+        assert await first.generate(user_prompt("b")) == "b"
+        assert first.stats()["cache_disk_hits"] == 1
+        await first.aclose()
+        await second.aclose()
+
+    async def test_generate_batch_only_sends_misses(self):
+        backend = CountingModelWrapper()
+        model = CachedModelWrapper(backend)
+        await model.generate(user_prompt("a"))
+
+        responses = await model.generate_batch([user_prompt("a"), user_prompt("b")])
+        assert responses == ["a", "b"]
+        assert backend.batches == [(1, {})]
+
+
+@pytest.mark.asyncio
+class TestModelRegistry:
+    async def test_get_shares_model(self):
+        registry = ModelRegistry(ModelConfig(backend="dummy"))
+        model = registry.get()
+        assert isinstance(model, DummyModelWrapper)
+        assert registry.get() is model
+        assert registry.get("other-model") is not model
+
+    async def test_aclose_closes_models(self):
+        async with ModelRegistry(ModelConfig(backend="dummy")) as registry:
+            model = registry.get()
+            model.aclose = AsyncMock()
+        model.aclose.assert_awaited_once()
+        assert registry.models == {}
+
+    async def test_stats(self):
+        config = ModelConfig(name="m", backend="dummy", cache_size=8, batch_size=2)
+        async with ModelRegistry(config) as registry:
+            model = registry.get()
+            await model.generate(user_prompt("a"))
+            await model.generate(user_prompt("a"))
+            stats = registry.stats()
+
+        assert stats["m"]["cache_hits"] == 1
+        assert stats["m"]["batches_sent"] == 1
+
+    async def test_cache_key_includes_temperature_when_batched(self):
+        def key(batch_size, temperature):
+            config = ModelConfig(
+                backend="vllm",
+                server_url="http://test",
+                temperature=temperature,
+                cache_size=8,
+                batch_size=batch_size,
+            )
+            return ModelRegistry(config).get().cache_key(user_prompt("a"), {})
+
+        assert key(4, 0.0) == key(1, 0.0)
+        assert key(4, 0.0) != key(4, 0.7)
+
+    async def test_shares_rate_limiter(self):
+        registry = ModelRegistry(
+            ModelConfig(backend="vllm", server_url="http://test", tokens_per_minute=1e5)
+        )
+        assert registry.get("a").limiter is registry.get("b").limiter
+        assert "rate_limiter" in registry.stats()
+        await registry.aclose()
+
+    async def test_unknown_backend(self):
+        registry = ModelRegistry(ModelConfig(backend="unknown"))
+        with pytest.raises(ValueError):
+            registry.get()
+
+
+@pytest_asyncio.fixture
+async def vllm_server():
+    """Local stand-in for a vLLM chat completions endpoint."""
+    web = pytest.importorskip("aiohttp.web")
+    from aiohttp.test_utils import TestServer
+
+    requests = []
+    failures = {"remaining": 0, "status": 503, "headers": {}}
+
+    async def chat_completions(request):
+        payload = await request.json()
+        requests.append(payload)
+        if failures["remaining"] > 0:
+            failures["remaining"] -= 1
+            return web.json_response(
+                {"error": "overloaded"},
+                status=failures["status"],
+                headers=failures["headers"],
+            )
+        conversations = payload["messages"]
+        if conversations and isinstance(conversations[0], dict):
+            conversations = [conversations]
+        choices = [
+            {"index": i, "message": {"content": f" echo: {c[-1]['content']} "}}
+            for i, c in enumerate(conversations)
+        ]
+        return web.json_response({"choices": list(reversed(choices))})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    server = TestServer(app)
+    await server.start_server()
+    server.requests = requests
+    server.failures = failures
+    yield server
+    await server.close()
+
+
+@pytest.mark.asyncio
+class TestVLLMModelWrapper:
+    async def test_generate(self, vllm_server):
+        model = VLLMModelWrapper(
+            str(vllm_server.make_url("/v1/chat/completions")),
+            model_name="test-model",
+            temperature=0.0,
+        )
+        try:
+            response = await model.generate([{"role": "user", "content": "hi"}])
+        finally:
+            await model.aclose()
+
+        assert response == "echo: hi"
+        payload = vllm_server.requests[0]
+        assert payload["model"] == "test-model"
+        assert payload["temperature"] == 0.0
+        assert payload["messages"] == [{"role": "user", "content": "hi"}]
+
+    async def test_reuses_session(self, vllm_server):
+        model = VLLMModelWrapper(str(vllm_server.make_url("/v1/chat/completions")))
+        try:
+            await model.generate([{"role": "user", "content": "a"}])
+            session = model.session
+            await model.generate([{"role": "user", "content": "b"}])
+            assert model.session is session
+        finally:
+            await model.aclose()
+        assert model.session is None
+
+    async def test_retries_server_errors(self, vllm_server):
+        vllm_server.failures["remaining"] = 1
+        model = VLLMModelWrapper(
+            str(vllm_server.make_url("/v1/chat/completions")), max_retries=2
+        )
+        try:
+            response = await model.generate([{"role": "user", "content": "hi"}])
+        finally:
+            await model.aclose()
+        assert response == "echo: hi"
+        assert len(vllm_server.requests) == 2
+
+    async def test_raises_after_retries(self, vllm_server):
+        vllm_server.failures["remaining"] = 5
+        model = VLLMModelWrapper(
+            str(vllm_server.make_url("/v1/chat/completions")), max_retries=2
+        )
+        try:
+            with pytest.raises(APIError):
+                await model.generate([{"role": "user", "content": "hi"}])
+        finally:
+            await model.aclose()
+
+    async def test_client_errors_are_fatal(self, vllm_server):
+        vllm_server.failures.update(remaining=5, status=400)
+        model = VLLMModelWrapper(
+            str(vllm_server.make_url("/v1/chat/completions")), max_retries=3
+        )
+        try:
+            with pytest.raises(FatalAPIError):
+                await model.generate([{"role": "user", "content": "hi"}])
+        finally:
+            await model.aclose()
+        assert len(vllm_server.requests) == 1
+
+    async def test_retry_after_pauses_limiter(self, vllm_server):
+        vllm_server.failures.update(
+            remaining=1, status=429, headers={"Retry-After": "0.05"}
+        )
+        limiter = RateLimiter(requests_per_minute=6000)
+        model = VLLMModelWrapper(
+            str(vllm_server.make_url("/v1/chat/completions")),
+            max_retries=2,
+            limiter=limiter,
+        )
+        start = asyncio.get_running_loop().time()
+        try:
+            response = await model.generate([{"role": "user", "content": "hi"}])
+        finally:
+            await model.aclose()
+
+        assert response == "echo: hi"
+        assert asyncio.get_running_loop().time() - start >= 0.05
+        assert limiter.pauses == 1
+
+    async def test_generate_batch_concurrent_requests(self, vllm_server):
+        model = VLLMModelWrapper(str(vllm_server.make_url("/v1/chat/completions")))
+        try:
+            responses = await model.generate_batch(
+                [[{"role": "user", "content": "a"}], [{"role": "user", "content": "b"}]]
+            )
+        finally:
+            await model.aclose()
+
+        assert responses == ["echo: a", "echo: b"]
+        sent = sorted(p["messages"][0]["content"] for p in vllm_server.requests)
+        assert sent == ["a", "b"]
+
+    async def test_generate_batch_single_request(self, vllm_server):
+        model = VLLMModelWrapper(
+            str(vllm_server.make_url("/v1/chat/completions")), batch_messages=True
+        )
+        try:
+            responses = await model.generate_batch(
+                [[{"role": "user", "content": "a"}], [{"role": "user", "content": "b"}]]
+            )
+        finally:
+            await model.aclose()
+
+        assert responses == ["echo: a", "echo: b"]
+        assert len(vllm_server.requests) == 1
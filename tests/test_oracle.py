@@ -0,0 +1,142 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from src.agent import HostAgent
+from src.env import Observation, TURN_TYPE, AGENT_ROLE
+from src.exceptions import APIError
+from src.model import ModelWrapper
+from src.oracle import AnswerOracle, label_matrix, normalize_question
+from src.utils import PromptManager
+
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def oracle():
+    return AnswerOracle(
+        topics=["dog", "car"],
+        questions=["Is it alive?", "Does it have wheels?"],
+        answers=np.array([[True, False], [False, True]]),
+        known=np.array([[True, True], [True, False]]),
+    )
+
+
+@pytest.fixture
+def host_observation():
+    return Observation(
+        turn=1,
+        history=[],
+        turn_type=TURN_TYPE.ANSWER_QUESTION,
+        active=True,
+        role=AGENT_ROLE.HOST,
+        remaining_turns=4,
+        current_question="is it ALIVE",
+        topic="dog",
+    )
+
+
+def test_answer_counts_skip_unknown_pairs(oracle):
+    yes, no = oracle.answer_counts(np.array([True, True]))
+    assert yes.tolist() == [1, 0]
+    assert no.tolist() == [1, 1]
+
+
+def test_normalize_question():
+    assert normalize_question("Is it  alive?") == normalize_question("is it alive")
+
+
+class TestAnswerOracle:
+    def test_lookup(self, oracle):
+        assert oracle.lookup("dog", "Is it alive?") == "yes"
+        assert oracle.lookup("Car", "is it alive") == "no"
+        assert oracle.stats() == {"oracle_hits": 2, "oracle_misses": 0}
+
+    def test_lookup_misses(self, oracle):
+        assert oracle.lookup("car", "Does it have wheels?") is None
+        assert oracle.lookup("cat", "Is it alive?") is None
+        assert oracle.lookup("dog", "Can it fly?") is None
+        assert oracle.stats()["oracle_misses"] == 3
+
+    def test_save_load_roundtrip(self, oracle, tmp_path):
+        path = tmp_path / "oracle.npz"
+        oracle.save(str(path))
+        loaded = AnswerOracle.load(str(path))
+
+        assert loaded.topics == oracle.topics
+        assert loaded.questions == oracle.questions
+        assert (loaded.answers == oracle.answers).all()
+        assert (loaded.known == oracle.known).all()
+
+    def test_shape_mismatch(self):
+        with pytest.raises(ValueError):
+            AnswerOracle(["dog"], ["Is it alive?"], np.zeros((2, 1), dtype=bool))
+
+
+@pytest.mark.asyncio
+async def test_label_matrix():
+    model = Mock(spec=ModelWrapper)
+
+    async def generate_batch(prompts, **kwargs):
+        answers = []
+        for prompt in prompts:
+            content = prompt[-1]["content"]
+            if "dog" in content and "alive" in content:
+                answers.append("Yes.")
+            elif "wheels" in content:
+                answers.append("Maybe")
+            else:
+                answers.append("No")
+        return answers
+
+    model.generate_batch = AsyncMock(side_effect=generate_batch)
+    oracle = await label_matrix(
+        model, ["dog", "car"], ["Is it alive?", "Has it wheels?"], batch_size=3
+    )
+
+    assert model.generate_batch.await_count == 2
+    assert oracle.answers.tolist() == [[True, False], [False, False]]
+    assert oracle.known.tolist() == [[True, False], [True, False]]
+
+
+@pytest.mark.asyncio
+async def test_label_matrix_keeps_labels_of_other_batches_on_error():
+    model = Mock(spec=ModelWrapper)
+
+    async def generate_batch(prompts, **kwargs):
+        if any("car" in prompt[-1]["content"] for prompt in prompts):
+            raise APIError("Failed to generate response.")
+        return ["yes"] * len(prompts)
+
+    model.generate_batch = AsyncMock(side_effect=generate_batch)
+    oracle = await label_matrix(
+        model, ["dog", "car"], ["Is it alive?", "Has it wheels?"], batch_size=2
+    )
+
+    assert oracle.answers.tolist() == [[True, True], [False, False]]
+    assert oracle.known.tolist() == [[True, True], [False, False]]
+
+
+@pytest.mark.asyncio
+class TestHostOracle:
+    async def test_oracle_hit_skips_model(self, oracle, host_observation):
+        model = Mock(spec=ModelWrapper)
+        model.generate = AsyncMock(return_value="no")
+        prompts = PromptManager(
+            {TURN_TYPE.ANSWER_QUESTION: "{current_question}"}, "system"
+        )
+        host = HostAgent(model, prompts, oracle=oracle)
+
+        assert await host.respond(host_observation) == "yes"
+        model.generate.assert_not_awaited()
+        assert prompts.messages[-1] == {"role": "assistant", "content": "yes"}
+
+    async def test_oracle_miss_falls_back(self, oracle, host_observation):
+        model = Mock(spec=ModelWrapper)
+        model.generate = AsyncMock(return_value="no")
+        prompts = PromptManager({TURN_TYPE.ANSWER_QUESTION: "{current_question}"})
+        host = HostAgent(model, prompts, oracle=oracle)
+
+        obs = host_observation._replace(current_question="Can it fly?")
+        assert await host.respond(obs) == "no"
+        model.generate.assert_awaited_once()
@@ -0,0 +1,62 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+import time
+
+import pytest
+
+from src.ratelimit import RateLimiter, backoff_delay, parse_retry_after
+
+
+def test_backoff_delay_is_jittered_exponential():
+    for attempt in range(6):
+        delay = backoff_delay(attempt, base=1.0, max_delay=10.0)
+        assert 0 <= delay <= min(10.0, 2**attempt)
+    assert backoff_delay(0, base=1.0, max_delay=10.0, retry_after=5.0) >= 5.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(later, usegmt=True)) <= 30
+
+
+@pytest.mark.asyncio
+class TestRateLimiter:
+    async def test_unlimited_never_waits(self):
+        limiter = RateLimiter()
+        for _ in range(100):
+            await limiter.acquire(10_000)
+        assert limiter.waits == 0
+
+    async def test_waits_for_token_refill(self):
+        limiter = RateLimiter(tokens_per_minute=600)
+        await limiter.acquire(600)
+        start = time.monotonic()
+        await limiter.acquire(1)
+        assert time.monotonic() - start >= 0.09
+        assert limiter.waits == 1
+
+    async def test_waits_for_request_refill(self):
+        limiter = RateLimiter(requests_per_minute=600)
+        await asyncio.gather(*(limiter.acquire() for _ in range(601)))
+        assert limiter.waits == 1
+
+    async def test_consume_settles_usage(self):
+        limiter = RateLimiter(tokens_per_minute=600)
+        await limiter.acquire(100)
+        limiter.consume(-200)
+        assert limiter.tokens.level == pytest.approx(600, abs=1)
+        limiter.consume(650)
+        assert limiter.tokens.level < 0
+
+    async def test_pause_holds_back_calls(self):
+        limiter = RateLimiter(requests_per_minute=6000)
+        limiter.pause(0.05)
+        start = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - start >= 0.05
+        assert limiter.pauses == 1
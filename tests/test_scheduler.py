@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from src.scheduler import GameScheduler
+
+
+@pytest.mark.asyncio
+class TestGameScheduler:
+    async def test_runs_all_games(self):
+        scheduler = GameScheduler(max_concurrency=3)
+
+        async def play(game_id):
+            await asyncio.sleep(0)
+            return game_id
+
+        results = [r async for r in scheduler.run(range(10), play)]
+        assert sorted(results) == list(range(10))
+
+    async def test_max_concurrency(self):
+        scheduler = GameScheduler(max_concurrency=2)
+        in_flight = 0
+        peak = 0
+
+        async def play(game_id):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return game_id
+
+        results = [r async for r in scheduler.run(range(6), play)]
+        assert len(results) == 6
+        assert peak == 2
+
+    async def test_yields_in_completion_order(self):
+        scheduler = GameScheduler(max_concurrency=3)
+        delays = {0: 0.05, 1: 0.0, 2: 0.02}
+
+        async def play(game_id):
+            await asyncio.sleep(delays[game_id])
+            return game_id
+
+        results = [r async for r in scheduler.run(range(3), play)]
+        assert results == [1, 2, 0]
+
+    async def test_stop_drains_in_flight(self):
+        scheduler = GameScheduler(max_concurrency=2)
+
+        async def play(game_id):
+            await asyncio.sleep(0.01)
+            return game_id
+
+        results = []
+        async for result in scheduler.run(range(100), play):
+            results.append(result)
+            scheduler.stop()
+
+        # Both games in flight at stop time are still delivered
+        assert sorted(results) == [0, 1]
+
+    async def test_break_cancels_in_flight(self):
+        scheduler = GameScheduler(max_concurrency=4)
+        cancelled = []
+
+        async def play(game_id):
+            try:
+                await asyncio.sleep(0 if game_id == 0 else 10)
+            except asyncio.CancelledError:
+                cancelled.append(game_id)
+                raise
+            return game_id
+
+        gen = scheduler.run(range(4), play)
+        async for result in gen:
+            assert result == 0
+            break
+        await gen.aclose()
+
+        assert sorted(cancelled) == [1, 2, 3]
+
+
+def test_invalid_concurrency():
+    with pytest.raises(ValueError):
+        GameScheduler(max_concurrency=0)
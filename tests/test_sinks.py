@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from src.sinks import (
+    FileSink,
+    JSONLSink,
+    ParquetSink,
+    ThreadedSink,
+    make_sink,
+    read_records,
+)
+
+
+def record(i):
+    return {
+        "topic": f"topic-{i}",
+        "num_turns": i,
+        "success": i % 2 == 0,
+        "history": [{"turn": 1, "question": "Is it alive?"}],
+        "timestamp": "2024-01-01T00:00:00",
+        "failure": None,
+    }
+
+
+def read_jsonl(paths):
+    records = []
+    for path in sorted(paths):
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+class TestJSONLSink:
+    def test_buffers_until_flush(self, tmp_path):
+        sink = JSONLSink(tmp_path, buffer_size=10)
+        sink.write(record(0))
+        assert list(tmp_path.glob("*.jsonl")) == []
+
+        sink.flush()
+        assert read_jsonl(tmp_path.glob("*.jsonl")) == [record(0)]
+        sink.close()
+
+    def test_rotates_segments(self, tmp_path):
+        sink = JSONLSink(tmp_path, buffer_size=1, max_segment_bytes=1)
+        for i in range(3):
+            sink.write(record(i))
+        sink.close()
+
+        segments = sorted(tmp_path.glob("results-*.jsonl"))
+        assert len(segments) == 3
+        assert read_jsonl(segments) == [record(i) for i in range(3)]
+
+    def test_appends_new_segment_after_existing(self, tmp_path):
+        first = JSONLSink(tmp_path)
+        first.write(record(0))
+        first.close()
+
+        second = JSONLSink(tmp_path)
+        second.write(record(1))
+        second.close()
+
+        assert len(list(tmp_path.glob("results-*.jsonl"))) == 2
+        assert read_jsonl(tmp_path.glob("*.jsonl")) == [record(0), record(1)]
+
+
+def test_file_sink_unique_names(tmp_path):
+    sink = FileSink(tmp_path)
+    sink.write(record(0))
+    sink.write(record(1))
+    assert len(list(tmp_path.glob("game_*.json"))) == 2
+
+
+def test_parquet_sink(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    sink = ParquetSink(tmp_path, row_group_size=2)
+    for i in range(3):
+        sink.write(record(i))
+    sink.flush()
+    assert len(list(tmp_path.glob("*.parquet"))) == 1
+    sink.close()
+
+    parts = sorted(tmp_path.glob("results-*.parquet"))
+    assert len(parts) == 2
+    rows = [row for part in parts for row in pq.read_table(part).to_pylist()]
+    assert [row["topic"] for row in rows] == ["topic-0", "topic-1", "topic-2"]
+    assert json.loads(rows[0]["history"]) == record(0)["history"]
+
+
+class TestThreadedSink:
+    def test_writes_in_background(self, tmp_path):
+        sink = ThreadedSink(JSONLSink(tmp_path, buffer_size=100))
+        for i in range(5):
+            sink.write(record(i))
+        sink.flush()
+        assert len(read_jsonl(tmp_path.glob("*.jsonl"))) == 5
+        sink.close()
+
+    def test_reraises_errors(self, tmp_path):
+        class BrokenSink(FileSink):
+            def write(self, record):
+                raise OSError("disk full")
+
+        sink = ThreadedSink(BrokenSink(tmp_path))
+        sink.write(record(0))
+        with pytest.raises(OSError):
+            sink.close()
+
+
+def test_make_sink_unknown(tmp_path):
+    with pytest.raises(ValueError):
+        make_sink("csv", tmp_path)
+
+
+@pytest.mark.parametrize("name", ["jsonl", "parquet", "files"])
+def test_read_records(tmp_path, name):
+    if name == "parquet":
+        pytest.importorskip("pyarrow")
+    for shard in (None, 0):
+        sink = make_sink(name, tmp_path, shard=shard)
+        for i in range(2):
+            sink.write(record(i))
+        sink.close()
+
+    records = list(read_records(name, tmp_path))
+    topics = sorted(r["topic"] for r in records)
+    assert topics == ["topic-0", "topic-0", "topic-1", "topic-1"]
+    assert all(r["history"] == record(0)["history"] for r in records)
+
+
+def test_read_records_skips_partial_line(tmp_path):
+    sink = JSONLSink(tmp_path)
+    sink.write(record(0))
+    sink.close()
+    with open(tmp_path / "results-00000.jsonl", "a") as f:
+        f.write('{"topic": "topi')
+
+    assert [r["topic"] for r in read_records("jsonl", tmp_path)] == ["topic-0"]
@@ -0,0 +1,82 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+# Generous bound for slow CI machines; importing the heavy dependencies eagerly
+# takes about a second on its own
+IMPORT_TIME_BUDGET = 0.5
+
+HEAVY_MODULES = ["openai", "httpx", "pandas", "numpy", "aiohttp", "pyarrow"]
+
+MEASURE_IMPORT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import src.main
+elapsed = time.perf_counter() - start
+
+heavy = [name for name in {heavy} if name in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+PLAY_DEFAULT_GAME = """
+import asyncio
+import json
+import sys
+
+from src.config import Config, EnvConfig, ModelConfig, PromptConfig
+from src.main import (
+    GUESSER_SYSTEM_PROMPT,
+    HOST_SYSTEM_PROMPT,
+    PROMPT_TEMPLATES,
+    run_play,
+)
+
+config = Config(
+    model=ModelConfig(backend="dummy"),
+    env=EnvConfig(),
+    prompts=PromptConfig(
+        host_system=HOST_SYSTEM_PROMPT,
+        guesser_system=GUESSER_SYSTEM_PROMPT,
+        templates=PROMPT_TEMPLATES,
+    ),
+    run_id="startup",
+)
+asyncio.run(run_play(config))
+
+heavy = [name for name in {heavy} if name in sys.modules]
+print(json.dumps({{"heavy": heavy}}))
+"""
+
+
+def run_snippet(snippet: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", snippet.format(heavy=HEAVY_MODULES)],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def measure_import() -> dict:
+    return run_snippet(MEASURE_IMPORT)
+
+
+def test_main_does_not_import_heavy_dependencies():
+    assert measure_import()["heavy"] == []
+
+
+def test_main_import_time():
+    # Take the best of a few runs to filter out noise from a busy machine
+    elapsed = min(measure_import()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET
+
+
+def test_default_game_does_not_import_heavy_dependencies():
+    assert run_snippet(PLAY_DEFAULT_GAME)["heavy"] == []
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from src import tracing
+from src.config import Config, EnvConfig, ModelConfig, PromptConfig
+from src.main import (
+    GUESSER_SYSTEM_PROMPT,
+    HOST_SYSTEM_PROMPT,
+    PROMPT_TEMPLATES,
+    run_eval,
+    run_play,
+)
+from src.model import BatchingModelWrapper, ModelWrapper, split_count
+
+
+@pytest.fixture
+def trace_config():
+    return Config(
+        model=ModelConfig(backend="dummy"),
+        env=EnvConfig(max_turns=3),
+        prompts=PromptConfig(
+            host_system=HOST_SYSTEM_PROMPT,
+            guesser_system=GUESSER_SYSTEM_PROMPT,
+            templates=PROMPT_TEMPLATES,
+        ),
+        run_id="trace-run",
+        n_games=4,
+        max_concurrency=2,
+        trace=True,
+    )
+
+
+def test_span_without_tracer_is_noop():
+    assert tracing.current() is None
+    assert tracing.span("a") is tracing.span("b")
+    tracing.count("a")
+    tracing.add_tokens({"prompt_tokens": 3})
+
+
+def test_tracer_records_spans_and_tokens():
+    tracer = tracing.Tracer()
+    token = tracing.activate(tracer)
+    try:
+        with tracing.span("work"):
+            pass
+        tracing.record("work", 0.5)
+        tracing.add_tokens({"prompt_tokens": 3, "completion_tokens": 2})
+    finally:
+        tracing.deactivate(token)
+
+    summary = tracer.summary()
+    assert summary["spans"]["work"]["count"] == 2
+    assert summary["spans"]["work"]["max"] == 0.5
+    assert summary["counters"] == {"tokens.prompt": 3, "tokens.completion": 2}
+    assert tracing.current() is None
+
+
+@pytest.mark.asyncio
+async def test_run_play_records_game_spans(trace_config):
+    tracer = tracing.Tracer()
+    result = await run_play(trace_config, tracer=tracer)
+
+    # The dummy model never asks a question, so the game stops in the first phase
+    for name in ("env.step", "env.ask_question", "agent.act", "model.generate"):
+        assert tracer.spans[name].count == 1
+    assert tracer.spans["prompt.build"].count == 1
+    assert result.timings == tracer.summary()
+
+
+@pytest.mark.asyncio
+async def test_run_eval_reports_trace(trace_config, tmp_path, capsys):
+    metrics = await run_eval(trace_config, log_dir=str(tmp_path))
+
+    spans = metrics["trace"]["spans"]
+    assert spans["env.step"]["count"] == 4
+    assert spans["model.generate"]["count"] == 4
+
+
+class SlowEchoModelWrapper(ModelWrapper):
+    async def generate(self, prompts, **kwargs):
+        return prompts[-1]["content"]
+
+    async def generate_batch(self, prompts, **kwargs):
+        await asyncio.sleep(0.01)
+        return [prompt[-1]["content"] for prompt in prompts]
+
+
+@pytest.mark.asyncio
+async def test_batching_records_per_caller_timings():
+    model = BatchingModelWrapper(SlowEchoModelWrapper(), batch_window=0.01)
+    tracers = [tracing.Tracer(), tracing.Tracer()]
+
+    async def call(tracer, content):
+        token = tracing.activate(tracer)
+        try:
+            return await model.generate([{"role": "user", "content": content}])
+        finally:
+            tracing.deactivate(token)
+
+    await asyncio.gather(*(call(tracer, str(i)) for i, tracer in enumerate(tracers)))
+
+    for tracer in tracers:
+        assert tracer.spans["model.queue_wait"].count == 1
+        assert tracer.spans["model.network"].count == 1
+        assert tracer.spans["model.network"].max >= 0.01
+
+
+class UsageEchoModelWrapper(SlowEchoModelWrapper):
+    async def generate_batch(self, prompts, **kwargs):
+        tracing.add_tokens({"prompt_tokens": 30, "completion_tokens": 7})
+        return await super().generate_batch(prompts, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_batching_splits_token_usage_between_callers():
+    model = BatchingModelWrapper(UsageEchoModelWrapper(), batch_window=0.01)
+    tracers = [tracing.Tracer(), tracing.Tracer()]
+
+    async def call(tracer, content):
+        token = tracing.activate(tracer)
+        try:
+            return await model.generate([{"role": "user", "content": content}])
+        finally:
+            tracing.deactivate(token)
+
+    # The second prompt is twice as long as the first
+    await asyncio.gather(call(tracers[0], "x" * 40), call(tracers[1], "x" * 80))
+
+    assert [t.counters["tokens.prompt"] for t in tracers] == [10, 20]
+    assert sum(t.counters["tokens.completion"] for t in tracers) == 7
+
+
+def test_split_count():
+    assert split_count(10, [1, 1, 1]) == [3, 4, 3]
+    assert sum(split_count(7, [5, 0, 2, 9])) == 7
+    assert split_count(5, [0, 0]) == [0, 0]
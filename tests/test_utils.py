@@ -0,0 +1,180 @@
+from src.env import AGENT_ROLE, Observation, TURN_TYPE
+from src.utils import (
+    STOP_CONDITIONS,
+    PromptManager,
+    check_valid_response,
+    compile_template,
+    estimate_tokens,
+    parse_check_guess,
+    parse_check_question,
+    parse_guess_and_question,
+)
+
+
+TEMPLATES = {TURN_TYPE.ASK_QUESTION: "Turn: {turn}"}
+
+
+def observation(turn, history):
+    return Observation(
+        turn=turn,
+        history=history,
+        turn_type=TURN_TYPE.ASK_QUESTION,
+        active=True,
+        role=AGENT_ROLE.GUESSER,
+        remaining_turns=20 - turn,
+    )
+
+
+def play(pm, turns):
+    history = []
+    for turn in range(1, turns + 1):
+        messages = pm.build_agent_prompt(observation(turn, history))
+        pm.add_assistant_message(f"Question {turn}?")
+        history.append(
+            {
+                "turn": turn,
+                "question": f"Question {turn}?",
+                "answer": "no",
+                "guess": "x",
+            }
+        )
+    return messages
+
+
+def test_full_history_by_default():
+    pm = PromptManager(TEMPLATES, "system")
+    messages = play(pm, 5)
+    assert len(messages) == 1 + 2 * 5
+    assert messages[0] == {"role": "system", "content": "system"}
+
+
+def test_history_window_keeps_recent_messages_and_digest():
+    pm = PromptManager(TEMPLATES, "system", history_window=2)
+    messages = play(pm, 5)
+
+    assert messages[0] == {"role": "system", "content": "system"}
+    digest = messages[1]["content"].splitlines()
+    assert digest[0] == "Game so far:"
+    assert digest[1:] == [
+        f"Turn {turn}: Q: Question {turn}? -> A: no -> Guess: x" for turn in range(1, 5)
+    ]
+    assert messages[2:] == [
+        {"role": "assistant", "content": "Question 4?"},
+        {"role": "user", "content": "Turn: 5"},
+    ]
+    # The stored conversation is bounded too
+    assert len(pm.messages) == 3
+
+
+def test_max_prompt_tokens_drops_oldest_history():
+    pm = PromptManager(TEMPLATES, "system", history_window=4, max_prompt_tokens=30)
+    for turns in (5, 20, 50):
+        messages = play(pm, turns)
+        assert messages[0]["role"] == "system"
+        assert messages[-1] == {"role": "user", "content": f"Turn: {turns}"}
+        assert sum(estimate_tokens(m["content"]) for m in messages) <= 30 + 3
+        pm.clear()
+        pm.add_system_message("system")
+
+
+def test_max_prompt_tokens_under_budget_sends_full_history():
+    messages = play(PromptManager(TEMPLATES, "system", max_prompt_tokens=1000), 5)
+    assert len(messages) == 1 + 2 * 5 - 1
+    assert not any(m["content"].startswith("Game so far") for m in messages)
+
+
+def test_max_prompt_tokens_drops_messages_before_digest():
+    templates = {
+        TURN_TYPE.ASK_QUESTION: (
+            "Current game state:\nTurn: {turn}\nWas last guess correct: No\n"
+            "Ask a single yes/no question to help identify the topic."
+        )
+    }
+    messages = play(PromptManager(templates, "system", max_prompt_tokens=150), 8)
+
+    # Every completed turn is still summarized, the verbose messages went first
+    digest = messages[1]["content"].splitlines()
+    assert digest[0] == "Game so far:"
+    assert len(digest) == 1 + 7
+    assert len(messages) < 1 + 2 * 8 - 1
+    assert messages[-1]["content"].startswith("Current game state:\nTurn: 8")
+    assert sum(estimate_tokens(m["content"]) for m in messages) <= 150
+
+
+def test_max_prompt_tokens_keeps_latest_message():
+    pm = PromptManager(TEMPLATES, "system", max_prompt_tokens=1)
+    messages = play(pm, 3)
+    assert messages == [
+        {"role": "system", "content": "system"},
+        {"role": "user", "content": "Turn: 3"},
+    ]
+
+
+def test_compile_template_lists_used_fields():
+    template, fields = compile_template(
+        ("Turn: {turn} ", "{topic} {turn} {history[0]}")
+    )
+    assert template == "Turn: {turn} {topic} {turn} {history[0]}"
+    assert fields == ("turn", "topic", "history")
+
+
+def test_format_observation_joins_knowledge_base():
+    pm = PromptManager({TURN_TYPE.ASK_QUESTION: "{knowledge_base} at {turn}"})
+    obs = observation(2, [])._replace(knowledge_base=["dog", "cat"])
+    assert pm.format_observation(obs) == "dog, cat at 2"
+    assert pm.format_observation(obs._replace(knowledge_base=["car"])) == "car at 2"
+
+
+def test_parse_guess_and_question():
+    assert parse_guess_and_question("Guess: **cat**\nQuestion: Does it fly?") == (
+        "cat",
+        "Does it fly?",
+    )
+    assert parse_guess_and_question("cat\nDoes it fly?") == ("cat", "Does it fly?")
+    assert parse_guess_and_question("Guess: cat") == ("cat", None)
+
+
+def test_fork_is_independent():
+    pm = PromptManager(TEMPLATES, "system", history_window=2)
+    play(pm, 2)
+    forked = pm.fork()
+    forked.add_assistant_message("branch")
+
+    assert [m["content"] for m in pm.messages] == ["system", "Turn: 2", "Question 2?"]
+    assert [m["content"] for m in forked.messages] == [
+        "system",
+        "Question 2?",
+        "branch",
+    ]
+
+
+def test_stop_conditions_cut_where_the_parsers_read():
+    parsers = {
+        TURN_TYPE.ANSWER_QUESTION: check_valid_response,
+        TURN_TYPE.ASK_QUESTION: parse_check_question,
+        TURN_TYPE.MAKE_GUESS: parse_check_guess,
+        TURN_TYPE.GUESS_AND_ASK: parse_guess_and_question,
+    }
+    responses = {
+        TURN_TYPE.ANSWER_QUESTION: "No, it is not alive.",
+        TURN_TYPE.ASK_QUESTION: "Is it an animal? It would narrow things down.",
+        TURN_TYPE.MAKE_GUESS: "A cat\nIt has been small and furry.",
+        TURN_TYPE.GUESS_AND_ASK: "Guess: cat\nQuestion: Does it fly?\nReasoning.",
+    }
+    for turn_type, response in responses.items():
+        stop_when = STOP_CONDITIONS[turn_type]
+        # Streamed one character at a time, cut at the first prefix that suffices
+        cut = next(
+            response[:i] for i in range(1, len(response) + 1) if stop_when(response[:i])
+        )
+        assert len(cut) < len(response)
+        parse = parsers[turn_type]
+        assert parse(cut) == parse(response)
+
+
+def test_answer_stop_condition_waits_for_whole_word():
+    stop_when = STOP_CONDITIONS[TURN_TYPE.ANSWER_QUESTION]
+    assert not stop_when("I kno")
+    assert not stop_when("no")
+    assert stop_when("no.")
+    assert stop_when("Yes, it is")